@@ -0,0 +1,72 @@
+"""
+Micro-benchmark the stages of ModelAPIServing
+Times decode_request, predict and encode_response in isolation, in-process
+and without HTTP, for one-row and batched inputs.
+
+Run with: python -m benchmarks.bench_api_stages
+"""
+
+import timeit
+from typing import Callable
+from src.api.api_serving import ModelAPIServing
+from src.logging.console_log import setup_logging
+from benchmarks.load_test import synthetic_payloads
+
+# setup logging
+logger = setup_logging()
+
+
+def time_per_call(function: Callable, n_calls: int, repeat: int = 5) -> float:
+    """Best-of-`repeat` time of one call, in microseconds"""
+    return min(timeit.repeat(function, number=n_calls, repeat=repeat)) / n_calls * 1e6
+
+
+def main():
+    """Time each serving stage"""
+    api = ModelAPIServing(max_batch_size=64)
+    api.setup("cpu")
+    requests = synthetic_payloads(64)
+
+    for batch_size in (1, 8, 64):
+        batch_requests = requests[:batch_size]
+        decoded = [api.decode_request(request, {}) for request in batch_requests]
+        batched = api.batch(decoded, {}) if batch_size > 1 else decoded[0]
+
+        def fresh_input():
+            # predict scales its input in place, so time it on fresh copies
+            if batch_size > 1:
+                features, valid = batched
+                return features.copy(), valid
+            return batched.copy()
+
+        output = api.predict(fresh_input(), {})
+        outputs = api.unbatch(output, {}) if batch_size > 1 else [output]
+        n_calls = max(20, 2000 // batch_size)
+
+        decode_us = time_per_call(
+            lambda: [api.decode_request(request, {}) for request in batch_requests],
+            n_calls,
+        )
+        batch_us = (
+            time_per_call(lambda: api.batch(decoded, {}), n_calls)
+            if batch_size > 1
+            else 0.0
+        )
+        predict_us = time_per_call(lambda: api.predict(fresh_input(), {}), n_calls)
+        encode_us = time_per_call(
+            lambda: [
+                api.encode_response(response, {})
+                for response in (api.unbatch(output, {}) if batch_size > 1 else outputs)
+            ],
+            n_calls,
+        )
+        total_us = decode_us + batch_us + predict_us + encode_us
+        logger.info(
+            f"batch_size={batch_size}: decode {decode_us:.1f} us, batch {batch_us:.1f} us, "
+            f"predict {predict_us:.1f} us, unbatch+encode {encode_us:.1f} us, "
+            f"total {total_us:.1f} us ({total_us / batch_size:.1f} us/row)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark the request and response codec of the serving path
+Times, per request and without the model, what the API server and the
+inference worker spend on a /predict call besides prediction: the Pydantic
+path (validate the request into a PredictionRequest, pickle it to the worker,
+read its fields, build a PredictionResponse, pickle it back and serialize it
+with FastAPI's JSON encoder) against the codec path (pickle the parsed JSON
+object, decode it with RequestDecoder, encode the JSON bytes with
+ResponseEncoder and pickle the finished response back).
+
+Run with: python -m benchmarks.bench_codec [--payloads 1000]
+"""
+
+import argparse
+import pickle
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from src.api.api_model import PredictionRequest, PredictionResponse
+from src.api.codec import RequestDecoder, ResponseEncoder
+from src.logging.console_log import setup_logging
+from settings import settings
+from benchmarks.bench_api_stages import time_per_call
+from benchmarks.load_test import synthetic_payloads
+
+# setup logging
+logger = setup_logging()
+
+
+def main():
+    """Compare the Pydantic and codec request paths"""
+    parser = argparse.ArgumentParser(
+        description="Benchmark request decoding and response encoding"
+    )
+    parser.add_argument(
+        "--payloads", type=int, default=1000, help="Synthetic requests per timing"
+    )
+    args = parser.parse_args()
+
+    feature_columns = settings.NUMERICAL_FEATURE_COLUMNS + settings.CATEGORICAL_COLUMNS
+    n_features = len(feature_columns)
+    payloads = synthetic_payloads(args.payloads)
+    class_labels = np.array([1, 2])
+    probabilities = np.array([0.125, 0.875])
+    version = "0123456789abcdef"
+    decoder = RequestDecoder(feature_columns)
+    encoder = ResponseEncoder(class_labels, version)
+
+    def pydantic_path(payload: dict) -> bytes:
+        request = pickle.loads(pickle.dumps(PredictionRequest.model_validate(payload)))
+        np.fromiter(
+            (getattr(request, column) for column in feature_columns),
+            dtype=np.float64,
+            count=n_features,
+        )
+        response = PredictionResponse(
+            prediction=class_labels[np.argmax(probabilities)].tolist(),
+            probability=np.max(probabilities).tolist(),
+            model_version=version,
+        )
+        response = PredictionResponse.model_validate(
+            pickle.loads(pickle.dumps(response))
+        )
+        return JSONResponse(jsonable_encoder(response)).body
+
+    def codec_path(payload: dict) -> bytes:
+        decoder.decode(pickle.loads(pickle.dumps(payload)))
+        response = Response(
+            encoder.encode(probabilities), media_type="application/json"
+        )
+        return pickle.loads(pickle.dumps(response)).body
+
+    assert pydantic_path(payloads[0]) == codec_path(payloads[0])
+    timings = {
+        "pydantic": time_per_call(
+            lambda: [pydantic_path(payload) for payload in payloads], 5
+        )
+        / len(payloads),
+        "codec": time_per_call(lambda: [codec_path(payload) for payload in payloads], 5)
+        / len(payloads),
+    }
+    for name, request_us in timings.items():
+        logger.info(f"{name}: {request_us:.1f} us per request")
+    logger.info(f"Codec speedup: {timings['pydantic'] / timings['codec']:.1f}x")
+
+    # The stages of the codec on their own
+    decode_us = time_per_call(
+        lambda: [decoder.decode(payload) for payload in payloads], 5
+    ) / len(payloads)
+    encode_us = time_per_call(lambda: encoder.encode(probabilities), 20000)
+    rows = np.tile(probabilities, (64, 1))
+    encode_rows_us = time_per_call(lambda: encoder.encode_rows(rows), 2000) / len(rows)
+    logger.info(
+        f"RequestDecoder.decode {decode_us:.1f} us, ResponseEncoder.encode {encode_us:.1f} us, "
+        f"encode_rows {encode_rows_us:.2f} us per row"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Benchmark the cold start of the serving entry point
+Each run starts a fresh interpreter that imports main.py, sets up the
+inference API and answers one request, and reports the time of each step and
+the heavy training-only packages that were imported. The whole server can
+also be timed from process start to its first /predict response. The median
+time to the first prediction is checked against a target, so a regression
+fails the run.
+
+Run with: python -m benchmarks.bench_cold_start [--runs 5] [--target 2.0] [--server]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime, timezone
+from typing import List
+from benchmarks.load_test import RESULTS_FOLDER, git_commit, start_server, stop_server
+from settings import settings
+from src.logging.console_log import setup_logging
+
+# setup logging
+logger = setup_logging()
+
+# Packages that only the training pipeline needs
+TRAINING_PACKAGES = ("sklearn", "imblearn", "scipy", "pandas", "pyarrow")
+
+# Run in a fresh interpreter; prints one JSON line of timings
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+api = main.ModelAPIServing()
+api.setup("cpu")
+ready = time.perf_counter()
+request = {column: 1.0 for column in api.feature_columns}
+output = api.predict(api.decode_request(request, {}), {})
+api.encode_response(output, {})
+predicted = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "setup": ready - imported,
+    "first_prediction": predicted - ready,
+    "training_packages": sorted(name for name in %r if name in sys.modules),
+}))
+""" % (TRAINING_PACKAGES,)
+
+
+def run_probe(env: dict) -> dict:
+    """Time one cold start of the inference API in a fresh interpreter"""
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=settings.PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = time.perf_counter() - start
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    # Interpreter start-up and exit are included in the total
+    result["total"] = total
+    return result
+
+
+def time_server(env_overrides: List[str], port: int) -> float:
+    """Seconds from starting main.py to its first successful /predict response"""
+    payload = json.dumps(
+        {
+            column: 1.0
+            for column in settings.NUMERICAL_FEATURE_COLUMNS
+            + settings.CATEGORICAL_COLUMNS
+        }
+    ).encode()
+    start = time.perf_counter()
+    server = start_server(env_overrides, port)
+    try:
+        while True:
+            request = urllib.request.Request(
+                f"http://127.0.0.1:{port}/predict",
+                data=payload,
+                headers={"Content-Type": "application/json"},
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=5) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.05)
+    finally:
+        stop_server(server)
+
+
+def main():
+    """Run the cold start benchmark from the command line"""
+    parser = argparse.ArgumentParser(description="Benchmark the serving cold start")
+    parser.add_argument(
+        "--runs", type=int, default=5, help="Fresh interpreters to time"
+    )
+    parser.add_argument(
+        "--target",
+        type=float,
+        default=2.0,
+        help="Maximum median seconds from interpreter start to the first prediction",
+    )
+    parser.add_argument(
+        "--server",
+        action="store_true",
+        help="Also time main.py to its first /predict response",
+    )
+    parser.add_argument(
+        "--port", type=int, default=8765, help="Port of the timed server"
+    )
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="Settings override for the probe and the server, e.g. MODEL_BACKEND=sklearn",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Results file (default: benchmarks/results/)",
+    )
+    args = parser.parse_args()
+
+    # Metrics files of the probe would be mixed with those of a running server
+    env = {**os.environ, "SERVING_METRICS_ENABLED": "false"}
+    for override in args.env:
+        key, value = override.split("=", 1)
+        env[key] = value
+
+    runs = [run_probe(env) for _ in range(args.runs)]
+    median = {
+        step: statistics.median(run[step] for run in runs)
+        for step in ("import", "setup", "first_prediction", "total")
+    }
+    training_packages = sorted(
+        {name for run in runs for name in run["training_packages"]}
+    )
+    logger.info(
+        f"Cold start over {args.runs} runs (median): import {median['import'] * 1000:.0f} ms, "
+        f"setup {median['setup'] * 1000:.0f} ms, first prediction {median['first_prediction'] * 1000:.1f} ms, "
+        f"{median['total'] * 1000:.0f} ms from interpreter start"
+    )
+    if training_packages:
+        logger.warning(
+            f"Training-only packages imported while serving: {', '.join(training_packages)}"
+        )
+
+    server_seconds = None
+    if args.server:
+        server_seconds = time_server(args.env, args.port)
+        logger.info(
+            f"main.py answered its first /predict after {server_seconds * 1000:.0f} ms"
+        )
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {"runs": args.runs, "target_seconds": args.target, "env": args.env},
+        "machine": {"platform": platform.platform(), "cpus": os.cpu_count()},
+        "median_seconds": median,
+        "server_first_prediction_seconds": server_seconds,
+        "training_packages": training_packages,
+        "runs": runs,
+    }
+    output = args.output or RESULTS_FOLDER / (
+        f"cold_start_{datetime.now(timezone.utc):%Y%m%dT%H%M%S}_{result['commit'] or 'nogit'}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=4)
+    logger.info(f"Results saved to {output}")
+
+    if median["total"] > args.target:
+        logger.error(
+            f"Median time to first prediction {median['total']:.2f}s exceeds the target of {args.target:.2f}s"
+        )
+        sys.exit(1)
+    logger.info(
+        f"Median time to first prediction is within the target of {args.target:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
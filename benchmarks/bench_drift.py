@@ -0,0 +1,90 @@
+"""
+Benchmark the drift engine against the per-column KS loop
+Times the original check (scipy.stats.ks_2samp on each full column in turn)
+and the drift engine (all columns from shared bins, chunked) on growing
+amounts of current data, and reports the peak memory each allocates.
+
+Run with: python -m benchmarks.bench_drift
+"""
+
+import time
+import tracemalloc
+from typing import Callable
+import numpy as np
+import pandas as pd
+from scipy import stats
+from settings import settings
+from src.data.storage import read_dataset
+from src.logging.console_log import setup_logging
+from src.monitoring.drift_engine import DriftReference
+
+# setup logging
+logger = setup_logging()
+
+
+def per_column_loop(reference: pd.DataFrame, current: pd.DataFrame) -> dict:
+    """The original check: one ks_2samp call per numerical column"""
+    return {
+        column: stats.ks_2samp(reference[column], current[column]).statistic
+        for column in settings.NUMERICAL_FEATURE_COLUMNS
+    }
+
+
+def engine(reference: DriftReference, current: np.ndarray, chunk_size: int) -> dict:
+    """All columns from shared bins, counting the data chunk by chunk"""
+    counts = np.zeros(reference.size, dtype=np.int64)
+    for start in range(0, len(current), chunk_size):
+        counts += reference.count(current[start : start + chunk_size])
+    scores = reference.scores(counts, len(current))
+    return {
+        column: scores[column]["ks"] for column in settings.NUMERICAL_FEATURE_COLUMNS
+    }
+
+
+def measure(function: Callable) -> tuple:
+    """Wall time and peak traced memory of one call"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20
+
+
+def main(sizes=(10_000, 100_000, 1_000_000, 5_000_000), chunk_size: int = 100_000):
+    """Compare both checks on synthetic current data of growing size"""
+    columns = settings.NUMERICAL_FEATURE_COLUMNS + settings.CATEGORICAL_COLUMNS
+    reference_data = read_dataset(settings.TRAIN_TEST_FOLDER, "X_train")
+    reference = DriftReference(
+        reference_data, settings.NUMERICAL_FEATURE_COLUMNS, settings.CATEGORICAL_COLUMNS
+    )
+    rng = np.random.default_rng(settings.RANDOM_STATE)
+
+    for size in sizes:
+        # Resampled reference rows with multiplicative noise
+        current = reference_data[columns].to_numpy(dtype=np.float64)[
+            rng.integers(len(reference_data), size=size)
+        ]
+        current[:, : len(settings.NUMERICAL_FEATURE_COLUMNS)] *= rng.lognormal(
+            0, 0.1, size=(size, len(settings.NUMERICAL_FEATURE_COLUMNS))
+        )
+        current_frame = pd.DataFrame(current, columns=columns)
+
+        loop_result, loop_seconds, loop_mb = measure(
+            lambda: per_column_loop(reference_data, current_frame)
+        )
+        engine_result, engine_seconds, engine_mb = measure(
+            lambda: engine(reference, current, chunk_size)
+        )
+        for column in settings.NUMERICAL_FEATURE_COLUMNS:
+            assert abs(loop_result[column] - engine_result[column]) < 1e-12, column
+        logger.info(
+            f"{size} rows: per-column ks_2samp {loop_seconds:.3f} s / {loop_mb:.1f} MiB peak, "
+            f"engine (KS+PSI+JS, all columns) {engine_seconds:.3f} s / {engine_mb:.1f} MiB peak "
+            f"({loop_seconds / engine_seconds:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
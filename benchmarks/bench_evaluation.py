@@ -0,0 +1,145 @@
+"""
+Benchmark the evaluation step
+Resamples the test set to 10x, 100x and 1000x its size and times, without the
+model (its predictions are the same either way), the previous metric
+computation with sklearn (point metrics, classification report and confusion
+matrix from the full label arrays) against the chunked confusion-matrix
+engine, then the bootstrap intervals and the confusion matrix plot that is
+now optional.
+
+Run with: python -m benchmarks.bench_evaluation [--resamples 1000 10000]
+"""
+
+import argparse
+import time
+import numpy as np
+from sklearn.metrics import (
+    accuracy_score,
+    classification_report as sklearn_classification_report,
+    confusion_matrix,
+    precision_recall_fscore_support,
+)
+from benchmarks.load_test import RESULTS_FOLDER
+from settings import settings
+from src.api.workers import available_cpus
+from src.data.storage import read_dataset
+from src.logging.console_log import setup_logging
+from src.modelling.evaluation import (
+    ConfusionMatrix,
+    bootstrap_intervals,
+    classification_report,
+    metrics_from_matrix,
+)
+
+# setup logging
+logger = setup_logging()
+
+
+def sklearn_metrics(y_true: np.ndarray, y_pred: np.ndarray) -> dict:
+    """The metrics of the test step as computed before the engine"""
+    accuracy = accuracy_score(y_true, y_pred)
+    precision, recall, f1, _ = precision_recall_fscore_support(
+        y_true, y_pred, average="weighted"
+    )
+    sklearn_classification_report(y_true, y_pred)
+    confusion_matrix(y_true, y_pred)
+    return {
+        "accuracy": accuracy,
+        "precision": precision,
+        "recall": recall,
+        "f1_score": f1,
+    }
+
+
+def engine_metrics(y_true: np.ndarray, y_pred: np.ndarray, chunk_size: int) -> dict:
+    """The same metrics accumulated chunk by chunk"""
+    confusion = ConfusionMatrix()
+    for start in range(0, len(y_true), chunk_size):
+        confusion.update(
+            y_true[start : start + chunk_size], y_pred[start : start + chunk_size]
+        )
+    classification_report(confusion)
+    return metrics_from_matrix(confusion.matrix)
+
+
+def main():
+    """Compare the sklearn metrics with the evaluation engine on growing test sets"""
+    parser = argparse.ArgumentParser(description="Benchmark the evaluation step")
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000],
+        help="Test set size multiples",
+    )
+    parser.add_argument(
+        "--resamples",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="Bootstrap resamples",
+    )
+    args = parser.parse_args()
+
+    y_test = read_dataset(
+        settings.TRAIN_TEST_FOLDER, "y_test", columns=[settings.TARGET_COLUMN_NAME]
+    )[settings.TARGET_COLUMN_NAME].to_numpy()
+    labels = np.unique(y_test)
+    rng = np.random.default_rng(settings.RANDOM_STATE)
+
+    for scale in args.scales:
+        y_true = rng.choice(y_test, size=len(y_test) * scale)
+        # About half of the predictions are right, as for the trained forest
+        y_pred = np.where(
+            rng.random(len(y_true)) < 0.5, y_true, rng.choice(labels, size=len(y_true))
+        )
+
+        start = time.perf_counter()
+        expected = sklearn_metrics(y_true, y_pred)
+        sklearn_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        metrics = engine_metrics(y_true, y_pred, settings.EVAL_CHUNK_SIZE)
+        engine_seconds = time.perf_counter() - start
+        assert np.allclose(
+            [metrics[name] for name in expected], list(expected.values())
+        )
+        logger.info(
+            f"{len(y_true)} rows: sklearn {sklearn_seconds * 1000:.1f} ms, "
+            f"confusion-matrix engine {engine_seconds * 1000:.1f} ms "
+            f"({sklearn_seconds / engine_seconds:.0f}x)"
+        )
+
+    confusion = ConfusionMatrix()
+    confusion.update(y_true, y_pred)
+    for n_resamples in args.resamples:
+        for n_workers in sorted({1, available_cpus()}):
+            start = time.perf_counter()
+            bootstrap_intervals(
+                confusion.matrix,
+                n_resamples,
+                n_workers=n_workers,
+                seed=settings.RANDOM_STATE,
+            )
+            logger.info(
+                f"Bootstrap of {n_resamples} resamples on {n_workers} process(es): "
+                f"{(time.perf_counter() - start) * 1000:.1f} ms"
+            )
+
+    start = time.perf_counter()
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from sklearn.metrics import ConfusionMatrixDisplay
+
+    ConfusionMatrixDisplay(confusion.matrix, display_labels=confusion.labels).plot()
+    RESULTS_FOLDER.mkdir(parents=True, exist_ok=True)
+    plt.savefig(RESULTS_FOLDER / "confusion_matrix.png")
+    plt.close()
+    logger.info(
+        f"matplotlib import and confusion matrix plot: {(time.perf_counter() - start) * 1000:.0f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark the flat-array forest against sklearn's predict_proba
+Checks that `FlatForest` matches the pickled RandomForestClassifier within
+float tolerance, then times both for single rows and batches.
+
+Run with: python -m benchmarks.bench_forest
+"""
+
+import pickle
+import timeit
+import numpy as np
+import pandas as pd
+from src.data.storage import read_dataset
+from src.logging.console_log import setup_logging
+from src.modelling.flat_forest import FlatForest
+from settings import settings
+
+# setup logging
+logger = setup_logging()
+
+
+def main():
+    """Run parity check and timings"""
+    with open(settings.MODEL_PATH, "rb") as file:
+        model = pickle.load(file)
+    forest = FlatForest.from_sklearn(model)
+
+    X = read_dataset(settings.PROCESSED_DATA_FOLDER, "X_train_processed")
+    columns = X.columns
+
+    # Parity: probabilities must agree within float tolerance
+    expected = model.predict_proba(X)
+    actual = forest.predict_proba(X.to_numpy(dtype=np.float64))
+    max_error = np.abs(expected - actual).max()
+    if not np.allclose(expected, actual, rtol=0.0, atol=1e-12):
+        raise AssertionError(f"Flat forest diverges from sklearn: {max_error}")
+    logger.info(f"Parity check passed on {len(X)} rows (max abs error {max_error:.1e})")
+
+    rng = np.random.default_rng(settings.RANDOM_STATE)
+    for batch_size in (1, 64, 1024):
+        batch = X.to_numpy(dtype=np.float64)[rng.integers(0, len(X), batch_size)]
+        batch_df = pd.DataFrame(batch, columns=columns)
+        n_runs = max(10, 2000 // batch_size)
+        sklearn_time = timeit.timeit(
+            lambda: model.predict_proba(batch_df), number=n_runs
+        )
+        flat_time = timeit.timeit(lambda: forest.predict_proba(batch), number=n_runs)
+        logger.info(
+            f"batch_size={batch_size}: sklearn {sklearn_time / n_runs * 1e3:.3f} ms, "
+            f"flat {flat_time / n_runs * 1e3:.3f} ms ({sklearn_time / flat_time:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark the latency that logging adds to the request path
+Emits access-log records at a high rate through each logging mode and
+reports the time spent in the logging call, with a sink whose writes cost
+as much as writing to a busy stdout pipe.
+
+Run with: python -m benchmarks.bench_logging
+"""
+
+import logging
+import time
+import numpy as np
+from settings import settings
+from src.logging.console_log import dropped_log_records, setup_logging
+
+# setup logging
+logger = setup_logging()
+
+DEFAULTS = {
+    "LOG_FORMAT": settings.LOG_FORMAT,
+    "LOG_ASYNC": settings.LOG_ASYNC,
+    "LOG_BUFFER_SIZE": settings.LOG_BUFFER_SIZE,
+    "LOG_SAMPLE_RATE": settings.LOG_SAMPLE_RATE,
+}
+MODES = [
+    ("sync text", {"LOG_FORMAT": "text", "LOG_ASYNC": False}),
+    ("sync json", {"LOG_FORMAT": "json", "LOG_ASYNC": False}),
+    ("async text", {"LOG_FORMAT": "text", "LOG_ASYNC": True}),
+    ("async json", {"LOG_FORMAT": "json", "LOG_ASYNC": True}),
+    (
+        "async json, 10% sampled",
+        {"LOG_FORMAT": "json", "LOG_ASYNC": True, "LOG_SAMPLE_RATE": 0.1},
+    ),
+    (
+        "async json, buffer 100",
+        {"LOG_FORMAT": "json", "LOG_ASYNC": True, "LOG_BUFFER_SIZE": 100},
+    ),
+]
+
+
+class SlowStream:
+    """Discards output, but every write blocks for `write_seconds`"""
+
+    def __init__(self, write_seconds: float):
+        self.write_seconds = write_seconds
+        self.writes = 0
+        self.bytes = 0
+
+    def write(self, text: str):
+        deadline = time.perf_counter() + self.write_seconds
+        while time.perf_counter() < deadline:
+            pass
+        self.writes += 1
+        self.bytes += len(text)
+
+    def flush(self):
+        pass
+
+
+def run_mode(overrides: dict, n_records: int, write_seconds: float) -> dict:
+    """Time each access-log call in one logging mode"""
+    for name, value in {**DEFAULTS, **overrides}.items():
+        setattr(settings, name, value)
+    stream = SlowStream(write_seconds)
+    setup_logging(stream=stream)
+    access_log = logging.getLogger("uvicorn.access")
+
+    durations = np.empty(n_records)
+    for i in range(n_records):
+        start = time.perf_counter()
+        access_log.info(
+            '%s - "%s %s HTTP/%s" %d', "127.0.0.1:5000", "POST", "/predict", "1.1", 200
+        )
+        durations[i] = time.perf_counter() - start
+
+    return {
+        "mean_us": durations.mean() * 1e6,
+        "p99_us": np.percentile(durations, 99) * 1e6,
+        "max_us": durations.max() * 1e6,
+        "dropped": dropped_log_records(),
+        "stream": stream,
+    }
+
+
+def main(n_records: int = 5000, write_seconds: float = 0.0002):
+    """Compare the logging modes"""
+    results = []
+    for label, overrides in MODES:
+        result = run_mode(overrides, n_records, write_seconds)
+        results.append((label, result))
+
+    # Restore the console configuration before reporting; this also stops
+    # the last buffered sink
+    for name, value in DEFAULTS.items():
+        setattr(settings, name, value)
+    setup_logging()
+    for label, result in results:
+        logger.info(
+            f"{label}: mean {result['mean_us']:.1f} us, p99 {result['p99_us']:.1f} us, "
+            f"max {result['max_us']:.0f} us per call; {result['stream'].writes} writes, "
+            f"{result['dropped']} records dropped"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark the overhead of the serving metrics
+Times a single histogram observation and the full decode, predict and encode
+path of ModelAPIServing with metrics recording on and off.
+
+Run with: python -m benchmarks.bench_metrics
+"""
+
+import tempfile
+from src.api import serving_metrics
+from src.api.api_serving import ModelAPIServing
+from src.logging.console_log import setup_logging
+from settings import settings
+from benchmarks.bench_api_stages import time_per_call
+from benchmarks.load_test import synthetic_payloads
+
+# setup logging
+logger = setup_logging()
+
+
+def main():
+    """Compare the serving path with and without metrics"""
+    settings.SERVING_METRICS_ENABLED = False
+    api = ModelAPIServing(max_batch_size=64)
+    api.setup("cpu")
+    requests = synthetic_payloads(64)
+    registry = serving_metrics.registry
+    histogram = serving_metrics.stage_seconds["decode"]
+
+    def serve(batch_requests):
+        decoded = [api.decode_request(request, {}) for request in batch_requests]
+        output = api.predict(api.batch(decoded, {}), {})
+        return [
+            api.encode_response(response, {}) for response in api.unbatch(output, {})
+        ]
+
+    with tempfile.TemporaryDirectory() as folder:
+        registry.bind(folder)
+        values = registry.values
+        observe_us = time_per_call(lambda: histogram.observe(0.0003), 100000)
+        logger.info(f"Histogram observe: {observe_us * 1000:.0f} ns")
+
+        for batch_size in (1, 8, 64):
+            batch_requests = requests[:batch_size]
+            n_calls = max(20, 2000 // batch_size)
+            registry.values = values
+            with_us = time_per_call(lambda: serve(batch_requests), n_calls)
+            registry.values = None
+            without_us = time_per_call(lambda: serve(batch_requests), n_calls)
+            logger.info(
+                f"batch_size={batch_size}: with metrics {with_us:.1f} us, "
+                f"without {without_us:.1f} us, overhead {with_us - without_us:.1f} us "
+                f"({(with_us - without_us) / without_us:.1%})"
+            )
+
+
+if __name__ == "__main__":
+    main()
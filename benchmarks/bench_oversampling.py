@@ -0,0 +1,104 @@
+"""
+Benchmark the ADASYN oversampling of the preprocess stage
+Resamples the training split to 1x, 10x and 100x its size, with noise of a
+quarter of each numerical feature's standard deviation added so rows are not
+near-copies of one another, and times imblearn's
+ADASYN against `src.data.oversampling.adasyn` with a cold neighbour cache on
+one and on all threads, and with the cached neighbour tables of a rerun.
+Every run is checked to produce exactly imblearn's rows.
+
+Run with: python -m benchmarks.bench_oversampling [--scales 1 10 100]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from imblearn.over_sampling import ADASYN
+from settings import settings
+from src.data.oversampling import adasyn
+from src.data.storage import read_dataset
+from src.logging.console_log import setup_logging
+
+# setup logging
+logger = setup_logging()
+
+
+def main():
+    """Compare imblearn's ADASYN with the cached, multithreaded implementation"""
+    parser = argparse.ArgumentParser(description="Benchmark ADASYN oversampling")
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=[1, 10, 100],
+        help="Training set size multiples",
+    )
+    args = parser.parse_args()
+
+    X_train = read_dataset(settings.TRAIN_TEST_FOLDER, "X_train").to_numpy()
+    y_train = read_dataset(
+        settings.TRAIN_TEST_FOLDER, "y_train", columns=[settings.TARGET_COLUMN_NAME]
+    )[settings.TARGET_COLUMN_NAME].to_numpy()
+    numerical = [
+        i
+        for i, column in enumerate(
+            read_dataset(settings.TRAIN_TEST_FOLDER, "X_train", nrows=1).columns
+        )
+        if column in settings.NUMERICAL_FEATURE_COLUMNS
+    ]
+    rng = np.random.default_rng(settings.RANDOM_STATE)
+
+    for scale in args.scales:
+        index = (
+            np.arange(len(X_train))
+            if scale == 1
+            else rng.integers(0, len(X_train), len(X_train) * scale)
+        )
+        X, y = X_train[index].copy(), y_train[index]
+        if scale > 1:
+            noise = (
+                rng.normal(size=(len(X), len(numerical)))
+                * X_train[:, numerical].std(axis=0)
+                / 4
+            )
+            X[:, numerical] = np.abs(X[:, numerical] + noise)
+
+        start = time.perf_counter()
+        expected = ADASYN(random_state=settings.RANDOM_STATE).fit_resample(X, y)
+        timings = {"imblearn": time.perf_counter() - start}
+        with tempfile.TemporaryDirectory() as folder:
+            for name, n_jobs, cache_folder in (
+                ("1 thread", 1, None),
+                ("all threads", -1, Path(folder)),
+                ("cached", -1, Path(folder)),
+            ):
+                start = time.perf_counter()
+                X_resampled, y_resampled = adasyn(
+                    X,
+                    y,
+                    settings.RANDOM_STATE,
+                    n_jobs=n_jobs,
+                    cache_folder=cache_folder,
+                )
+                timings[name] = time.perf_counter() - start
+                if not (
+                    np.array_equal(X_resampled, expected[0])
+                    and np.array_equal(y_resampled, expected[1])
+                ):
+                    raise AssertionError(
+                        f"adasyn ({name}) diverges from imblearn's ADASYN at {scale}x"
+                    )
+
+        logger.info(
+            f"{scale}x ({len(X)} rows, {len(X_resampled) - len(X)} generated): "
+            + ", ".join(
+                f"{name} {seconds * 1000:.0f} ms ({timings['imblearn'] / seconds:.1f}x)"
+                for name, seconds in timings.items()
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark the serving preprocessing paths
+Checks that the NumPy fast path (`preprocess_transform_array`) produces
+bit-identical model inputs to the training-side `preprocess_transform` on the
+test split, then times both for one-row and batched inputs.
+
+Run with: python -m benchmarks.bench_preprocess
+"""
+
+import pickle
+import timeit
+import numpy as np
+import pandas as pd
+from src.data.preprocess_data import preprocess_transform
+from src.data.scaling import preprocess_transform_array
+from src.data.storage import read_dataset
+from src.logging.console_log import setup_logging
+from settings import settings
+
+# setup logging
+logger = setup_logging()
+
+
+def dataframe_path(rows: list, scaler) -> np.ndarray:
+    """Request decoding and preprocessing as done with pandas"""
+    X = pd.DataFrame(rows)
+    X_scaled = preprocess_transform(
+        X, scaler, settings.NUMERICAL_FEATURE_COLUMNS, settings.CATEGORICAL_COLUMNS
+    )
+    return X_scaled.to_numpy(dtype=np.float64)
+
+
+def array_path(
+    rows: list, columns: list, mean: np.ndarray, scale: np.ndarray
+) -> np.ndarray:
+    """Request decoding and preprocessing straight into a float64 array"""
+    X = np.array(
+        [[row[column] for column in columns] for row in rows], dtype=np.float64
+    )
+    return preprocess_transform_array(X, mean, scale)
+
+
+def main():
+    """Run parity check and timings"""
+    with open(settings.SCALER_PATH, "rb") as f:
+        scaler = pickle.load(f)
+    columns = settings.NUMERICAL_FEATURE_COLUMNS + settings.CATEGORICAL_COLUMNS
+    mean = np.asarray(scaler.mean_, dtype=np.float64)
+    scale = np.asarray(scaler.scale_, dtype=np.float64)
+
+    X_test = read_dataset(settings.TRAIN_TEST_FOLDER, "X_test")
+    rows = X_test[columns].to_dict(orient="records")
+
+    # Parity: both paths must feed the model exactly the same numbers
+    expected = dataframe_path(rows, scaler)
+    actual = array_path(rows, columns, mean, scale)
+    if not np.array_equal(expected, actual):
+        raise AssertionError(
+            "Array preprocessing path diverges from preprocess_transform"
+        )
+    logger.info(f"Parity check passed on {len(rows)} rows")
+
+    for batch_size in (1, 64):
+        batch = rows[:batch_size]
+        n_runs = 2000
+        df_time = timeit.timeit(lambda: dataframe_path(batch, scaler), number=n_runs)
+        np_time = timeit.timeit(
+            lambda: array_path(batch, columns, mean, scale), number=n_runs
+        )
+        logger.info(
+            f"batch_size={batch_size}: pandas {df_time / n_runs * 1e6:.1f} us, "
+            f"numpy {np_time / n_runs * 1e6:.1f} us ({df_time / np_time:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Benchmark how serving throughput scales with the inference workers
+Starts main.py with 1, 2, 4, ... inference workers up to the available CPUs,
+runs the same load against each and reports the throughput, the scaling
+efficiency against one worker and the memory of the workers: their summed
+resident size next to their proportional set size (PSS), which counts pages
+shared between the workers, such as the memory-mapped model, only once.
+
+Run with: python -m benchmarks.bench_scaling [--workers 1 2 4] [--requests 5000]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+from benchmarks.load_test import (
+    RESULTS_FOLDER,
+    build_requests,
+    git_commit,
+    run_load,
+    start_server,
+    stop_server,
+    synthetic_payloads,
+)
+from src.api.workers import available_cpus
+from src.logging.console_log import setup_logging
+
+# setup logging
+logger = setup_logging()
+
+
+def worker_memory(server_pid: int) -> Dict[str, float]:
+    """
+    Summed memory in MiB of the inference workers of a server.
+
+    The workers are spawned, so they are found by their command line among
+    the processes of the server's process group.
+    """
+    memory = {"workers": 0, "rss_mb": 0.0, "pss_mb": 0.0}
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            if os.getpgid(int(entry.name)) != server_pid:
+                continue
+            if b"spawn_main" not in (entry / "cmdline").read_bytes():
+                continue
+            rollup = (entry / "smaps_rollup").read_text()
+        except (OSError, ProcessLookupError):
+            continue
+        fields = dict(line.split(":", 1) for line in rollup.splitlines()[1:])
+        memory["workers"] += 1
+        memory["rss_mb"] += int(fields["Rss"].split()[0]) / 1024
+        memory["pss_mb"] += int(fields["Pss"].split()[0]) / 1024
+    return memory
+
+
+def default_worker_counts() -> List[int]:
+    """Powers of two up to the available CPUs, and the CPU count itself"""
+    cpus = available_cpus()
+    counts = [1]
+    while counts[-1] * 2 <= cpus:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cpus:
+        counts.append(cpus)
+    return counts
+
+
+def main():
+    """Run the scaling benchmark from the command line"""
+    parser = argparse.ArgumentParser(
+        description="Benchmark throughput against the number of inference workers"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=None,
+        help="Worker counts (default: 1, 2, 4, ... CPUs)",
+    )
+    parser.add_argument(
+        "--port", type=int, default=8766, help="Port of the started servers"
+    )
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        help="KEY=VALUE setting for the started servers",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=64, help="Concurrent connections"
+    )
+    parser.add_argument(
+        "--requests", type=int, default=5000, help="Measured requests per worker count"
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=500, help="Unmeasured warmup requests"
+    )
+    parser.add_argument("--output", type=Path, default=None, help="Result JSON file")
+    args = parser.parse_args()
+
+    worker_counts = args.workers or default_worker_counts()
+    if max(worker_counts) > available_cpus():
+        logger.warning(
+            f"Only {available_cpus()} CPUs are available; counts above it cannot scale"
+        )
+
+    url = f"http://127.0.0.1:{args.port}"
+    raw_requests = build_requests(
+        synthetic_payloads(1000), f"127.0.0.1:{args.port}", "/predict"
+    )
+    runs = []
+    for n_workers in worker_counts:
+        server = start_server([f"API_WORKERS={n_workers}", *args.env], args.port)
+        try:
+            asyncio.run(
+                run_load(
+                    url, raw_requests, min(args.concurrency, args.warmup), args.warmup
+                )
+            )
+            stats = asyncio.run(
+                run_load(url, raw_requests, args.concurrency, args.requests)
+            )
+            memory = worker_memory(server.pid)
+        finally:
+            stop_server(server)
+        run = {"workers": n_workers, **stats, "memory": memory}
+        runs.append(run)
+        efficiency = run["throughput_rps"] / (n_workers * runs[0]["throughput_rps"])
+        run["scaling_efficiency"] = efficiency
+        logger.info(
+            f"{n_workers} workers: {run['throughput_rps']:.0f} req/s "
+            f"({efficiency * 100:.0f}% of linear), p99 {run['latency_ms']['p99']:.1f} ms, "
+            f"{run['errors']} errors, workers RSS {memory['rss_mb']:.0f} MiB / PSS {memory['pss_mb']:.0f} MiB"
+        )
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "server_env": args.env,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+        },
+        "machine": {
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "available_cpus": available_cpus(),
+        },
+        "runs": runs,
+    }
+    output = args.output or RESULTS_FOLDER / (
+        f"scaling_{datetime.now(timezone.utc):%Y%m%dT%H%M%S}_{result['commit'] or 'nogit'}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=4)
+    logger.info(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark the dataset storage formats
+Writes the raw dataset resampled to 10x, 100x and 1000x its size as CSV and
+as Parquet, then times full reads, a two-column projection and a
+memory-mapped read. Each read runs in a fresh process so its peak resident
+memory can be reported.
+
+Run with: python -m benchmarks.bench_storage
+"""
+
+import multiprocessing
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+from settings import settings
+from src.data.storage import read_dataset, read_file, write_dataset
+from src.logging.console_log import setup_logging
+
+# setup logging
+logger = setup_logging()
+
+
+def memory_status(field: str) -> float:
+    """A memory field of /proc/self/status in MiB"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    raise KeyError(field)
+
+
+def timed_read(path: Path, columns: Optional[List[str]], memory_map: bool) -> tuple:
+    """Seconds and peak resident memory growth (MiB) of one read"""
+    # Warm up the readers, then reset the process's peak resident memory
+    read_file(path, columns=columns, memory_map=memory_map, nrows=1)
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    baseline = memory_status("VmRSS")
+    start = time.perf_counter()
+    data = read_file(path, columns=columns, memory_map=memory_map)
+    # Touch the values so memory-mapped pages are really read
+    for column in data:
+        data[column].to_numpy().sum()
+    elapsed = time.perf_counter() - start
+    return elapsed, memory_status("VmHWM") - baseline
+
+
+def main(scales=(10, 100, 1000)):
+    """Compare CSV and Parquet I/O on growing copies of the raw dataset"""
+    data = read_dataset(settings.RAW_DATA_FOLDER, "wholesale_customers_data")
+    projection = settings.NUMERICAL_FEATURE_COLUMNS[:2]
+    rng = np.random.default_rng(settings.RANDOM_STATE)
+    # One task per process, so every read starts from the same baseline
+    context = multiprocessing.get_context("spawn")
+
+    with tempfile.TemporaryDirectory() as folder:
+        for scale in scales:
+            scaled = data.iloc[
+                rng.integers(len(data), size=len(data) * scale)
+            ].reset_index(drop=True)
+            for data_format in ("csv", "parquet"):
+                start = time.perf_counter()
+                path = write_dataset(
+                    scaled, Path(folder), f"data_{scale}", data_format=data_format
+                )
+                write_seconds = time.perf_counter() - start
+                size_mb = path.stat().st_size / 2**20
+
+                cases = [("full", None, False), ("2 columns", projection, False)]
+                if data_format == "parquet":
+                    cases.append(("memory-mapped", None, True))
+                results = []
+                with ProcessPoolExecutor(
+                    1, mp_context=context, max_tasks_per_child=1
+                ) as pool:
+                    for name, columns, memory_map in cases:
+                        seconds, peak_mb = pool.submit(
+                            timed_read, path, columns, memory_map
+                        ).result()
+                        results.append(
+                            f"{name} {seconds * 1000:.1f} ms / {peak_mb:.1f} MiB"
+                        )
+                logger.info(
+                    f"{len(scaled)} rows ({scale}x) {data_format}: {size_mb:.2f} MiB on disk, "
+                    f"write {write_seconds * 1000:.1f} ms, read " + ", ".join(results)
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+"""
+Load test the serving stack
+Starts the API from main.py (or targets a running one), replays request
+payloads at a fixed concurrency from an asyncio client and reports throughput
+and latency percentiles. Results are written as JSON, tagged with the git
+commit, so runs can be compared across commits.
+
+Payloads come from an NDJSON file of PredictionRequest rows, or are drawn
+from the quartiles in the reference statistical summary.
+
+Run with:
+    python -m benchmarks.load_test --concurrency 500 --requests 20000
+    python -m benchmarks.load_test --env API_MAX_BATCH_SIZE=64 --compare results/x.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import urlparse
+import numpy as np
+import pandas as pd
+from src.logging.console_log import setup_logging
+from settings import settings
+
+# setup logging
+logger = setup_logging()
+
+RESULTS_FOLDER = Path(__file__).resolve().parent / "results"
+PERCENTILES = {"p50": 50, "p95": 95, "p99": 99, "p999": 99.9}
+
+
+def synthetic_payloads(
+    n_payloads: int, seed: int = settings.RANDOM_STATE
+) -> List[dict]:
+    """
+    Draw request payloads from the reference statistical summary.
+
+    Each column is sampled by inverse-CDF interpolation between its
+    min/25%/50%/75%/max values, which keeps the skew of the raw data.
+    """
+    summary = pd.read_csv(
+        settings.REFERENCE_FOLDER / "wholesale_customers_statistical_summary.csv",
+        index_col=0,
+    )
+    rng = np.random.default_rng(seed)
+    quantile_levels = [0.0, 0.25, 0.5, 0.75, 1.0]
+    quantile_rows = ["min", "25%", "50%", "75%", "max"]
+    columns = {}
+    for column in settings.NUMERICAL_FEATURE_COLUMNS:
+        values = np.interp(
+            rng.random(n_payloads), quantile_levels, summary.loc[quantile_rows, column]
+        )
+        columns[column] = np.round(values).tolist()
+    for column in settings.CATEGORICAL_COLUMNS:
+        low, high = int(summary.loc["min", column]), int(summary.loc["max", column])
+        columns[column] = rng.integers(low, high + 1, n_payloads).tolist()
+    return [
+        {column: columns[column][i] for column in columns} for i in range(n_payloads)
+    ]
+
+
+def file_payloads(path: Path) -> List[dict]:
+    """Read request payloads from an NDJSON file"""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def build_requests(payloads: List[dict], host: str, path: str) -> List[bytes]:
+    """Pre-encode raw HTTP/1.1 keep-alive requests for each payload"""
+    raw_requests = []
+    for payload in payloads:
+        body = json.dumps(payload).encode()
+        head = (
+            f"POST {path} HTTP/1.1\r\nHost: {host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+        )
+        raw_requests.append(head.encode() + body)
+    return raw_requests
+
+
+async def _client(
+    host: str,
+    port: int,
+    raw_requests: List[bytes],
+    counter: List[int],
+    n_requests: int,
+    latencies: List[float],
+    errors: List[str],
+) -> None:
+    """One keep-alive connection sending requests back to back"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while counter[0] < n_requests:
+            index = counter[0]
+            counter[0] += 1
+            start = time.perf_counter()
+            writer.write(raw_requests[index % len(raw_requests)])
+            await writer.drain()
+            head = await reader.readuntil(b"\r\n\r\n")
+            content_length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    content_length = int(line.split(b":", 1)[1])
+            body = await reader.readexactly(content_length)
+            latencies.append(time.perf_counter() - start)
+            if not head.startswith(b"HTTP/1.1 200"):
+                errors.append(
+                    head.split(b"\r\n", 1)[0].decode() + " " + body[:200].decode()
+                )
+    finally:
+        writer.close()
+
+
+async def run_load(
+    url: str, raw_requests: List[bytes], concurrency: int, n_requests: int
+) -> dict:
+    """Send n_requests over `concurrency` connections and collect latencies"""
+    parsed = urlparse(url)
+    counter = [0]
+    latencies: List[float] = []
+    errors: List[str] = []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *[
+            _client(
+                parsed.hostname,
+                parsed.port or 80,
+                raw_requests,
+                counter,
+                n_requests,
+                latencies,
+                errors,
+            )
+            for _ in range(concurrency)
+        ]
+    )
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.asarray(latencies) * 1e3
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "elapsed_seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed,
+        "latency_ms": {
+            "mean": float(latencies_ms.mean()),
+            **{
+                name: float(np.percentile(latencies_ms, q))
+                for name, q in PERCENTILES.items()
+            },
+            "max": float(latencies_ms.max()),
+        },
+    }
+
+
+def start_server(env_overrides: List[str], port: int, timeout: float = 120.0):
+    """Start main.py with extra settings and wait until it answers /health"""
+    env = {**os.environ, "API_PORT": str(port)}
+    for override in env_overrides:
+        key, value = override.split("=", 1)
+        env[key] = value
+    process = subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=settings.PROJECT_ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(
+                f"http://127.0.0.1:{port}/health", timeout=1
+            ) as r:
+                if r.status == 200:
+                    return process
+        except OSError:
+            time.sleep(0.5)
+    stop_server(process)
+    raise TimeoutError(f"Server did not become healthy within {timeout}s")
+
+
+def stop_server(process) -> None:
+    """Stop the server process group started by `start_server`"""
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=30)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def git_commit() -> Optional[str]:
+    """Current git commit of the repository, if available"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result: dict, baseline_path: Path) -> None:
+    """Log the change of each metric against a previous result file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    logger.info(f"Compared with {baseline_path} (commit {baseline.get('commit')})")
+    pairs = [("throughput_rps", result["throughput_rps"], baseline["throughput_rps"])]
+    pairs += [
+        (name, result["latency_ms"][name], baseline["latency_ms"][name])
+        for name in PERCENTILES
+    ]
+    for name, current, previous in pairs:
+        change = (current - previous) / previous * 100 if previous else float("nan")
+        logger.info(f"  {name}: {previous:.2f} -> {current:.2f} ({change:+.1f}%)")
+
+
+def main():
+    """Run the load test from the command line"""
+    parser = argparse.ArgumentParser(description="Load test the prediction API")
+    parser.add_argument(
+        "--url", default=None, help="Target a running API instead of starting main.py"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=settings.API_PORT + 1,
+        help="Port for the started server",
+    )
+    parser.add_argument("--path", default="/predict", help="Endpoint path")
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        help="KEY=VALUE setting for the started server",
+    )
+    parser.add_argument(
+        "--payloads", type=Path, default=None, help="NDJSON file of request payloads"
+    )
+    parser.add_argument(
+        "--synthetic", type=int, default=1000, help="Number of synthetic payloads"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=100, help="Concurrent connections"
+    )
+    parser.add_argument(
+        "--requests", type=int, default=10_000, help="Measured requests"
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=500, help="Unmeasured warmup requests"
+    )
+    parser.add_argument("--output", type=Path, default=None, help="Result JSON file")
+    parser.add_argument(
+        "--compare",
+        type=Path,
+        default=None,
+        help="Previous result JSON to compare with",
+    )
+    args = parser.parse_args()
+
+    payloads = (
+        file_payloads(args.payloads)
+        if args.payloads
+        else synthetic_payloads(args.synthetic)
+    )
+    server = None
+    url = args.url
+    if url is None:
+        logger.info(f"Starting server on port {args.port} with {args.env}")
+        server = start_server(args.env, args.port)
+        url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        parsed = urlparse(url)
+        raw_requests = build_requests(payloads, parsed.netloc, args.path)
+        if args.warmup:
+            asyncio.run(
+                run_load(
+                    url, raw_requests, min(args.concurrency, args.warmup), args.warmup
+                )
+            )
+        stats = asyncio.run(
+            run_load(url, raw_requests, args.concurrency, args.requests)
+        )
+    finally:
+        if server is not None:
+            stop_server(server)
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "url": url,
+            "path": args.path,
+            "server_env": args.env,
+            "payloads": str(args.payloads)
+            if args.payloads
+            else f"synthetic:{args.synthetic}",
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+        },
+        "machine": {"platform": platform.platform(), "cpus": os.cpu_count()},
+        **stats,
+    }
+    latency = result["latency_ms"]
+    logger.info(
+        f"{result['requests']} requests, {result['errors']} errors, "
+        f"{result['throughput_rps']:.0f} req/s, p50 {latency['p50']:.1f} ms, "
+        f"p95 {latency['p95']:.1f} ms, p99 {latency['p99']:.1f} ms, p999 {latency['p999']:.1f} ms"
+    )
+
+    output = args.output or RESULTS_FOLDER / (
+        f"load_{datetime.now(timezone.utc):%Y%m%dT%H%M%S}_{result['commit'] or 'nogit'}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=4)
+    logger.info(f"Results saved to {output}")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,17 +3,68 @@ Model Serving API using LiteServe
 """
 
 from src.api.api_serving import ModelAPIServing
+from src.api.bulk_serving import add_bulk_endpoint
+from src.api.model_store import ModelStore
+from src.api.serving_metrics import (
+    add_metrics_endpoint,
+    queue_wait_loop,
+    reset_serving_metrics,
+)
+from src.api.workers import available_cpus, inference_workers, limit_worker_threads
+from src.logging.console_log import setup_logging
+from src.monitoring.drift_monitor import reset_drift_snapshots
 from settings import settings
+import gc
 import litserve as ls
 
+# setup logging
+logger = setup_logging()
+
 
 if __name__ == "__main__":
     # Serve the model
-    api = ModelAPIServing()
+    reset_serving_metrics()
+    reset_drift_snapshots()
+
+    # One inference worker per available CPU, each with single-threaded
+    # BLAS/OpenMP pools; the spawned workers inherit the limits
+    workers = inference_workers(settings.API_WORKERS)
+    limit_worker_threads(settings.WORKER_THREADS)
+    logger.info(
+        f"Starting {workers} inference workers ({available_cpus()} CPUs available, "
+        f"{settings.WORKER_THREADS} threads each)"
+    )
+
+    # Load and validate the model for /predict_batch, which runs in the API
+    # server processes; LitServe forks those, so they share it copy-on-write.
+    # The inference workers are spawned and load their own bundle in setup():
+    # only the memory-mapped .npy arrays of the flat backend are shared with
+    # them, through the page cache
+    feature_columns = settings.NUMERICAL_FEATURE_COLUMNS + settings.CATEGORICAL_COLUMNS
+    model_store = ModelStore(feature_columns)
+    logger.info(f"Model version {model_store.bundle.version} preloaded")
+
+    api = ModelAPIServing(
+        api_path="/predict",
+        max_batch_size=settings.API_MAX_BATCH_SIZE,
+        batch_timeout=settings.API_BATCH_TIMEOUT,
+        # The worker loop measures how long each request waits to be predicted
+        loop=queue_wait_loop(settings.API_MAX_BATCH_SIZE),
+    )
     server = ls.LitServer(
         api,
-        api_path="/predict",
+        accelerator="cpu",
+        devices=1,
+        workers_per_device=workers,
         track_requests=True,
     )
+    add_bulk_endpoint(server.app, path="/predict_batch", model_store=model_store)
+    add_metrics_endpoint(server.app, path="/metrics")
+
+    # Keep the garbage collector from touching (and so copying) the objects
+    # loaded so far in the forked API server processes; the spawned inference
+    # workers do not inherit them
+    gc.freeze()
 
-    server.run(port=settings.API_PORT)
+    # log_config=None routes uvicorn's access logs through setup_logging
+    server.run(port=settings.API_PORT, log_config=None)
@@ -3,11 +3,8 @@ Repository Configuration Settings
 """
 
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional, Union
 from pydantic_settings import BaseSettings
-from src.logging.console_log import setup_logging
-
-logger = setup_logging()
 
 
 class Settings(BaseSettings):
@@ -20,8 +17,19 @@ class Settings(BaseSettings):
     REFERENCE_FOLDER: Path = DATA_FOLDER / "reference"
     SAVED_MODEL_FOLDER: Path = PROJECT_ROOT / "saved_model"
     MODEL_PATH: Path = SAVED_MODEL_FOLDER / "model/model.pkl"
+    MODEL_ARTIFACT_PATH: Path = SAVED_MODEL_FOLDER / "model/flat_forest"
+    COMPRESSED_MODEL_PATH: Path = SAVED_MODEL_FOLDER / "model/compressed/model.pkl"
+    COMPRESSED_MODEL_ARTIFACT_PATH: Path = (
+        SAVED_MODEL_FOLDER / "model/compressed/flat_forest"
+    )
     SCALER_PATH: Path = SAVED_MODEL_FOLDER / "preprocessor/scaler.pkl"
+    SCALER_ARTIFACT_PATH: Path = SAVED_MODEL_FOLDER / "preprocessor/scaler"
+    SEEN_ROWS_PATH: Path = SAVED_MODEL_FOLDER / "preprocessor/seen_rows.npy"
     METRICS_PATH: Path = SAVED_MODEL_FOLDER / "metrics"
+    DRIFT_REFERENCE_PATH: Path = REFERENCE_FOLDER / "reference_sketches.json"
+    PIPELINE_CACHE_FOLDER: Path = PROJECT_ROOT / ".cache/pipeline"
+    DATA_SNAPSHOT_FOLDER: Path = DATA_FOLDER / "snapshots"
+    DATA_INGEST_FOLDER: Path = DATA_FOLDER / "incoming"
 
     # Data Configuration
     TARGET_COLUMN_NAME: str = "Region"
@@ -35,12 +43,146 @@ class Settings(BaseSettings):
     ]
     CATEGORICAL_COLUMNS: List[str] = ["Channel"]
 
+    # Dataset storage between the pipeline stages: "parquet" (typed, compressed
+    # with DATA_COMPRESSION, column projection) or "csv"
+    DATA_FORMAT: str = "parquet"
+    DATA_COMPRESSION: str = "zstd"
+
+    # Source dataset: collect_data reads it from a checksummed snapshot in
+    # DATA_SNAPSHOT_FOLDER and fetches it from the UCI repository only when
+    # there is none or its version is below DATA_SOURCE_VERSION (bump it to
+    # refresh). DATA_OFFLINE never fetches. CSV/Parquet files of new customer
+    # records in DATA_INGEST_FOLDER are appended to the snapshot once.
+    DATA_SOURCE_VERSION: int = 1
+    DATA_OFFLINE: bool = False
+
     # Model Configuration
     RANDOM_STATE: int = 42
     TEST_SIZE: float = 0.2
+    # Parameters of the trained forest when tuning is off
+    MODEL_PARAMS: Dict[str, Optional[Union[int, str]]] = {
+        "n_estimators": 100,
+        "max_depth": 10,
+    }
+    # Processes fitting the trees (-1: all cores)
+    TRAIN_N_JOBS: int = -1
+
+    # ADASYN oversampling: the neighbour searches run on OVERSAMPLING_N_JOBS
+    # threads (-1: all cores) and their results are cached per training data
+    # in OVERSAMPLING_CACHE_FOLDER
+    OVERSAMPLING_N_JOBS: int = -1
+    OVERSAMPLING_CACHE_FOLDER: Path = PIPELINE_CACHE_FOLDER / "neighbors"
+
+    # Incremental retraining: only training rows not seen before are
+    # preprocessed, they update the scaler statistics, and
+    # INCREMENTAL_NEW_TREES trees fitted on them are added to the forest, whose
+    # oldest trees are retired beyond INCREMENTAL_MAX_TREES
+    TRAIN_INCREMENTAL: bool = False
+    INCREMENTAL_NEW_TREES: int = 20
+    INCREMENTAL_MAX_TREES: int = 100
+
+    # Hyperparameter tuning: TUNING_CANDIDATES configurations drawn from
+    # TUNING_SEARCH_SPACE are cross-validated with successive halving, keeping
+    # 1 / TUNING_HALVING_FACTOR of them per round. The smallest forest scoring
+    # within TUNING_TOLERANCE of the best is trained.
+    TRAIN_TUNING: bool = False
+    TUNING_SEARCH_SPACE: Dict[str, List[Optional[Union[int, str]]]] = {
+        "n_estimators": [25, 50, 100, 200],
+        "max_depth": [4, 6, 10, 16, None],
+        "min_samples_leaf": [1, 2, 4, 8],
+        "max_features": ["sqrt", "log2", None],
+    }
+    TUNING_CANDIDATES: int = 48
+    TUNING_HALVING_FACTOR: int = 3
+    TUNING_CV_FOLDS: int = 5
+    TUNING_SCORING: str = "f1_weighted"
+    TUNING_TOLERANCE: float = 0.01
+    TUNING_N_JOBS: int = -1
+
+    # Evaluation: the test set is scored in chunks of EVAL_CHUNK_SIZE rows.
+    # Metrics get EVAL_CONFIDENCE bootstrap intervals from
+    # EVAL_BOOTSTRAP_RESAMPLES resamples (0 disables them) drawn on
+    # EVAL_N_JOBS processes (-1: all cores). EVAL_PLOT saves the confusion
+    # matrix plot, which needs matplotlib.
+    EVAL_CHUNK_SIZE: int = 100_000
+    EVAL_BOOTSTRAP_RESAMPLES: int = 1000
+    EVAL_CONFIDENCE: float = 0.95
+    EVAL_N_JOBS: int = -1
+    EVAL_PLOT: bool = True
+
+    # Post-training compression: the cheapest sub-forest, shallower re-fit or
+    # distilled tree whose test accuracy and F1 stay within
+    # COMPRESSION_TOLERANCE of the full forest is saved next to it, and served
+    # instead of it when SERVE_COMPRESSED_MODEL is set
+    COMPRESSION_TOLERANCE: float = 0.01
+    SERVE_COMPRESSED_MODEL: bool = True
+
+    # Serving backend: "sklearn" (pickled RandomForestClassifier) or "flat"
+    # (flat-array engine exported by the training step)
+    MODEL_BACKEND: str = "sklearn"
 
     # API Configuration
     API_PORT: int = 8000
+    # Inference worker processes: API_WORKERS=0 starts one per CPU the
+    # container may use (affinity mask and cgroup CPU quota). The BLAS/OpenMP
+    # thread pools of each worker are limited to WORKER_THREADS threads.
+    API_WORKERS: int = 0
+    WORKER_THREADS: int = 1
+    # Dynamic batching: requests arriving within API_BATCH_TIMEOUT seconds are
+    # grouped (up to API_MAX_BATCH_SIZE) into a single predict call.
+    # API_MAX_BATCH_SIZE=1 disables batching.
+    API_MAX_BATCH_SIZE: int = 1
+    API_BATCH_TIMEOUT: float = 0.0
+    # Poll the saved_model folder every MODEL_RELOAD_INTERVAL seconds and
+    # hot-swap validated new model versions. 0 disables reloading.
+    MODEL_RELOAD_INTERVAL: float = 0.0
+    # In-process prediction cache keyed on the request features and model
+    # version. PREDICTION_CACHE_SIZE=0 disables the cache.
+    PREDICTION_CACHE_SIZE: int = 0
+    PREDICTION_CACHE_TTL: float = 300.0
+    # Candidate models served next to the primary one, each from a folder laid
+    # out like saved_model. In "canary" mode a CANARY_FRACTION of the /predict
+    # calls is answered by a candidate; in "shadow" mode the candidates score
+    # every call in SHADOW_WORKERS background threads and are only recorded.
+    # The model that did not answer scores the same rows off the response
+    # path; comparisons beyond SHADOW_MAX_PENDING queued calls are dropped.
+    CANDIDATE_MODEL_FOLDERS: List[Path] = []
+    CANDIDATE_MODE: str = "shadow"
+    CANARY_FRACTION: float = 0.1
+    SHADOW_WORKERS: int = 1
+    SHADOW_MAX_PENDING: int = 64
+    # Rows scored per vectorized predict call on the /predict_batch endpoint
+    BULK_CHUNK_SIZE: int = 1024
+    # Largest JSON row accepted on /predict_batch; a longer unfinished row fails
+    BULK_MAX_ROW_BYTES: int = 65536
+    # Per-stage latency histograms and counters exposed on /metrics. Each
+    # serving process records into its own file in SERVING_METRICS_FOLDER.
+    SERVING_METRICS_ENABLED: bool = True
+    SERVING_METRICS_FOLDER: Path = PROJECT_ROOT / "logs/metrics"
+
+    # Logging: LOG_FORMAT is "text" or "json". LOG_ASYNC hands records to a
+    # background writer through a buffer of LOG_BUFFER_SIZE records; records
+    # are dropped and counted when it is full. Per-request records (access
+    # logs) are kept with probability LOG_SAMPLE_RATE.
+    LOG_FORMAT: str = "text"
+    LOG_ASYNC: bool = False
+    LOG_BUFFER_SIZE: int = 10000
+    LOG_SAMPLE_RATE: float = 1.0
+
+    # Live drift monitoring: served feature values are summarised in
+    # per-column quantile sketches of size DRIFT_SKETCH_SIZE and compared with
+    # the training reference every DRIFT_WINDOW_SECONDS, once at least
+    # DRIFT_MIN_SAMPLES rows were seen. A column drifts when its KS statistic
+    # or PSI exceeds the threshold.
+    DRIFT_MONITOR_ENABLED: bool = True
+    DRIFT_SKETCH_SIZE: int = 200
+    DRIFT_WINDOW_SECONDS: float = 300.0
+    DRIFT_MIN_SAMPLES: int = 500
+    DRIFT_KS_THRESHOLD: float = 0.1
+    DRIFT_PSI_THRESHOLD: float = 0.2
+    # Jensen-Shannon divergence (bits) threshold of the batch drift report
+    DRIFT_JS_THRESHOLD: float = 0.05
+    SERVING_DRIFT_FOLDER: Path = PROJECT_ROOT / "logs/drift"
 
     class Config:
         env_file = ".config_params"
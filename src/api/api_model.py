@@ -18,3 +18,4 @@ class PredictionRequest(BaseModel):
 class PredictionResponse(BaseModel):
     prediction: int
     probability: float
+    model_version: str
@@ -6,62 +6,224 @@ and the preprocessing steps have been saved in the preprocessing folder.
 """
 
 import litserve as ls
+from fastapi.responses import Response
 from src.logging.console_log import setup_logging
-from src.api.api_model import PredictionRequest, PredictionResponse
-from src.data.preprocess_data import preprocess_transform
+from src.api.candidates import load_candidates
+from src.api.codec import RequestDecoder, RequestError
+from src.api.model_store import ModelBundle, ModelStore
+from src.api.prediction_cache import PredictionCache
+from src.api import serving_metrics
+from src.api.serving_metrics import PRIMARY_MODEL
+from src.monitoring.drift_monitor import load_drift_monitor
 from settings import settings
-import pandas as pd
 import numpy as np
-import pickle
+import time
+import warnings
+from typing import List, Optional, Tuple
 
 
 # setup logging
 logger = setup_logging()
 
+# The model is fitted on a DataFrame but served with plain arrays whose column
+# order is checked against the fitted feature names when the model is loaded
+warnings.filterwarnings(
+    "ignore", message="X does not have valid feature names", category=UserWarning
+)
+
 
 class ModelAPIServing(ls.LitAPI):
     def setup(self, device):
         """Setup the model for serving"""
-        # Load the model
-        logger.info(f"Loading model from {settings.MODEL_PATH}")
-        if not settings.MODEL_PATH.exists():
-            raise FileNotFoundError(f"Model not found at {settings.MODEL_PATH}")
-        with open(settings.MODEL_PATH, "rb") as file:
-            self.model = pickle.load(file)
-        logger.info(f"Model loaded successfully from {settings.MODEL_PATH}")
-
-        # Load the scaler
-        logger.info(f"Loading scaler from {settings.SCALER_PATH}")
-        if not settings.SCALER_PATH.exists():
-            raise FileNotFoundError(f"Scaler not found at {settings.SCALER_PATH}")
-        with open(settings.SCALER_PATH, "rb") as file:
-            self.scaler = pickle.load(file)
-        logger.info(f"Scaler loaded successfully from {settings.SCALER_PATH}")
-
-        # Get class labels
-        self.class_labels = self.model.classes_
-
-    def decode_request(self, request: PredictionRequest, context) -> list:
-        """Decode the incoming request"""
-        return pd.DataFrame(request.model_dump(), index=[0])
-
-    def predict(self, features, context) -> PredictionResponse:
-        """Make a prediction"""
-        # Preprocess the data
-        transformed_features = preprocess_transform(
-            features,
-            self.scaler,
-            settings.NUMERICAL_FEATURE_COLUMNS,
-            settings.CATEGORICAL_COLUMNS,
+        # Fix the feature order once; requests are decoded straight into arrays
+        self.feature_columns = (
+            settings.NUMERICAL_FEATURE_COLUMNS + settings.CATEGORICAL_COLUMNS
+        )
+        self.n_features = len(self.feature_columns)
+        self.decoder = RequestDecoder(self.feature_columns)
+
+        # Load and validate the model and scaler pair
+        logger.info(
+            f"Loading {settings.MODEL_BACKEND} model from {settings.SAVED_MODEL_FOLDER}"
         )
+        self.model_store = ModelStore(self.feature_columns)
+        logger.info(
+            f"Model version {self.model_store.bundle.version} loaded successfully"
+        )
+
+        # Candidate models answer a share of the calls or score them in the background
+        self.candidates = load_candidates(self.model_store)
+
+        if settings.MODEL_RELOAD_INTERVAL > 0:
+            self.model_store.start_watching(settings.MODEL_RELOAD_INTERVAL)
+            if self.candidates is not None:
+                self.candidates.start_watching(settings.MODEL_RELOAD_INTERVAL)
+
+        self.prediction_cache = None
+        if settings.PREDICTION_CACHE_SIZE > 0:
+            self.prediction_cache = PredictionCache(
+                settings.PREDICTION_CACHE_SIZE, settings.PREDICTION_CACHE_TTL
+            )
+            logger.info(
+                f"Prediction cache enabled (size={settings.PREDICTION_CACHE_SIZE}, "
+                f"ttl={settings.PREDICTION_CACHE_TTL}s)"
+            )
+
+        # Summarise the served features for live drift detection
+        self.drift_monitor = load_drift_monitor(self.feature_columns)
+
+        # Workers are spawned, so each records into its own metrics file
+        serving_metrics.bind_worker_metrics()
+
+    def decode_request(self, request: dict, context) -> Optional[np.ndarray]:
+        """Decode the incoming JSON object into a float64 feature row
+
+        An invalid request must not raise here, which would fail every request
+        batched with it: its error is kept in the context, None takes the
+        place of its row and `encode_response` answers it with a 422.
+        """
+        request = serving_metrics.unwrap_request(request, context)
+        start = time.perf_counter()
+        try:
+            features = self.decoder.decode(request)
+        except RequestError as e:
+            context["error"] = e
+            return None
+        serving_metrics.stage_seconds["decode"].observe(time.perf_counter() - start)
+        if self.drift_monitor is not None:
+            self._observe_drift(features)
+        return features
 
-        # Make a prediction
-        prediction = self.model.predict_proba(transformed_features)
+    def _observe_drift(self, features: np.ndarray) -> None:
+        """Feed a decoded row to the drift monitor and count drifting windows"""
+        scores = self.drift_monitor.observe(features)
+        if scores is None:
+            return
+        serving_metrics.drift_windows.inc()
+        for column, column_scores in scores.items():
+            if column_scores["drift"]:
+                serving_metrics.drift_flags[column].inc()
+
+    def batch(
+        self, inputs: List[Optional[np.ndarray]], context
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Stack the valid decoded requests into a single feature matrix
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Rows of the valid requests and the
+            validity mask of all requests
+        """
+        valid = np.array([row is not None for row in inputs])
+        rows = [row for row in inputs if row is not None]
+        features = np.stack(rows) if rows else np.empty((0, self.n_features))
+        return features, valid
+
+    def _valid_rows(self, x) -> Tuple[np.ndarray, np.ndarray]:
+        """Feature rows and validity mask of a batch, or of a single decoded request"""
+        if isinstance(x, tuple):
+            return x
+        if x is None:
+            return np.empty((0, self.n_features)), np.zeros(1, dtype=bool)
+        return x.reshape(-1, self.n_features), np.ones(1, dtype=bool)
+
+    def predict(self, x, context) -> Tuple[np.ndarray, ModelBundle]:
+        """Make a prediction, one row of class probabilities per request
+
+        Only the valid requests are scored; the rows of invalid ones are NaN
+        and answered with their validation error by `encode_response`.
+        """
+        serving_metrics.record_queue_wait(context)
+        serving_metrics.record_dropped_log_records()
+        # Pin one model version for the whole batch
+        bundle = self.model_store.bundle
+        features, valid = self._valid_rows(x)
+        output = np.full((len(valid), len(bundle.class_labels)), np.nan)
+        if not len(features):
+            return output, bundle
+        serving_metrics.batch_size.observe(len(features))
+        candidate = None
+        if self.candidates is not None:
+            candidate = self.candidates.route()
+            if candidate is not None:
+                bundle = self.candidates.stores[candidate].bundle
+            # Scaling is in place; keep the raw rows for the comparison
+            raw_features = features.copy()
+        try:
+            if candidate is not None or self.prediction_cache is None:
+                # Canary calls bypass the cache, which holds one model version
+                prediction = self._predict_bundle(features, bundle, candidate)
+            else:
+                prediction = self._predict_cached(features, bundle)
+        except Exception:
+            serving_metrics.prediction_errors.inc()
+            raise
+        if self.candidates is not None:
+            self.candidates.compare(
+                raw_features, prediction, bundle, served_by=candidate
+            )
+        output[valid] = prediction
+        return output, bundle
+
+    def _predict_bundle(
+        self, features: np.ndarray, bundle: ModelBundle, candidate: Optional[str] = None
+    ) -> np.ndarray:
+        """Scale and predict, timing the two stages separately"""
+        start = time.perf_counter()
+        transformed_features = bundle.transform(features)
+        scaled = time.perf_counter()
+        prediction = bundle.model.predict_proba(transformed_features)
+        done = time.perf_counter()
+        serving_metrics.stage_seconds["preprocess"].observe(scaled - start)
+        serving_metrics.stage_seconds["inference"].observe(done - scaled)
+        model = candidate or PRIMARY_MODEL
+        serving_metrics.model_seconds[model].observe(done - start)
+        serving_metrics.served_rows[model].inc(len(features))
         return prediction
 
-    def encode_response(self, response, context) -> PredictionResponse:
-        """Encode the response"""
-        return PredictionResponse(
-            prediction=self.class_labels[np.argmax(response, axis=1)].tolist()[0],
-            probability=np.max(response).tolist(),
+    def _predict_cached(self, features: np.ndarray, bundle: ModelBundle) -> np.ndarray:
+        """Serve rows from the prediction cache and predict only the misses"""
+        cache = self.prediction_cache
+        cache.use_version(bundle.version)
+        keys = [cache.key(row) for row in features]
+        cached = [cache.get(key) for key in keys]
+        missing = [i for i, probabilities in enumerate(cached) if probabilities is None]
+        serving_metrics.cache_hits.inc(len(features) - len(missing))
+        serving_metrics.cache_misses.inc(len(missing))
+        if not missing:
+            return np.stack(cached)
+
+        prediction = np.empty((len(features), len(bundle.class_labels)))
+        prediction[missing] = self._predict_bundle(features[missing], bundle)
+        for i, probabilities in enumerate(cached):
+            if probabilities is None:
+                cache.put(keys[i], prediction[i].copy())
+            else:
+                prediction[i] = probabilities
+        serving_metrics.cache_size.set(cache.stats()["size"])
+        return prediction
+
+    def unbatch(self, output: Tuple[np.ndarray, ModelBundle], context) -> list:
+        """Split the batched probabilities back into one row per request"""
+        prediction, bundle = output
+        return [(probabilities, bundle) for probabilities in prediction]
+
+    def encode_response(self, response, context) -> Response:
+        """Encode the response as a JSON PredictionResponse
+
+        `response` pairs the probabilities with the bundle that produced them;
+        the probabilities are either the (1, n_classes) output of an unbatched
+        predict or a single (n_classes,) row produced by `unbatch`. The body
+        is serialized here, so the API server sends it back as it is.
+        """
+        error = context.get("error")
+        if error is not None:
+            return Response(
+                error.to_json(), status_code=422, media_type="application/json"
+            )
+        start = time.perf_counter()
+        probabilities, bundle = response
+        encoded = Response(
+            bundle.encoder.encode(probabilities), media_type="application/json"
         )
+        serving_metrics.stage_seconds["encode"].observe(time.perf_counter() - start)
+        return encoded
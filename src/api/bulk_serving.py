@@ -0,0 +1,240 @@
+"""
+Bulk Serving Module
+Adds a /predict_batch endpoint for scoring many rows over one connection.
+The body is a JSON array or NDJSON stream of PredictionRequest objects; rows
+are scored in fixed-size vectorized chunks and NDJSON predictions are
+streamed back while the body is still being read, so memory stays bounded
+regardless of payload size.
+"""
+
+import codecs
+import json
+import re
+from typing import AsyncIterator, List, Optional
+import numpy as np
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from src.logging.console_log import setup_logging
+from src.api.codec import RequestDecoder, RequestError
+from src.api.model_store import ModelStore
+from settings import settings
+
+# setup logging
+logger = setup_logging()
+
+_WHITESPACE = " \t\r\n"
+# Ends of a buffer that a later chunk can still turn into valid JSON, from
+# the position of the decode error: an open string, the start of a literal
+# or escape, and a number cut before its fraction or exponent
+_OPEN_STRING = re.compile(r'"(?:[^"\\]|\\.)*\\?', re.DOTALL)
+_CUT_TOKEN = re.compile(r"u[0-9a-fA-F]{0,4}|\.|[eE][-+]?")
+_LITERALS = ("true", "false", "null", "NaN", "Infinity", "-Infinity")
+
+
+def _is_cut(tail: str) -> bool:
+    """Whether a decode error at the start of `tail` may be due to the end of the buffer"""
+    return (
+        tail == ""
+        or _OPEN_STRING.fullmatch(tail) is not None
+        or _CUT_TOKEN.fullmatch(tail) is not None
+        or any(literal.startswith(tail) for literal in _LITERALS)
+    )
+
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """StreamingResponse that leaves `receive` to the request body reader
+
+    Starlette's StreamingResponse listens for client disconnects on
+    `receive`, which would swallow request body chunks that are still being
+    read while predictions stream back.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+
+
+async def iter_json_rows(
+    chunks: AsyncIterator[bytes], max_row_size: int = settings.BULK_MAX_ROW_BYTES
+) -> AsyncIterator[dict]:
+    """
+    Incrementally parse JSON objects from a JSON array or NDJSON byte stream.
+
+    Only an object cut by the end of the received data is kept for the next
+    chunk, up to `max_row_size` characters; malformed data fails at once.
+
+    Args:
+        chunks (AsyncIterator[bytes]): Raw body chunks
+        max_row_size (int): Largest JSON object accepted, in characters
+
+    Yields:
+        dict: One parsed JSON object per row
+
+    Raises:
+        ValueError: If the body is not an array or stream of JSON objects
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    is_array: Optional[bool] = None
+    array_closed = False
+    finished = False
+
+    while not finished:
+        try:
+            chunk = await chunks.__anext__()
+            buffer += text_decoder.decode(chunk)
+        except StopAsyncIteration:
+            buffer += text_decoder.decode(b"", final=True)
+            finished = True
+
+        position = 0
+        while True:
+            # Skip separators between rows
+            while position < len(buffer) and (
+                buffer[position] in _WHITESPACE
+                or (is_array and buffer[position] == ",")
+            ):
+                position += 1
+            if position == len(buffer):
+                break
+
+            if is_array is None:
+                is_array = buffer[position] == "["
+                if is_array:
+                    position += 1
+                continue
+            if array_closed:
+                raise ValueError("Unexpected data after the closing bracket")
+            if is_array and buffer[position] == "]":
+                array_closed = True
+                position += 1
+                continue
+            if buffer[position] != "{":
+                raise ValueError(f"Expected a JSON object, got {buffer[position]!r}")
+
+            try:
+                row, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                if not _is_cut(buffer[e.pos :]):
+                    raise ValueError(f"Invalid JSON object: {e}") from None
+                if finished:
+                    raise ValueError("Body ends with an incomplete JSON object")
+                if len(buffer) - position > max_row_size:
+                    raise ValueError(
+                        f"JSON object exceeds {max_row_size} characters"
+                    ) from None
+                # Incomplete object, wait for the next chunk
+                break
+            yield row
+        buffer = buffer[position:]
+
+    if is_array and not array_closed:
+        raise ValueError("JSON array is not closed")
+
+
+class BulkScorer:
+    """Scores chunks of raw request rows into NDJSON prediction lines"""
+
+    def __init__(self, feature_columns: List[str], model_store: ModelStore):
+        self.feature_columns = feature_columns
+        self.model_store = model_store
+        self.decoder = RequestDecoder(feature_columns, loc_prefix=())
+
+    def score(self, rows: List[dict], first_row: int) -> bytes:
+        """
+        Score a chunk of rows with one vectorized predict call.
+
+        Rows that fail validation produce an error line in their position.
+
+        Args:
+            rows (List[dict]): Raw request rows
+            first_row (int): Index of the first row in the whole body
+
+        Returns:
+            bytes: One NDJSON line per row
+        """
+        features = np.empty((len(rows), len(self.feature_columns)), dtype=np.float64)
+        errors = {}
+        for i, row in enumerate(rows):
+            try:
+                features[i] = self.decoder.values(row)
+            except RequestError as e:
+                errors[i] = e.errors
+                features[i] = 0.0
+
+        bundle = self.model_store.bundle
+        lines = bundle.encoder.encode_rows(bundle.predict_proba(features))
+        for i, error in errors.items():
+            lines[i] = json.dumps(
+                {"row": first_row + i, "error": error},
+                default=str,
+                separators=(",", ":"),
+            ).encode()
+        return b"\n".join(lines) + b"\n"
+
+
+def add_bulk_endpoint(
+    app,
+    path: str = "/predict_batch",
+    chunk_size: int = settings.BULK_CHUNK_SIZE,
+    model_store: Optional[ModelStore] = None,
+) -> None:
+    """
+    Register the bulk scoring endpoint on the server's FastAPI app.
+
+    The model is loaded in the API server process on the first bulk request,
+    unless a store loaded before the API server processes are forked is given.
+
+    Args:
+        app (FastAPI): The LitServer app
+        path (str): Endpoint path
+        chunk_size (int): Rows scored per vectorized predict call
+        model_store (Optional[ModelStore]): Preloaded store, shared copy-on-write
+    """
+    scorer: Optional[BulkScorer] = None
+
+    def get_scorer() -> BulkScorer:
+        nonlocal scorer, model_store
+        if scorer is None:
+            feature_columns = (
+                settings.NUMERICAL_FEATURE_COLUMNS + settings.CATEGORICAL_COLUMNS
+            )
+            if model_store is None:
+                model_store = ModelStore(feature_columns)
+            # The watcher thread is started after the fork, in the API server process
+            if settings.MODEL_RELOAD_INTERVAL > 0:
+                model_store.start_watching(settings.MODEL_RELOAD_INTERVAL)
+            scorer = BulkScorer(feature_columns, model_store)
+        return scorer
+
+    @app.post(path)
+    async def predict_batch(request: Request) -> StreamingResponse:
+        """Score a JSON array or NDJSON body, streaming NDJSON predictions"""
+        bulk_scorer = await run_in_threadpool(get_scorer)
+
+        async def stream_predictions():
+            n_rows = 0
+            chunk = []
+            try:
+                async for row in iter_json_rows(request.stream()):
+                    chunk.append(row)
+                    if len(chunk) == chunk_size:
+                        yield await run_in_threadpool(bulk_scorer.score, chunk, n_rows)
+                        n_rows += len(chunk)
+                        chunk = []
+                if chunk:
+                    yield await run_in_threadpool(bulk_scorer.score, chunk, n_rows)
+                    n_rows += len(chunk)
+            except ValueError as e:
+                # The status line is already sent; report the error in-band
+                logger.warning(f"Bulk request aborted after {n_rows} rows: {e}")
+                yield (
+                    json.dumps({"error": str(e)}, separators=(",", ":")) + "\n"
+                ).encode()
+                return
+            logger.bind(per_request=True).info(f"Bulk request scored {n_rows} rows")
+
+        return _DuplexStreamingResponse(
+            stream_predictions(), media_type="application/x-ndjson"
+        )
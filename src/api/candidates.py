@@ -0,0 +1,166 @@
+"""
+Candidate Models Module
+Serves candidate model versions next to the primary one, so a retrained
+model can be promoted on real traffic. In "canary" mode a fraction of the
+predict calls is answered by a candidate; in "shadow" mode the candidates
+only score copies of the served rows. Either way the model that did not
+answer scores the same rows in a background thread pool, off the response
+path, and the agreement of the predicted classes is recorded per candidate.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from src.logging.console_log import setup_logging
+from src.api.model_store import ModelBundle, ModelStore
+from src.api import serving_metrics
+from src.api.serving_metrics import PRIMARY_MODEL
+from settings import settings
+
+# setup logging
+logger = setup_logging()
+
+CANDIDATE_MODES = ("shadow", "canary")
+
+
+class CandidateModels:
+    """Routes predict calls to candidates and compares them with the primary
+
+    Args:
+        primary (ModelStore): Store of the primary model
+        model_folders (List[Path]): Folders laid out like saved_model, one per candidate
+        mode (str): "shadow" or "canary"
+        canary_fraction (float): Share of the predict calls answered by a candidate in canary mode
+        workers (int): Background threads scoring the comparisons
+        max_pending (int): Queued comparisons beyond which new ones are dropped
+        seed (Optional[int]): Seed of the canary routing
+    """
+
+    def __init__(
+        self,
+        primary: ModelStore,
+        model_folders: List[Path],
+        mode: str = "shadow",
+        canary_fraction: float = 0.1,
+        workers: int = 1,
+        max_pending: int = 64,
+        seed: Optional[int] = None,
+    ):
+        if mode not in CANDIDATE_MODES:
+            raise ValueError(
+                f"Unsupported candidate mode {mode}, expected one of {list(CANDIDATE_MODES)}"
+            )
+        names = [Path(folder).name for folder in model_folders]
+        if len(set(names)) != len(names) or PRIMARY_MODEL in names:
+            raise ValueError(
+                f"Candidate folder names must be unique and not {PRIMARY_MODEL!r}: {names}"
+            )
+
+        self.primary = primary
+        self.mode = mode
+        self.canary_fraction = canary_fraction
+        self.stores: Dict[str, ModelStore] = {
+            name: ModelStore(primary.feature_columns, Path(folder))
+            for name, folder in zip(names, model_folders)
+        }
+        self._random = random.Random(seed)
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="candidate"
+        )
+        self._pending = threading.Semaphore(max_pending)
+        for name, store in self.stores.items():
+            logger.info(
+                f"Candidate {name} serves model version {store.bundle.version} in {mode} mode"
+            )
+
+    def start_watching(self, interval: float) -> None:
+        """Hot-reload the candidate models like the primary"""
+        for store in self.stores.values():
+            store.start_watching(interval)
+
+    def route(self) -> Optional[str]:
+        """
+        Pick the model answering a predict call.
+
+        Returns:
+            Optional[str]: Name of the candidate in canary mode, None for the primary
+        """
+        if self.mode == "canary" and self._random.random() < self.canary_fraction:
+            return self._random.choice(list(self.stores))
+        return None
+
+    def compare(
+        self,
+        features: np.ndarray,
+        probabilities: np.ndarray,
+        bundle: ModelBundle,
+        served_by: Optional[str] = None,
+    ) -> None:
+        """
+        Score the rows of a predict call with the models that did not answer
+        it, in the background.
+
+        Args:
+            features (np.ndarray): Raw feature rows, owned by the comparison
+            probabilities (np.ndarray): Class probabilities that were served
+            bundle (ModelBundle): Bundle that produced them
+            served_by (Optional[str]): Candidate that answered, None for the primary
+        """
+        if served_by is not None:
+            # Canary call: the primary scores the rows the candidate answered
+            comparisons = {served_by: self.primary}
+        elif self.mode == "shadow":
+            comparisons = self.stores
+        else:
+            return
+
+        served_labels = bundle.class_labels[np.argmax(probabilities, axis=1)]
+        for candidate, store in comparisons.items():
+            if not self._pending.acquire(blocking=False):
+                serving_metrics.dropped_rows[candidate].inc(len(features))
+                continue
+            model = PRIMARY_MODEL if served_by is not None else candidate
+            future = self._pool.submit(
+                self._compare, candidate, model, store.bundle, features, served_labels
+            )
+            future.add_done_callback(lambda _: self._pending.release())
+
+    def _compare(
+        self,
+        candidate: str,
+        model: str,
+        bundle: ModelBundle,
+        features: np.ndarray,
+        served_labels: np.ndarray,
+    ) -> None:
+        """Score the rows with `model` and count the rows on which it agrees"""
+        try:
+            start = time.perf_counter()
+            probabilities = bundle.predict_proba(features.copy())
+            serving_metrics.model_seconds[model].observe(time.perf_counter() - start)
+            labels = bundle.class_labels[np.argmax(probabilities, axis=1)]
+            serving_metrics.compared_rows[candidate].inc(len(features))
+            serving_metrics.agreed_rows[candidate].inc(
+                int(np.sum(labels == served_labels))
+            )
+        except Exception as e:
+            serving_metrics.comparison_errors[candidate].inc()
+            logger.warning(f"Comparison with candidate {candidate} failed: {e}")
+
+
+def load_candidates(primary: ModelStore) -> Optional[CandidateModels]:
+    """Candidate models configured in the settings, or None when there are none"""
+    if not settings.CANDIDATE_MODEL_FOLDERS:
+        return None
+    return CandidateModels(
+        primary,
+        settings.CANDIDATE_MODEL_FOLDERS,
+        mode=settings.CANDIDATE_MODE,
+        canary_fraction=settings.CANARY_FRACTION,
+        workers=settings.SHADOW_WORKERS,
+        max_pending=settings.SHADOW_MAX_PENDING,
+    )
@@ -0,0 +1,133 @@
+"""
+Request and Response Codec
+Decodes prediction requests straight into float64 feature rows and encodes
+predictions as JSON bytes. A request whose features are all plain JSON
+numbers is checked against the PredictionRequest schema without building the
+Pydantic model; any other request is validated by the model itself, so the
+accepted requests and the error details do not change. Responses are
+assembled from JSON fragments precomputed per class label of a model version.
+"""
+
+import json
+from typing import List
+import numpy as np
+from pydantic import BaseModel, ValidationError
+from src.api.api_model import PredictionRequest
+
+
+class RequestError(ValueError):
+    """A request that does not match the schema, with FastAPI-style error details"""
+
+    def __init__(self, errors: List[dict]):
+        super().__init__(f"Invalid request: {errors}")
+        self.errors = errors
+
+    def to_json(self) -> bytes:
+        """The `{"detail": [...]}` body of a 422 response"""
+        return json.dumps(
+            {"detail": self.errors}, default=str, separators=(",", ":")
+        ).encode()
+
+
+class RequestDecoder:
+    """
+    Decodes request payloads into feature rows in a fixed column order.
+
+    Args:
+        feature_columns (List[str]): Column order of the decoded rows
+        schema (type[BaseModel]): Model the payloads must satisfy
+        loc_prefix (tuple): Prepended to the location of each error, ("body",)
+            as in FastAPI's request validation errors
+    """
+
+    def __init__(
+        self,
+        feature_columns: List[str],
+        schema: type[BaseModel] = PredictionRequest,
+        loc_prefix: tuple = ("body",),
+    ):
+        self.feature_columns = feature_columns
+        self.schema = schema
+        self.loc_prefix = loc_prefix
+        self.integer_index = [
+            i
+            for i, column in enumerate(feature_columns)
+            if schema.model_fields[column].annotation is int
+        ]
+
+    def values(self, payload: dict) -> list:
+        """
+        Feature values of a payload, in column order.
+
+        Raises:
+            RequestError: If the payload does not match the schema
+        """
+        try:
+            values = [payload[column] for column in self.feature_columns]
+        except (KeyError, TypeError):
+            return self._validate(payload)
+        # bool is not accepted here: its type is neither int nor float
+        for value in values:
+            if type(value) is not float and type(value) is not int:  # noqa: E721
+                return self._validate(payload)
+        for i in self.integer_index:
+            if type(values[i]) is float and not values[i].is_integer():  # noqa: E721
+                return self._validate(payload)
+        return values
+
+    def _validate(self, payload: dict) -> list:
+        """Feature values of a payload coerced (or rejected) by the schema"""
+        try:
+            request = self.schema.model_validate(payload)
+        except ValidationError as e:
+            errors = e.errors(include_url=False)
+            raise RequestError(
+                [
+                    {**error, "loc": (*self.loc_prefix, *error["loc"])}
+                    for error in errors
+                ]
+            ) from None
+        return [getattr(request, column) for column in self.feature_columns]
+
+    def decode(self, payload: dict) -> np.ndarray:
+        """
+        Decode a payload into a float64 feature row.
+
+        Raises:
+            RequestError: If the payload does not match the schema
+        """
+        return np.array(self.values(payload), dtype=np.float64)
+
+
+class ResponseEncoder:
+    """
+    Encodes the predictions of one model version as JSON objects matching
+    PredictionResponse.
+
+    Args:
+        class_labels (np.ndarray): Class label of each probability column
+        version (str): Model version reported in every response
+    """
+
+    def __init__(self, class_labels: np.ndarray, version: str):
+        self._prefixes = [
+            b'{"prediction":' + json.dumps(int(label)).encode() + b',"probability":'
+            for label in np.asarray(class_labels).tolist()
+        ]
+        self._suffix = b',"model_version":' + json.dumps(version).encode() + b"}"
+
+    def encode(self, probabilities: np.ndarray) -> bytes:
+        """JSON object for one row of class probabilities"""
+        index = int(np.argmax(probabilities))
+        probability = float(probabilities.flat[index])
+        return self._prefixes[index] + repr(probability).encode() + self._suffix
+
+    def encode_rows(self, probabilities: np.ndarray) -> List[bytes]:
+        """JSON objects for a (n_rows, n_classes) array of class probabilities"""
+        indices = np.argmax(probabilities, axis=1)
+        maxima = probabilities[np.arange(len(probabilities)), indices].tolist()
+        prefixes, suffix = self._prefixes, self._suffix
+        return [
+            prefixes[index] + repr(probability).encode() + suffix
+            for index, probability in zip(indices.tolist(), maxima)
+        ]
@@ -0,0 +1,251 @@
+"""
+Model Store Module
+Holds the model and scaler pair used by the API and hot-reloads new versions
+from the saved_model folder in the background. A new pair is validated on a
+warmup batch before it is swapped in; requests already in flight keep the
+pair they started with.
+"""
+
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from functools import cached_property
+from pathlib import Path
+from typing import List, Optional, Tuple
+import numpy as np
+from src.logging.console_log import setup_logging
+from src.api.codec import ResponseEncoder
+from src.data.scaling import load_scaler_params, preprocess_transform_array
+from src.modelling.artifact import read_metadata
+from src.modelling.flat_forest import load_forest, saved_model_path, served_model_paths
+from settings import settings
+
+# setup logging
+logger = setup_logging()
+
+
+@dataclass(frozen=True)
+class ModelBundle:
+    """A model with the scaler it was trained with, served as one version"""
+
+    model: object
+    scaler_mean: np.ndarray
+    scaler_scale: np.ndarray
+    class_labels: np.ndarray
+    version: str
+    metadata: dict = field(default_factory=dict)
+
+    def transform(self, features: np.ndarray) -> np.ndarray:
+        """Scale raw feature rows in place"""
+        return preprocess_transform_array(features, self.scaler_mean, self.scaler_scale)
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """Scale raw feature rows in place and predict class probabilities"""
+        return self.model.predict_proba(self.transform(features))
+
+    @cached_property
+    def encoder(self) -> ResponseEncoder:
+        """JSON encoder of this version's predictions, built on first use"""
+        return ResponseEncoder(self.class_labels, self.version)
+
+
+def scaler_paths(model_folder: Optional[Path] = None) -> Tuple[Path, Path]:
+    """Artifact and pickle paths of the scaler saved with the model"""
+    return (
+        saved_model_path(settings.SCALER_ARTIFACT_PATH, model_folder),
+        saved_model_path(settings.SCALER_PATH, model_folder),
+    )
+
+
+def file_version(path: Path) -> str:
+    """Version of a pickled model or scaler: the hash of its contents, empty if missing"""
+    if not Path(path).exists():
+        return ""
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()[:12]
+
+
+def model_fingerprint(model_folder: Optional[Path] = None) -> Tuple:
+    """Modification times and sizes of the saved model and scaler files"""
+    model_artifact_path, model_path = served_model_paths(model_folder)
+    scaler_artifact_path, scaler_path = scaler_paths(model_folder)
+    paths = [
+        model_artifact_path / "metadata.json",
+        scaler_artifact_path / "metadata.json",
+        model_path,
+        scaler_path,
+    ]
+    fingerprint = []
+    for path in paths:
+        try:
+            stat = path.stat()
+            fingerprint.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            fingerprint.append(None)
+    return tuple(fingerprint)
+
+
+def load_bundle(
+    feature_columns: List[str], model_folder: Optional[Path] = None
+) -> ModelBundle:
+    """
+    Load the saved model and scaler as a bundle.
+
+    Args:
+        feature_columns (List[str]): Feature order used to decode requests
+        model_folder (Optional[Path]): Folder laid out like saved_model to load
+            from instead of it, e.g. a candidate model
+
+    Returns:
+        ModelBundle: The loaded model and scaler
+    """
+    model_artifact_path, model_path = served_model_paths(model_folder)
+    model = load_forest(settings.MODEL_BACKEND, model_artifact_path, model_path)
+    scaler_artifact_path, scaler_path = scaler_paths(model_folder)
+    scaler_mean, scaler_scale = load_scaler_params(scaler_artifact_path, scaler_path)
+
+    fitted_columns = getattr(model, "feature_names_in_", None)
+    if fitted_columns is not None and list(fitted_columns) != feature_columns:
+        raise ValueError(
+            f"Model was fitted on columns {list(fitted_columns)}, "
+            f"expected {feature_columns}"
+        )
+
+    metadata = getattr(model, "metadata", {})
+    # A bundle version covers both halves of the pair, so a new scaler alone is a new version
+    model_version = metadata.get("version") or file_version(model_path)
+    if Path(scaler_artifact_path).exists():
+        scaler_version = read_metadata(scaler_artifact_path)["version"]
+    else:
+        scaler_version = file_version(scaler_path)
+    version = hashlib.sha256(f"{model_version}:{scaler_version}".encode()).hexdigest()[
+        :12
+    ]
+
+    return ModelBundle(
+        model=model,
+        scaler_mean=scaler_mean,
+        scaler_scale=scaler_scale,
+        class_labels=np.asarray(model.classes_),
+        version=version,
+        metadata=metadata,
+    )
+
+
+def validate_bundle(bundle: ModelBundle, n_features: int) -> None:
+    """
+    Check a bundle on a warmup batch before it serves traffic.
+
+    Artifacts written by the training step carry warmup rows and the
+    probabilities the model and scaler pair produced for them at training
+    time; those must be reproduced. Otherwise a synthetic batch around the
+    scaler mean must yield valid probability rows.
+
+    Args:
+        bundle (ModelBundle): Bundle to validate
+        n_features (int): Number of features per request row
+
+    Raises:
+        ValueError: If the bundle fails validation
+    """
+    warmup = bundle.metadata.get("warmup")
+    n_numerical = bundle.scaler_mean.shape[0]
+    if warmup:
+        inputs = np.asarray(warmup["inputs"], dtype=np.float64)
+        expected = np.asarray(warmup["probabilities"], dtype=np.float64)
+    else:
+        inputs = np.zeros((3, n_features), dtype=np.float64)
+        inputs[:, :n_numerical] = bundle.scaler_mean + np.outer(
+            [-1.0, 0.0, 1.0], bundle.scaler_scale
+        )
+        expected = None
+
+    if inputs.shape[1] != n_features or n_numerical > n_features:
+        raise ValueError(
+            f"Model version {bundle.version} expects {inputs.shape[1]} features "
+            f"and scales {n_numerical}, requests have {n_features}"
+        )
+
+    probabilities = bundle.predict_proba(inputs.copy())
+    if probabilities.shape != (len(inputs), len(bundle.class_labels)):
+        raise ValueError(
+            f"Model version {bundle.version} returned shape {probabilities.shape} "
+            f"on the warmup batch"
+        )
+    if not np.all(np.isfinite(probabilities)) or not np.allclose(
+        probabilities.sum(axis=1), 1.0
+    ):
+        raise ValueError(
+            f"Model version {bundle.version} returned invalid probabilities"
+        )
+    if expected is not None and not np.allclose(probabilities, expected, atol=1e-9):
+        raise ValueError(
+            f"Model version {bundle.version} does not reproduce its training-time "
+            f"warmup predictions; the model and scaler may not belong together"
+        )
+
+
+class ModelStore:
+    """Owns the active bundle and swaps in new versions from disk
+
+    Readers take ``store.bundle`` once per request or batch and keep using
+    that bundle; a reload replaces the attribute in a single assignment, so
+    in-flight requests are never mixed across versions.
+    """
+
+    def __init__(self, feature_columns: List[str], model_folder: Optional[Path] = None):
+        self.feature_columns = feature_columns
+        self.model_folder = model_folder
+        self._fingerprint = model_fingerprint(model_folder)
+        self.bundle = load_bundle(feature_columns, model_folder)
+        validate_bundle(self.bundle, len(feature_columns))
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    def refresh(self) -> bool:
+        """
+        Reload the model if the saved files changed.
+
+        Returns:
+            bool: True if a new version was swapped in
+        """
+        fingerprint = model_fingerprint(self.model_folder)
+        if fingerprint == self._fingerprint:
+            return False
+
+        try:
+            bundle = load_bundle(self.feature_columns, self.model_folder)
+            validate_bundle(bundle, len(self.feature_columns))
+        except Exception as e:
+            # Files may be mid-write (e.g. new scaler, old model); retry next poll
+            logger.warning(f"Keeping model version {self.bundle.version}: {e}")
+            return False
+
+        self._fingerprint = fingerprint
+        if bundle.version == self.bundle.version:
+            return False
+        previous_version = self.bundle.version
+        self.bundle = bundle
+        logger.info(
+            f"Model version {bundle.version} swapped in (was {previous_version})"
+        )
+        return True
+
+    def start_watching(self, interval: float) -> None:
+        """Poll the saved model files every `interval` seconds in the background"""
+
+        def watch():
+            while not self._stop.wait(interval):
+                self.refresh()
+
+        self._watcher = threading.Thread(
+            target=watch, name="model-watcher", daemon=True
+        )
+        self._watcher.start()
+        folder = self.model_folder or settings.SAVED_MODEL_FOLDER
+        logger.info(f"Watching {folder} for new models every {interval}s")
+
+    def stop_watching(self) -> None:
+        """Stop the background watcher"""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
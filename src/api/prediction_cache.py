@@ -0,0 +1,94 @@
+"""
+Prediction Cache Module
+In-process cache of model outputs keyed on the decoded feature vector, with a
+bounded size, LRU eviction and a time-to-live. Entries belong to one model
+version and are dropped as soon as a different version is served.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+import numpy as np
+
+
+class PredictionCache:
+    """Bounded LRU + TTL cache of class probabilities per feature vector"""
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_size <= 0:
+            raise ValueError("max_size must be greater than 0")
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(features: np.ndarray) -> bytes:
+        """Canonical key of a raw float64 feature row (-0.0 and 0.0 collide)"""
+        return (features + 0.0).tobytes()
+
+    def use_version(self, version: str) -> None:
+        """Drop every entry if the served model version changed"""
+        if version == self.version:
+            return
+        with self._lock:
+            if self.version is not None:
+                self.invalidations += 1
+            self._entries.clear()
+            self.version = version
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        """Cached probabilities for the key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: bytes, value: np.ndarray) -> None:
+        """Store probabilities for the key, evicting the least recently used"""
+        with self._lock:
+            self._entries[key] = (value, self._clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Counters and current size of the cache"""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
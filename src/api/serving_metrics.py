@@ -0,0 +1,297 @@
+"""
+Serving Metrics Module
+Declares the serving metrics and adds the /metrics endpoint.
+Queue waits, stage latencies, batch sizes, prediction errors, cache counters, per-model
+latencies and the agreement of candidate models with the primary are
+recorded in the LitServe inference workers; end-to-end request latency and
+status codes are recorded by a middleware in the API server. Each process
+also reports the log records its buffered sink dropped. /metrics
+aggregates all processes in Prometheus text format.
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import Any, List, NamedTuple, Union
+from fastapi import Request
+from litserve.loops import BatchedLoop, SingleLoop
+from fastapi.responses import PlainTextResponse
+from src.logging.console_log import dropped_log_records, setup_logging
+from src.monitoring.metrics import MetricsRegistry, reset_metrics_folder
+from settings import settings
+
+# setup logging
+logger = setup_logging()
+
+METRICS_PREFIX = "mlops_api"
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+STATUS_CLASSES = ("2xx", "4xx", "5xx")
+PRIMARY_MODEL = "primary"
+# Candidate models are labelled by the name of their folder
+CANDIDATE_NAMES = [Path(folder).name for folder in settings.CANDIDATE_MODEL_FOLDERS]
+
+registry = MetricsRegistry(METRICS_PREFIX)
+
+# Inference worker metrics
+queue_wait_seconds = registry.histogram(
+    "queue_wait_seconds",
+    "Time from a request's arrival in the API server to the start of its predict call",
+)
+stage_seconds = {
+    stage: registry.histogram(
+        "stage_seconds", "Time spent in each serving stage", stage=stage
+    )
+    for stage in ("decode", "preprocess", "inference", "encode")
+}
+batch_size = registry.histogram(
+    "batch_size", "Rows per predict call", buckets=BATCH_SIZE_BUCKETS
+)
+prediction_errors = registry.counter(
+    "prediction_errors_total", "Predict calls that raised an exception"
+)
+cache_hits = registry.counter(
+    "cache_hits_total", "Rows answered from the prediction cache"
+)
+cache_misses = registry.counter(
+    "cache_misses_total", "Rows not found in the prediction cache"
+)
+cache_size = registry.gauge("cache_entries", "Entries held by the prediction caches")
+drift_windows = registry.counter(
+    "drift_windows_total", "Drift monitoring windows scored"
+)
+drift_flags = {
+    column: registry.counter(
+        "drift_flags_total", "Windows in which a feature drifted", column=column
+    )
+    for column in settings.NUMERICAL_FEATURE_COLUMNS
+}
+
+# Primary and candidate model metrics
+model_seconds = {
+    model: registry.histogram(
+        "model_seconds", "Time to scale and score a batch, per model", model=model
+    )
+    for model in [PRIMARY_MODEL] + CANDIDATE_NAMES
+}
+served_rows = {
+    model: registry.counter(
+        "served_rows_total",
+        "Rows scored on the response path by each model",
+        model=model,
+    )
+    for model in [PRIMARY_MODEL] + CANDIDATE_NAMES
+}
+compared_rows = {
+    model: registry.counter(
+        "candidate_compared_rows_total",
+        "Rows scored by both the primary and a candidate",
+        model=model,
+    )
+    for model in CANDIDATE_NAMES
+}
+agreed_rows = {
+    model: registry.counter(
+        "candidate_agreed_rows_total",
+        "Compared rows on which a candidate predicts the primary's class",
+        model=model,
+    )
+    for model in CANDIDATE_NAMES
+}
+comparison_errors = {
+    model: registry.counter(
+        "candidate_errors_total",
+        "Background comparisons that raised an exception",
+        model=model,
+    )
+    for model in CANDIDATE_NAMES
+}
+dropped_rows = {
+    model: registry.counter(
+        "candidate_dropped_rows_total",
+        "Rows not compared because the background queue was full",
+        model=model,
+    )
+    for model in CANDIDATE_NAMES
+}
+
+# API server metrics
+request_seconds = {
+    path: registry.histogram(
+        "request_seconds", "End-to-end request latency in the API server", path=path
+    )
+    for path in ("/predict", "/predict_batch")
+}
+requests_total = {
+    (path, status): registry.counter(
+        "requests_total", "Requests by path and status class", path=path, status=status
+    )
+    for path in ("/predict", "/predict_batch")
+    for status in STATUS_CLASSES
+}
+
+# Metrics of every process
+dropped_log_records_total = registry.counter(
+    "dropped_log_records_total", "Log records dropped because the log buffer was full"
+)
+
+
+# Process and drop count of the buffered log sink when last recorded
+_recorded_log_drops = (os.getpid(), 0)
+
+
+class QueuedRequest(NamedTuple):
+    """A request payload with the time its API server enqueued it"""
+
+    payload: Any
+    enqueued_at: float
+
+
+class _TimedRequestQueue:
+    """Request queue of an inference worker that attaches its enqueue time to each request"""
+
+    def __init__(self, queue):
+        self._queue = queue
+
+    def get(self, *args, **kwargs):
+        return self._stamp(self._queue.get(*args, **kwargs))
+
+    def get_nowait(self):
+        return self._stamp(self._queue.get_nowait())
+
+    def __getattr__(self, name: str):
+        return getattr(self._queue, name)
+
+    @staticmethod
+    def _stamp(item):
+        # LitServe 0.2 enqueues (response queue id, uid, time.monotonic(), payload);
+        # anything else is its stop sentinel
+        if isinstance(item, tuple) and len(item) == 4:
+            response_queue_id, uid, enqueued_at, payload = item
+            return (
+                response_queue_id,
+                uid,
+                enqueued_at,
+                QueuedRequest(payload, enqueued_at),
+            )
+        return item
+
+
+class _QueueWaitLoop:
+    """Worker loop recording when the requests it takes were enqueued"""
+
+    def __call__(self, lit_api, device, worker_id, request_queue, *args, **kwargs):
+        return super().__call__(
+            lit_api,
+            device,
+            worker_id,
+            _TimedRequestQueue(request_queue),
+            *args,
+            **kwargs,
+        )
+
+
+class QueueWaitSingleLoop(_QueueWaitLoop, SingleLoop):
+    pass
+
+
+class QueueWaitBatchedLoop(_QueueWaitLoop, BatchedLoop):
+    pass
+
+
+def queue_wait_loop(max_batch_size: int):
+    """
+    LitServe loop of the inference workers that measures queue waits.
+
+    LitServe stamps each request with `time.monotonic()` as the API server
+    enqueues it, but does not pass the stamp to the LitAPI hooks. The loop
+    hands each payload to `decode_request` as a `QueuedRequest` carrying its
+    stamp, `unwrap_request` moves the stamp to the request's context and
+    `record_queue_wait` observes the contexts of the predict call serving
+    them, so requests LitServe drops after taking them off the queue, e.g.
+    timed out ones, are not counted. The monotonic clock is shared by all
+    processes of the host.
+    """
+    return QueueWaitBatchedLoop() if max_batch_size > 1 else QueueWaitSingleLoop()
+
+
+def unwrap_request(request, context: dict):
+    """The payload of a request, with its enqueue time moved to its context"""
+    if isinstance(request, QueuedRequest):
+        context["enqueued_at"] = request.enqueued_at
+        return request.payload
+    return request
+
+
+def record_queue_wait(context: Union[dict, List[dict]]) -> None:
+    """Observe the queue wait of the requests of a predict call, by their contexts"""
+    now = time.monotonic()
+    for request_context in context if isinstance(context, list) else [context]:
+        enqueued_at = request_context.get("enqueued_at")
+        if enqueued_at is not None:
+            queue_wait_seconds.observe(now - enqueued_at)
+
+
+def record_dropped_log_records() -> None:
+    """Add the log records this process dropped since the last call"""
+    global _recorded_log_drops
+    pid, recorded = _recorded_log_drops
+    if pid != os.getpid():
+        # Forked: the sink counts this process's drops from zero
+        recorded = 0
+    dropped = dropped_log_records()
+    if dropped > recorded:
+        dropped_log_records_total.inc(dropped - recorded)
+    _recorded_log_drops = (os.getpid(), dropped)
+
+
+def bind_worker_metrics() -> None:
+    """Start recording metrics in this process, if enabled"""
+    if settings.SERVING_METRICS_ENABLED:
+        registry.ensure_bound(settings.SERVING_METRICS_FOLDER)
+
+
+def reset_serving_metrics() -> None:
+    """Discard the metric files of a previous server run"""
+    reset_metrics_folder(settings.SERVING_METRICS_FOLDER, METRICS_PREFIX)
+
+
+def add_metrics_endpoint(app, path: str = "/metrics") -> None:
+    """
+    Register the metrics endpoint and request middleware on the server app.
+
+    The API server processes are forked by LitServe, so each binds its own
+    metrics file on its first request.
+
+    Args:
+        app (FastAPI): The LitServer app
+        path (str): Endpoint path
+    """
+    if not settings.SERVING_METRICS_ENABLED:
+        return
+
+    @app.middleware("http")
+    async def record_request(request: Request, call_next):
+        histogram = request_seconds.get(request.url.path)
+        if histogram is None:
+            return await call_next(request)
+        registry.ensure_bound(settings.SERVING_METRICS_FOLDER)
+        record_dropped_log_records()
+        start = time.perf_counter()
+        response = await call_next(request)
+        # Streaming responses are timed to the start of the response body
+        histogram.observe(time.perf_counter() - start)
+        status = f"{min(response.status_code // 100, 5)}xx"
+        counter = requests_total.get((request.url.path, status))
+        if counter is not None:
+            counter.inc()
+        return response
+
+    @app.get(path)
+    async def metrics() -> PlainTextResponse:
+        """Serving metrics of all processes in Prometheus text format"""
+        registry.ensure_bound(settings.SERVING_METRICS_FOLDER)
+        record_dropped_log_records()
+        return PlainTextResponse(
+            registry.render(settings.SERVING_METRICS_FOLDER),
+            media_type="text/plain; version=0.0.4",
+        )
@@ -0,0 +1,78 @@
+"""
+Worker Sizing Module
+Sizes the inference workers to the CPUs the container may use, honouring the
+process affinity mask and the cgroup CPU quota (e.g. a Kubernetes CPU
+limit), and limits the BLAS/OpenMP/joblib thread pools of each worker so that
+N workers on N cores do not each start a pool of N threads.
+"""
+
+import math
+import os
+from pathlib import Path
+from typing import Optional
+
+# Thread pool sizes read by NumPy's BLAS, OpenMP, numexpr and joblib when
+# they are first imported in a process
+THREAD_LIMIT_VARIABLES = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "LOKY_MAX_CPU_COUNT",
+)
+
+
+def cgroup_cpu_limit(root: Path = Path("/sys/fs/cgroup")) -> Optional[float]:
+    """
+    CPU quota of the process's cgroup in cores.
+
+    Args:
+        root (Path): Mount point of the cgroup filesystem
+
+    Returns:
+        Optional[float]: Quota divided by period (cgroup v2 or v1), None when unlimited
+    """
+    try:
+        quota, period = (root / "cpu.max").read_text().split()
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int((root / "cpu" / "cpu.cfs_quota_us").read_text())
+        period = int((root / "cpu" / "cpu.cfs_period_us").read_text())
+        return quota / period if quota > 0 and period > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpus() -> int:
+    """CPUs the process may use: its affinity mask, capped by the whole cores of the cgroup quota"""
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, max(1, math.floor(limit)))
+    return cpus
+
+
+def inference_workers(configured: int) -> int:
+    """Number of inference workers: `configured`, or one per available CPU when it is 0"""
+    return configured if configured > 0 else available_cpus()
+
+
+def limit_worker_threads(n_threads: int) -> None:
+    """
+    Limit the thread pools of the processes started from now on.
+
+    The inference workers are spawned, so they import NumPy afresh and read
+    these variables; values set explicitly in the environment are kept.
+
+    Args:
+        n_threads (int): Threads per pool in each worker
+    """
+    for variable in THREAD_LIMIT_VARIABLES:
+        os.environ.setdefault(variable, str(n_threads))
@@ -3,40 +3,126 @@ Collect Raw Data from original source,
 get the metadata,
 save the data in the raw folder
 and generate the statistical summary of the data for data drift detection.
+The dataset is read from a local checksummed snapshot (src.data.snapshot),
+which is fetched from the UCI repository only when there is none yet or a
+newer DATA_SOURCE_VERSION is requested, so collection also works offline.
+New customer records dropped in DATA_INGEST_FOLDER are appended to it.
 """
 
-from ucimlrepo import fetch_ucirepo
+from typing import Tuple
+import pandas as pd
+from src.data.snapshot import Snapshot, SnapshotStore, pending_ingest_files
+from src.data.storage import write_dataset
 from src.logging.console_log import setup_logging
+from src.monitoring.sketch import build_sketches, save_sketches
 from sklearn.model_selection import train_test_split
 from settings import settings
 
 # setup logging
 logger = setup_logging()
 
+# Wholesale customers dataset in the UCI Machine Learning Repository
+UCI_DATASET_ID = 292
+
+
+def fetch_source(
+    source_version: int,
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, dict]:
+    """
+    Fetch the dataset from the UCI Machine Learning Repository.
+
+    Args:
+        source_version (int): Version the fetched data is recorded as
+
+    Returns:
+        Tuple: Features, targets, variable metadata and the source description
+    """
+    # Imported here: only a refresh of the snapshot needs the network client
+    from ucimlrepo import fetch_ucirepo
+
+    logger.info("Fetching dataset")
+    wholesale_customers = fetch_ucirepo(id=UCI_DATASET_ID)
+    source = {
+        "source": "uci",
+        "uci_id": UCI_DATASET_ID,
+        "source_version": source_version,
+        "last_updated": wholesale_customers.metadata.get("last_updated"),
+    }
+    logger.info("Data fetched successfully")
+    return (
+        wholesale_customers.data.features,
+        wholesale_customers.data.targets,
+        wholesale_customers.variables,
+        source,
+    )
+
+
+def load_snapshot(store: SnapshotStore) -> Snapshot:
+    """
+    The current snapshot, refreshed and extended as needed.
+
+    The source is fetched only when there is no valid snapshot or it is older
+    than DATA_SOURCE_VERSION, and never with DATA_OFFLINE set. Pending files
+    of the ingest folder are then appended.
+
+    Raises:
+        FileNotFoundError: If there is no snapshot and DATA_OFFLINE is set
+        ValueError: If no snapshot is valid and DATA_OFFLINE is set
+    """
+    try:
+        snapshot = store.current()
+    except (ValueError, FileNotFoundError) as e:
+        # A corrupted snapshot, or CURRENT naming a snapshot that was deleted
+        if settings.DATA_OFFLINE:
+            snapshot = store.latest_valid()
+            if snapshot is None:
+                raise
+            logger.warning(f"{e}; using the most recent valid snapshot {snapshot.id}")
+        else:
+            logger.warning(f"{e}; fetching the dataset again")
+            snapshot = None
+
+    if snapshot is not None and snapshot.source_version >= settings.DATA_SOURCE_VERSION:
+        logger.info(
+            f"Using snapshot {snapshot.id} (source version {snapshot.source_version})"
+        )
+    elif settings.DATA_OFFLINE:
+        if snapshot is None:
+            raise FileNotFoundError(
+                f"No dataset snapshot in {store.root} and DATA_OFFLINE is set"
+            )
+        logger.warning(
+            f"Snapshot {snapshot.id} has source version {snapshot.source_version}, older than "
+            f"the requested {settings.DATA_SOURCE_VERSION}; DATA_OFFLINE is set, so it is used"
+        )
+    else:
+        features, targets, variables, source = fetch_source(
+            settings.DATA_SOURCE_VERSION
+        )
+        snapshot = store.save(features, targets, variables, source)
+    return store.ingest(snapshot, pending_ingest_files(settings.DATA_INGEST_FOLDER))
+
 
 def main():
     """Pipeline for collecting data from the original source"""
 
-    # fetch dataset
-    logger.info("Fetching dataset")
-    wholesale_customers = fetch_ucirepo(id=292)
+    # Read the dataset from the local snapshot
+    snapshot = load_snapshot(SnapshotStore(settings.DATA_SNAPSHOT_FOLDER))
 
     # data (as pandas dataframes)
-    X = wholesale_customers.data.features
-    y = wholesale_customers.data.targets
+    X = snapshot.features()
+    y = snapshot.targets()
 
     # metadata
-    metadata = wholesale_customers.variables
-
-    logger.info("Data fetched successfully")
+    metadata = snapshot.variables()
 
     # Generate the statistical summary of the data for data drift detection
     statistical_summary = X.describe()
     logger.info("Statistical summary generated successfully")
 
     # save the data in the raw folder
-    X.to_csv(settings.RAW_DATA_FOLDER / "wholesale_customers_data.csv", index=False)
-    y.to_csv(settings.RAW_DATA_FOLDER / "wholesale_customers_targets.csv", index=False)
+    write_dataset(X, settings.RAW_DATA_FOLDER, "wholesale_customers_data")
+    write_dataset(y, settings.RAW_DATA_FOLDER, "wholesale_customers_targets")
     logger.info("Data saved successfully")
 
     # Create train-test split
@@ -45,14 +131,11 @@ def main():
     )
     logger.info("Train-test split created successfully")
 
-    # Create train_test folder if it doesn't exist
-    settings.TRAIN_TEST_FOLDER.mkdir(parents=True, exist_ok=True)
-
     # Save train-test splits
-    X_train.to_csv(settings.TRAIN_TEST_FOLDER / "X_train.csv", index=False)
-    X_test.to_csv(settings.TRAIN_TEST_FOLDER / "X_test.csv", index=False)
-    y_train.to_csv(settings.TRAIN_TEST_FOLDER / "y_train.csv", index=False)
-    y_test.to_csv(settings.TRAIN_TEST_FOLDER / "y_test.csv", index=False)
+    write_dataset(X_train, settings.TRAIN_TEST_FOLDER, "X_train")
+    write_dataset(X_test, settings.TRAIN_TEST_FOLDER, "X_test")
+    write_dataset(y_train, settings.TRAIN_TEST_FOLDER, "y_train")
+    write_dataset(y_test, settings.TRAIN_TEST_FOLDER, "y_test")
     logger.info("Train-test split saved successfully")
 
     # save the metadata in the reference folder
@@ -64,6 +147,13 @@ def main():
     )
     logger.info("Metadata and statistical summary saved successfully")
 
+    # Build the reference quantile sketches for live drift monitoring
+    reference_sketches = build_sketches(
+        X_train, settings.NUMERICAL_FEATURE_COLUMNS, k=settings.DRIFT_SKETCH_SIZE
+    )
+    save_sketches(reference_sketches, settings.DRIFT_REFERENCE_PATH)
+    logger.info("Reference sketches saved successfully")
+
 
 if __name__ == "__main__":
     main()
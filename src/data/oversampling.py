@@ -0,0 +1,187 @@
+"""
+ADASYN oversampling with a reusable neighbour index
+Produces the same rows as imblearn's ADASYN for the same random state, but
+queries the neighbours of all minority rows in the full training set at once
+(imblearn refits and queries the full set once per class), runs the tree
+queries on several threads and keeps the neighbour tables on disk, keyed by
+a hash of the training data, so a rerun on unchanged data skips the search.
+The synthetic rows of all classes are generated in bulk.
+"""
+
+import hashlib
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import numpy as np
+from src.logging.console_log import setup_logging
+
+# setup logging
+logger = setup_logging()
+
+
+def sampling_targets(y: np.ndarray) -> Dict:
+    """
+    Rows to generate per class, as imblearn's "auto" strategy: every class
+    but the majority one is brought up to the majority count.
+
+    Returns:
+        Dict: Class label to number of rows, in sorted label order
+    """
+    classes, counts = np.unique(y, return_counts=True)
+    majority = classes[np.argmax(counts)]
+    return {
+        label: int(counts.max() - count)
+        for label, count in zip(classes.tolist(), counts)
+        if label != majority
+    }
+
+
+def neighbor_cache_key(X: np.ndarray, y: np.ndarray, n_neighbors: int) -> str:
+    """Hash of the data and parameters the neighbour tables depend on"""
+    digest = hashlib.sha256()
+    for array in (X, y):
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(array.tobytes())
+    digest.update(str(n_neighbors).encode())
+    return digest.hexdigest()
+
+
+def _kneighbors(
+    fit_rows: np.ndarray,
+    query_rows: np.ndarray,
+    n_neighbors: int,
+    n_jobs: Optional[int],
+) -> np.ndarray:
+    """Indices of the `n_neighbors` nearest rows of `fit_rows`, the query row itself included"""
+    from sklearn.neighbors import NearestNeighbors
+
+    # Same neighbour search as imblearn's; n_jobs queries the tree on threads
+    index = NearestNeighbors(n_neighbors=n_neighbors + 1, n_jobs=n_jobs).fit(fit_rows)
+    return index.kneighbors(query_rows, return_distance=False)
+
+
+def minority_neighbors(
+    X: np.ndarray,
+    y: np.ndarray,
+    targets: Dict,
+    n_neighbors: int = 5,
+    n_jobs: Optional[int] = None,
+    cache_folder: Optional[Path] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Neighbours of the rows of the oversampled classes.
+
+    For each class in `targets`, "<label>/all" holds the neighbours of its rows
+    in the whole training set (which weight the generation) and
+    "<label>/class" their neighbours within the class (which synthetic rows
+    are interpolated towards), both without the row itself.
+
+    Args:
+        X (np.ndarray): Training features
+        y (np.ndarray): Training labels
+        targets (Dict): Classes to oversample, see `sampling_targets`
+        n_neighbors (int): Neighbours per row
+        n_jobs (Optional[int]): Threads of the tree queries (-1: all cores)
+        cache_folder (Optional[Path]): Folder of the cached tables, None disables the cache
+
+    Returns:
+        Dict[str, np.ndarray]: Neighbour indices, into X and into the class rows
+    """
+    cache_path = None
+    if cache_folder is not None:
+        cache_path = Path(cache_folder) / f"{neighbor_cache_key(X, y, n_neighbors)}.npz"
+        if cache_path.exists():
+            logger.info(f"Reusing the neighbour tables in {cache_path}")
+            with np.load(cache_path) as cached:
+                return dict(cached)
+
+    # One index over the whole training set, queried once for all minority rows
+    minority = np.flatnonzero(np.isin(y, list(targets)))
+    all_neighbors = _kneighbors(X, X[minority], n_neighbors, n_jobs)[:, 1:]
+    tables = {}
+    for label in targets:
+        in_class = y[minority] == label
+        tables[f"{label}/all"] = all_neighbors[in_class]
+        X_class = X[minority[in_class]]
+        tables[f"{label}/class"] = _kneighbors(X_class, X_class, n_neighbors, n_jobs)[
+            :, 1:
+        ]
+
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # Written under a temporary name and renamed, so readers never see half a file
+        partial = cache_path.with_suffix(".partial.npz")
+        np.savez(partial, **tables)
+        partial.replace(cache_path)
+    return tables
+
+
+def adasyn(
+    X: np.ndarray,
+    y: np.ndarray,
+    random_state: int = 42,
+    n_neighbors: int = 5,
+    n_jobs: Optional[int] = None,
+    cache_folder: Optional[Path] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Oversample the minority classes with ADASYN.
+
+    Each minority row gets synthetic rows in proportion to the share of other
+    classes among its neighbours, interpolated towards random neighbours of
+    its own class. The random draws are made in imblearn's order, so the
+    result equals `ADASYN(random_state=random_state).fit_resample(X, y)`.
+
+    Args:
+        X (np.ndarray): Training features
+        y (np.ndarray): Training labels
+        random_state (int): Random state for reproducibility
+        n_neighbors (int): Neighbours per row
+        n_jobs (Optional[int]): Threads of the neighbour queries (-1: all cores)
+        cache_folder (Optional[Path]): Folder of the cached neighbour tables
+
+    Raises:
+        ValueError: If a class has no more rows than `n_neighbors`, or no rows would be generated
+        RuntimeError: If no neighbours of a class belong to another class
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The rows of X and y followed by the synthetic rows
+    """
+    targets = {
+        label: n_samples
+        for label, n_samples in sampling_targets(y).items()
+        if n_samples
+    }
+    tables = minority_neighbors(X, y, targets, n_neighbors, n_jobs, cache_folder)
+    rng = np.random.RandomState(random_state)
+
+    rows, neighbors, steps, labels = [], [], [], []
+    for label, n_samples in targets.items():
+        class_indices = np.flatnonzero(y == label)
+        ratio_nn = np.sum(y[tables[f"{label}/all"]] != label, axis=1) / n_neighbors
+        if not np.sum(ratio_nn):
+            raise RuntimeError(
+                f"No neighbours of class {label} belong to another class; "
+                "ADASYN cannot weight its rows, use SMOTE instead"
+            )
+        n_generate = np.rint(ratio_nn / np.sum(ratio_nn) * n_samples).astype(int)
+        n_samples = int(np.sum(n_generate))
+        if not n_samples:
+            raise ValueError(f"No samples will be generated for class {label}")
+
+        class_rows = np.repeat(np.arange(len(class_indices)), n_generate)
+        columns = rng.choice(n_neighbors, size=n_samples)
+        rows.append(class_indices[class_rows])
+        neighbors.append(class_indices[tables[f"{label}/class"][class_rows, columns]])
+        steps.append(rng.uniform(size=(n_samples, 1)))
+        labels.append(np.full(n_samples, label, dtype=y.dtype))
+
+    if not rows:
+        return X.copy(), y.copy()
+    rows, neighbors, steps = (
+        np.concatenate(rows),
+        np.concatenate(neighbors),
+        np.concatenate(steps),
+    )
+    X_new = (X[rows] + steps * (X[neighbors] - X[rows])).astype(X.dtype)
+    return np.vstack([X, X_new]), np.concatenate([y, *labels])
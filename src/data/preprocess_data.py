@@ -3,12 +3,16 @@ Preprocess the data for training the model
 """
 
 from pathlib import Path
+import numpy as np
 import pandas as pd
 from sklearn.preprocessing import StandardScaler
 import pickle
-from imblearn.over_sampling import ADASYN
+from src.data.oversampling import adasyn
+from src.data.storage import dataset_path, read_dataset, write_dataset
 from src.logging.console_log import setup_logging
-from typing import Tuple, Union
+from src.data.scaling import load_scaler_params
+from src.modelling.artifact import hash_files, save_artifact
+from typing import Optional, Tuple, Union
 from settings import settings
 
 
@@ -22,6 +26,9 @@ def oversample_data(
     """
     Oversample the minority classes using ADASYN.
 
+    The neighbour tables are cached in OVERSAMPLING_CACHE_FOLDER, so they are
+    only searched again when the training rows change.
+
     Args:
         X (pd.DataFrame): Feature DataFrame
         y (pd.DataFrame): Target DataFrame
@@ -30,8 +37,17 @@ def oversample_data(
     Returns:
         Tuple[pd.DataFrame, pd.DataFrame]: Oversampled features and targets
     """
-    oversampler = ADASYN(random_state=random_state)
-    X_resampled, y_resampled = oversampler.fit_resample(X, y)
+    X_resampled, y_resampled = adasyn(
+        X.to_numpy(),
+        y[settings.TARGET_COLUMN_NAME].to_numpy(),
+        random_state=random_state,
+        n_jobs=settings.OVERSAMPLING_N_JOBS,
+        cache_folder=settings.OVERSAMPLING_CACHE_FOLDER,
+    )
+    X_resampled = pd.DataFrame(X_resampled, columns=X.columns).astype(X.dtypes)
+    y_resampled = pd.DataFrame({settings.TARGET_COLUMN_NAME: y_resampled}).astype(
+        y.dtypes
+    )
     logger.info(
         f"After oversampling: {y_resampled[settings.TARGET_COLUMN_NAME].value_counts()}"
     )
@@ -65,6 +81,67 @@ def preprocess_fit(
     return scaler
 
 
+def preprocess_partial_fit(
+    X: pd.DataFrame, feature_columns: list, scaler_path: Union[str, Path]
+) -> StandardScaler:
+    """
+    Update the saved StandardScaler with new rows and save it.
+
+    The running mean and variance are updated from the new rows only, giving
+    the same statistics as a fit on all rows seen so far.
+
+    Args:
+        X (pd.DataFrame): New feature rows
+        feature_columns (list): List of numerical feature columns
+        scaler_path (Union[str, Path]): Path of the saved scaler
+
+    Returns:
+        StandardScaler: Updated scaler object
+    """
+    with open(scaler_path, "rb") as f:
+        scaler = pickle.load(f)
+    scaler.partial_fit(X[feature_columns])
+
+    with open(scaler_path, "wb") as f:
+        pickle.dump(scaler, f)
+    logger.info(
+        f"Scaler updated with {len(X)} rows ({scaler.n_samples_seen_} in total)"
+    )
+
+    return scaler
+
+
+def save_scaler_artifact(
+    scaler: StandardScaler,
+    feature_columns: list,
+    artifact_path: Union[str, Path],
+    metadata: Optional[dict] = None,
+) -> dict:
+    """
+    Save the fitted scaler parameters as a memory-mappable artifact.
+
+    Args:
+        scaler (StandardScaler): Fitted scaler object
+        feature_columns (list): Numerical feature columns, in fitted order
+        artifact_path (Union[str, Path]): Artifact directory
+        metadata (Optional[dict]): Extra metadata to store with the artifact
+
+    Returns:
+        dict: The written artifact metadata
+    """
+    artifact_metadata = save_artifact(
+        artifact_path,
+        arrays={"mean": scaler.mean_, "scale": scaler.scale_},
+        metadata={
+            **(metadata or {}),
+            "kind": "standard_scaler",
+            "feature_columns": list(feature_columns),
+        },
+    )
+    logger.info(f"Scaler artifact saved successfully to {artifact_path}")
+    return artifact_metadata
+
+
 def preprocess_transform(
     X: pd.DataFrame,
     scaler: StandardScaler,
@@ -94,12 +171,103 @@ def preprocess_transform(
     return X_scaled
 
 
+def row_hashes(X: pd.DataFrame, y: pd.DataFrame) -> np.ndarray:
+    """Content hash of every (features, target) row"""
+    return pd.util.hash_pandas_object(pd.concat([X, y], axis=1), index=False).to_numpy()
+
+
+def training_data_hash() -> str:
+    """Hash of the train split files the scaler is fitted on"""
+    return hash_files(
+        [
+            dataset_path(settings.TRAIN_TEST_FOLDER, "X_train"),
+            dataset_path(settings.TRAIN_TEST_FOLDER, "y_train"),
+        ]
+    )
+
+
+def preprocess_incremental(X_train: pd.DataFrame, y_train: pd.DataFrame) -> None:
+    """
+    Preprocess only the training rows not seen before.
+
+    The new rows are oversampled on their own and update the scaler
+    statistics. The stored processed rows are moved to the updated scaling
+    and the new rows are appended; the new rows are also saved on their own
+    for the incremental training step.
+
+    Args:
+        X_train (pd.DataFrame): All training features
+        y_train (pd.DataFrame): All training targets
+    """
+    hashes = row_hashes(X_train, y_train)
+    seen = np.load(settings.SEEN_ROWS_PATH)
+    is_new = ~np.isin(hashes, seen)
+    X_new = X_train[is_new].reset_index(drop=True)
+    y_new = y_train[is_new].reset_index(drop=True)
+    logger.info(f"{len(X_new)} new training rows out of {len(X_train)}")
+    if not len(X_new):
+        write_dataset(X_new, settings.PROCESSED_DATA_FOLDER, "X_new_processed")
+        write_dataset(y_new, settings.PROCESSED_DATA_FOLDER, "y_new_processed")
+        return
+
+    try:
+        X_new, y_new = oversample_data(X_new, y_new, random_state=settings.RANDOM_STATE)
+    except ValueError as e:
+        # Too few rows of a class to find neighbours among the new rows
+        logger.warning(f"New rows are not oversampled: {e}")
+
+    old_mean, old_scale = load_scaler_params(
+        settings.SCALER_ARTIFACT_PATH, settings.SCALER_PATH
+    )
+    scaler = preprocess_partial_fit(
+        X_new, settings.NUMERICAL_FEATURE_COLUMNS, settings.SCALER_PATH
+    )
+    save_scaler_artifact(
+        scaler,
+        settings.NUMERICAL_FEATURE_COLUMNS,
+        settings.SCALER_ARTIFACT_PATH,
+        metadata={"training_data_hash": training_data_hash()},
+    )
+    X_new_scaled = preprocess_transform(
+        X_new, scaler, settings.NUMERICAL_FEATURE_COLUMNS, settings.CATEGORICAL_COLUMNS
+    )
+
+    # Move the stored rows from the previous to the updated scaling
+    X_processed = read_dataset(settings.PROCESSED_DATA_FOLDER, "X_train_processed")
+    y_processed = read_dataset(settings.PROCESSED_DATA_FOLDER, "y_train_processed")
+    numerical = settings.NUMERICAL_FEATURE_COLUMNS
+    X_processed[numerical] = (
+        X_processed[numerical].to_numpy() * old_scale + old_mean - scaler.mean_
+    ) / scaler.scale_
+
+    write_dataset(
+        pd.concat([X_processed, X_new_scaled], ignore_index=True),
+        settings.PROCESSED_DATA_FOLDER,
+        "X_train_processed",
+    )
+    write_dataset(
+        pd.concat([y_processed, y_new], ignore_index=True),
+        settings.PROCESSED_DATA_FOLDER,
+        "y_train_processed",
+    )
+    write_dataset(X_new_scaled, settings.PROCESSED_DATA_FOLDER, "X_new_processed")
+    write_dataset(y_new, settings.PROCESSED_DATA_FOLDER, "y_new_processed")
+    np.save(settings.SEEN_ROWS_PATH, np.concatenate([seen, hashes[is_new]]))
+    logger.info("Processed data updated successfully")
+
+
 def main():
     """Run preprocessing steps"""
     # Load the data
     logger.info("Loading data")
-    X_train = pd.read_csv(settings.TRAIN_TEST_FOLDER / "X_train.csv")
-    y_train = pd.read_csv(settings.TRAIN_TEST_FOLDER / "y_train.csv")
+    X_train = read_dataset(settings.TRAIN_TEST_FOLDER, "X_train")
+    y_train = read_dataset(settings.TRAIN_TEST_FOLDER, "y_train")
+
+    if settings.TRAIN_INCREMENTAL:
+        if settings.SEEN_ROWS_PATH.exists() and settings.SCALER_PATH.exists():
+            preprocess_incremental(X_train, y_train)
+            return
+        logger.info("No earlier preprocessing state, preprocessing all rows")
 
     # Print data shape of label to check for class imbalance
     label_counts = y_train[settings.TARGET_COLUMN_NAME].value_counts()
@@ -116,6 +284,12 @@ def main():
         settings.NUMERICAL_FEATURE_COLUMNS,
         settings.SCALER_PATH,
     )
+    save_scaler_artifact(
+        scaler,
+        settings.NUMERICAL_FEATURE_COLUMNS,
+        settings.SCALER_ARTIFACT_PATH,
+        metadata={"training_data_hash": training_data_hash()},
+    )
 
     # Transform the data
     X_train_scaled = preprocess_transform(
@@ -125,16 +299,16 @@ def main():
         settings.CATEGORICAL_COLUMNS,
     )
 
-    # Create processed folder if it doesn't exist
-    settings.PROCESSED_DATA_FOLDER.mkdir(parents=True, exist_ok=True)
-
     # Save the processed data
-    X_train_scaled.to_csv(
-        settings.PROCESSED_DATA_FOLDER / "X_train_processed.csv", index=False
-    )
-    y_train_resampled.to_csv(
-        settings.PROCESSED_DATA_FOLDER / "y_train_processed.csv", index=False
+    write_dataset(X_train_scaled, settings.PROCESSED_DATA_FOLDER, "X_train_processed")
+    write_dataset(
+        y_train_resampled, settings.PROCESSED_DATA_FOLDER, "y_train_processed"
     )
+
+    # Remember the rows seen, so that incremental runs only process new ones
+    np.save(settings.SEEN_ROWS_PATH, row_hashes(X_train, y_train))
+    for name in ("X_new_processed", "y_new_processed"):
+        dataset_path(settings.PROCESSED_DATA_FOLDER, name).unlink(missing_ok=True)
     logger.info("Processed data saved successfully")
 
 
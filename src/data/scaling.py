@@ -0,0 +1,69 @@
+"""
+Scaler parameters for inference
+Loads the fitted scaler's mean and scale and applies them to raw feature
+arrays. Only NumPy is needed, so the serving path does not import the
+training dependencies of `src.data.preprocess_data`.
+"""
+
+from pathlib import Path
+import pickle
+from typing import Tuple, Union
+import numpy as np
+from src.modelling.artifact import load_artifact
+
+
+def load_scaler_params(
+    artifact_path: Union[str, Path], scaler_path: Union[str, Path]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Load the scaler ``mean_`` and ``scale_``.
+
+    The parameters are memory-mapped from the scaler artifact, with the
+    pickled scaler as a fallback when no artifact exists.
+
+    Args:
+        artifact_path (Union[str, Path]): Scaler artifact directory
+        scaler_path (Union[str, Path]): Pickled scaler
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Scaler mean and scale
+    """
+    if Path(artifact_path).exists():
+        arrays, _ = load_artifact(artifact_path)
+        return arrays["mean"], arrays["scale"]
+
+    if not Path(scaler_path).exists():
+        raise FileNotFoundError(f"Scaler not found at {scaler_path}")
+    with open(scaler_path, "rb") as f:
+        scaler = pickle.load(f)
+    return (
+        np.asarray(scaler.mean_, dtype=np.float64),
+        np.asarray(scaler.scale_, dtype=np.float64),
+    )
+
+
+def preprocess_transform_array(
+    X: np.ndarray, mean: np.ndarray, scale: np.ndarray
+) -> np.ndarray:
+    """
+    Transform a raw float64 feature array in place using the scaler parameters.
+
+    Array counterpart of `preprocess_data.preprocess_transform` for the
+    serving hot path. The columns of X must be ordered as the numerical
+    feature columns followed by the categorical columns; the first
+    ``len(mean)`` columns are standardized with the same operations as
+    `StandardScaler.transform` and the remaining categorical columns are
+    passed through unchanged.
+
+    Args:
+        X (np.ndarray): Feature array of shape (n_rows, n_features)
+        mean (np.ndarray): Fitted scaler ``mean_``
+        scale (np.ndarray): Fitted scaler ``scale_``
+
+    Returns:
+        np.ndarray: The transformed array (X itself)
+    """
+    numerical = X[:, : mean.shape[0]]
+    numerical -= mean
+    numerical /= scale
+    return X
@@ -0,0 +1,240 @@
+"""
+Checksummed local snapshots of the source dataset
+A snapshot is a directory holding the features and targets as Parquet files,
+the variable metadata as CSV and a manifest.json with the SHA-256 of each
+file, the source version it was fetched for and the files of new customer
+records ingested into it. Snapshots are named by the hash of their contents
+and never modified: ingesting records writes a new snapshot with the rows
+appended, and the CURRENT file names the snapshot in use. Every read checks
+the checksums, so a corrupted snapshot is never used.
+"""
+
+import hashlib
+import json
+import shutil
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, List, Optional
+import pandas as pd
+from src.data.storage import read_file, write_dataset
+from src.logging.console_log import setup_logging
+from src.pipeline.store import file_hash
+from settings import settings
+
+# setup logging
+logger = setup_logging()
+
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+# File suffixes of the customer record drops that can be ingested
+INGEST_SUFFIXES = (".csv", ".parquet")
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    A verified snapshot of the source dataset.
+
+    Args:
+        path (Path): Snapshot directory
+        manifest (dict): Contents of its manifest.json
+    """
+
+    path: Path
+    manifest: dict
+
+    @property
+    def id(self) -> str:
+        return self.path.name
+
+    @property
+    def source_version(self) -> int:
+        return self.manifest["source_version"]
+
+    @property
+    def ingested_hashes(self) -> set:
+        return {entry["sha256"] for entry in self.manifest["ingested"]}
+
+    def features(self) -> pd.DataFrame:
+        return read_file(self.path / "features.parquet")
+
+    def targets(self) -> pd.DataFrame:
+        return read_file(self.path / "targets.parquet")
+
+    def variables(self) -> pd.DataFrame:
+        return pd.read_csv(self.path / "variables.csv", index_col=0)
+
+
+class SnapshotStore:
+    """Local store of dataset snapshots"""
+
+    def __init__(self, root: Path = settings.DATA_SNAPSHOT_FOLDER):
+        self.root = Path(root)
+
+    def load(self, snapshot_id: str) -> Snapshot:
+        """
+        Load a snapshot and verify its checksums.
+
+        Raises:
+            FileNotFoundError: If the snapshot does not exist
+            ValueError: If a file of the snapshot does not match its checksum
+        """
+        path = self.root / snapshot_id
+        with open(path / MANIFEST_FILE) as f:
+            manifest = json.load(f)
+        for name, digest in manifest["files"].items():
+            if file_hash(path / name) != digest:
+                raise ValueError(
+                    f"Snapshot {snapshot_id} is corrupted: checksum mismatch for {name}"
+                )
+        return Snapshot(path, manifest)
+
+    def current(self) -> Optional[Snapshot]:
+        """The snapshot in use, None if there is none yet"""
+        current_file = self.root / CURRENT_FILE
+        if not current_file.exists():
+            return None
+        return self.load(current_file.read_text().strip())
+
+    def latest_valid(self) -> Optional[Snapshot]:
+        """The most recently created snapshot that passes verification, if any"""
+        snapshots = []
+        for path in self.root.glob(f"*/{MANIFEST_FILE}"):
+            if path.parent.name.startswith(".staging-"):
+                continue
+            try:
+                snapshot = self.load(path.parent.name)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping snapshot {path.parent.name}: {e}")
+                continue
+            snapshots.append(snapshot)
+        return max(
+            snapshots,
+            key=lambda snapshot: snapshot.manifest["created_at"],
+            default=None,
+        )
+
+    def save(
+        self,
+        features: pd.DataFrame,
+        targets: pd.DataFrame,
+        variables: pd.DataFrame,
+        source: dict,
+        ingested: Optional[List[dict]] = None,
+        parent: Optional[Snapshot] = None,
+    ) -> Snapshot:
+        """
+        Write a snapshot and make it the current one.
+
+        Args:
+            features (pd.DataFrame): Feature columns of the dataset
+            targets (pd.DataFrame): Target columns of the dataset
+            variables (pd.DataFrame): Variable metadata of the source
+            source (dict): Where the data comes from, with its "source_version"
+            ingested (Optional[List[dict]]): Ingested record files, with their hash and rows
+            parent (Optional[Snapshot]): Snapshot the data was derived from
+
+        Returns:
+            Snapshot: The saved snapshot
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = self.root / f".staging-{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}"
+        staging.mkdir()
+        try:
+            write_dataset(features, staging, "features", "parquet")
+            write_dataset(targets, staging, "targets", "parquet")
+            variables.to_csv(staging / "variables.csv")
+            files = {path.name: file_hash(path) for path in sorted(staging.iterdir())}
+            snapshot_id = hashlib.sha256(
+                json.dumps(files, sort_keys=True).encode()
+            ).hexdigest()[:16]
+            manifest = {
+                **source,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "rows": len(features),
+                "parent": parent.id if parent is not None else None,
+                "ingested": ingested or [],
+                "files": files,
+            }
+            with open(staging / MANIFEST_FILE, "w") as f:
+                json.dump(manifest, f, indent=4, default=str)
+
+            path = self.root / snapshot_id
+            if path.exists():
+                # Same contents as an earlier snapshot
+                shutil.rmtree(staging)
+            else:
+                staging.rename(path)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        # Point CURRENT at the snapshot through a rename, so readers never see a partial id
+        pointer = self.root / f"{CURRENT_FILE}.partial"
+        pointer.write_text(snapshot_id)
+        pointer.replace(self.root / CURRENT_FILE)
+        logger.info(f"Snapshot {snapshot_id} saved with {len(features)} rows")
+        return self.load(snapshot_id)
+
+    def ingest(self, snapshot: Snapshot, paths: Iterable[Path]) -> Snapshot:
+        """
+        Append the records of CSV or Parquet files to a snapshot.
+
+        Files already ingested into the snapshot (by content hash) are
+        skipped. Each file must have the snapshot's feature and target columns.
+
+        Args:
+            snapshot (Snapshot): Snapshot to append to
+            paths (Iterable[Path]): Files of new customer records
+
+        Raises:
+            ValueError: If a file misses columns of the snapshot
+
+        Returns:
+            Snapshot: The new snapshot, or `snapshot` when there was nothing to ingest
+        """
+        features, targets = snapshot.features(), snapshot.targets()
+        seen = snapshot.ingested_hashes
+        new_features, new_targets, ingested = [], [], []
+        for path in sorted(Path(path) for path in paths):
+            digest = file_hash(path)
+            if digest in seen:
+                continue
+            records = read_file(path)
+            missing = [
+                column
+                for column in [*features.columns, *targets.columns]
+                if column not in records.columns
+            ]
+            if missing:
+                raise ValueError(f"Cannot ingest {path}: missing columns {missing}")
+            new_features.append(records[features.columns].astype(features.dtypes))
+            new_targets.append(records[targets.columns].astype(targets.dtypes))
+            ingested.append({"file": path.name, "sha256": digest, "rows": len(records)})
+            seen.add(digest)
+            logger.info(f"Ingesting {len(records)} records from {path}")
+        if not ingested:
+            return snapshot
+
+        source = {
+            key: value
+            for key, value in snapshot.manifest.items()
+            if key not in ("created_at", "rows", "parent", "ingested", "files")
+        }
+        return self.save(
+            pd.concat([features, *new_features], ignore_index=True),
+            pd.concat([targets, *new_targets], ignore_index=True),
+            snapshot.variables(),
+            source,
+            ingested=snapshot.manifest["ingested"] + ingested,
+            parent=snapshot,
+        )
+
+
+def pending_ingest_files(folder: Path = settings.DATA_INGEST_FOLDER) -> List[Path]:
+    """CSV and Parquet files in the ingest folder"""
+    folder = Path(folder)
+    if not folder.is_dir():
+        return []
+    return sorted(path for path in folder.iterdir() if path.suffix in INGEST_SUFFIXES)
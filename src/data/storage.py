@@ -0,0 +1,199 @@
+"""
+Dataset storage shared by the pipeline stages
+Datasets are written as compressed Parquet files, which keep the column
+dtypes and can be read column by column, optionally memory-mapped. The
+format is set with DATA_FORMAT; CSV copies of the stored datasets can be
+exported for inspection.
+
+Run with: python -m src.data.storage [--output exported_csv]
+"""
+
+import argparse
+from pathlib import Path
+from typing import Iterator, List, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.logging.console_log import setup_logging
+from settings import settings
+
+# setup logging
+logger = setup_logging()
+
+# File suffix per data format
+DATA_FORMATS = {"parquet": ".parquet", "csv": ".csv"}
+
+
+def dataset_path(folder: Path, name: str, data_format: Optional[str] = None) -> Path:
+    """
+    Path of a dataset in the configured format.
+
+    Args:
+        folder (Path): Folder of the dataset
+        name (str): Dataset name without suffix, e.g. "X_train"
+        data_format (Optional[str]): "parquet" or "csv", defaults to DATA_FORMAT
+
+    Raises:
+        ValueError: If the format is not supported
+    """
+    data_format = data_format or settings.DATA_FORMAT
+    if data_format not in DATA_FORMATS:
+        raise ValueError(
+            f"Unsupported data format {data_format}, expected one of {list(DATA_FORMATS)}"
+        )
+    return Path(folder) / f"{name}{DATA_FORMATS[data_format]}"
+
+
+def write_dataset(
+    data: pd.DataFrame, folder: Path, name: str, data_format: Optional[str] = None
+) -> Path:
+    """
+    Write a DataFrame as a dataset, without its index.
+
+    Returns:
+        Path: The written file
+    """
+    path = dataset_path(folder, name, data_format)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".parquet":
+        table = pa.Table.from_pandas(data, preserve_index=False)
+        pq.write_table(table, path, compression=settings.DATA_COMPRESSION)
+    else:
+        data.to_csv(path, index=False)
+    return path
+
+
+def read_file(
+    path: Path,
+    columns: Optional[List[str]] = None,
+    memory_map: bool = False,
+    nrows: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Read a Parquet or CSV file.
+
+    Args:
+        path (Path): File to read; the format follows its suffix
+        columns (Optional[List[str]]): Columns to read, defaults to all
+        memory_map (bool): Memory-map a Parquet file instead of reading it into memory
+        nrows (Optional[int]): Read only the first rows
+
+    Returns:
+        pd.DataFrame: The file's data
+    """
+    path = Path(path)
+    if path.suffix != ".parquet":
+        return pd.read_csv(path, usecols=columns, nrows=nrows)
+    if nrows is None:
+        table = pq.read_table(path, columns=columns, memory_map=memory_map)
+        # Free each Arrow column once converted, so the data is not held twice
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+    # Only the leading row groups are decoded
+    parquet_file = pq.ParquetFile(path, memory_map=memory_map)
+    batch = next(parquet_file.iter_batches(batch_size=nrows, columns=columns), None)
+    if batch is None:
+        return pq.read_table(path, columns=columns).to_pandas()
+    return pa.Table.from_batches([batch]).to_pandas()
+
+
+def read_dataset(
+    folder: Path,
+    name: str,
+    columns: Optional[List[str]] = None,
+    memory_map: bool = False,
+    nrows: Optional[int] = None,
+) -> pd.DataFrame:
+    """Read a dataset written by `write_dataset`; see `read_file` for the arguments"""
+    return read_file(
+        dataset_path(folder, name), columns=columns, memory_map=memory_map, nrows=nrows
+    )
+
+
+def iter_file(
+    path: Path,
+    columns: Optional[List[str]] = None,
+    chunk_size: int = 100_000,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream a Parquet or CSV file in chunks.
+
+    Every chunk but the last holds exactly `chunk_size` rows, whatever the
+    row groups of a Parquet file, so the chunks of two files with the same
+    number of rows (such as X_test and y_test) line up.
+
+    Args:
+        path (Path): File to read; the format follows its suffix
+        columns (Optional[List[str]]): Columns to read, defaults to all
+        chunk_size (int): Rows per chunk
+    """
+    path = Path(path)
+    if path.suffix != ".parquet":
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size)
+        return
+    pending: List[pa.RecordBatch] = []
+    n_pending = 0
+    for batch in pq.ParquetFile(path).iter_batches(
+        batch_size=chunk_size, columns=columns
+    ):
+        pending.append(batch)
+        n_pending += batch.num_rows
+        while n_pending >= chunk_size:
+            table = pa.Table.from_batches(pending)
+            yield table.slice(0, chunk_size).to_pandas()
+            rest = table.slice(chunk_size)
+            pending, n_pending = rest.to_batches(), rest.num_rows
+    if n_pending:
+        yield pa.Table.from_batches(pending).to_pandas()
+
+
+def iter_dataset(
+    folder: Path,
+    name: str,
+    columns: Optional[List[str]] = None,
+    chunk_size: int = 100_000,
+) -> Iterator[pd.DataFrame]:
+    """Stream a dataset written by `write_dataset`; see `iter_file` for the arguments"""
+    return iter_file(dataset_path(folder, name), columns=columns, chunk_size=chunk_size)
+
+
+def export_csv(path: Path, output_folder: Optional[Path] = None) -> Path:
+    """
+    Write a CSV copy of a Parquet dataset.
+
+    Args:
+        path (Path): Parquet file
+        output_folder (Optional[Path]): Folder of the copy, defaults to the file's folder
+
+    Returns:
+        Path: The CSV file
+    """
+    path = Path(path)
+    target = Path(output_folder or path.parent) / f"{path.stem}.csv"
+    target.parent.mkdir(parents=True, exist_ok=True)
+    read_file(path).to_csv(target, index=False)
+    return target
+
+
+def main():
+    """Export the Parquet datasets of the data folder to CSV"""
+    parser = argparse.ArgumentParser(description="Export the stored datasets to CSV")
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="Folder of the CSV copies, mirroring the data folder (default: next to each dataset)",
+    )
+    args = parser.parse_args()
+    paths = sorted(settings.DATA_FOLDER.rglob("*.parquet"))
+    for path in paths:
+        output_folder = None
+        if args.output is not None:
+            output_folder = args.output / path.parent.relative_to(settings.DATA_FOLDER)
+        logger.info(
+            f"Exported {path.relative_to(settings.DATA_FOLDER)} to {export_csv(path, output_folder)}"
+        )
+    if not paths:
+        logger.info(f"No Parquet datasets found in {settings.DATA_FOLDER}")
+
+
+if __name__ == "__main__":
+    main()
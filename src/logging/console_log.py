@@ -2,11 +2,23 @@
 Console logging configuration
 """
 
+import json
 import logging
+import os
+import queue
+import random
 import sys
+import threading
+import traceback
+from typing import Callable, Optional, TextIO
 
 from loguru import logger
 
+# Records from these stdlib loggers are emitted once per request
+PER_REQUEST_LOGGERS = ("uvicorn.access",)
+
+TEXT_FORMAT = "<level>{level: <6}</level> | <green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <blue>{process}</blue> | <cyan>{name}</cyan>:<cyan>{function}</cyan> | <level>{message}</level>"
+
 
 class InterceptHandler(logging.Handler):
     loglevel_mapping = {
@@ -18,24 +30,195 @@ class InterceptHandler(logging.Handler):
         0: "NOTSET",
     }
 
+    # Fraction of per-request records that are kept, set by setup_logging
+    sample_rate = 1.0
+
     def emit(self, record):
+        # Drop sampled-out per-request records before any formatting work
+        if (
+            self.sample_rate < 1
+            and record.name in PER_REQUEST_LOGGERS
+            and random.random() >= self.sample_rate
+        ):
+            return
+
         # Get corresponding Loguru level if it exists
         try:
             level = logger.level(record.levelname).name
         except AttributeError:
             level = self.loglevel_mapping[record.levelno]
-        # Find caller from where originated the logged message
-        frame, depth = logging.currentframe(), 2
-        while frame.f_code.co_filename == logging.__file__:
-            frame = frame.f_back
-            depth += 1
 
-        log = logger.bind(request_id="app")
-        log.opt(depth=depth, exception=record.exc_info).log(level, record.getMessage())
+        # The stdlib record already holds its origin; use it instead of
+        # walking the stack for the caller
+        def set_origin(loguru_record):
+            loguru_record.update(
+                name=record.name, function=record.funcName, line=record.lineno
+            )
+
+        log = logger.bind(request_id="app").patch(set_origin)
+        log.opt(exception=record.exc_info).log(level, record.getMessage())
+
+
+def format_text(record: dict) -> str:
+    """Plain text line matching the console format"""
+    line = (
+        f"{record['level'].name: <6} | {record['time']:%Y-%m-%d %H:%M:%S}."
+        f"{record['time'].microsecond // 1000:03d} | {record['process'].id} | "
+        f"{record['name']}:{record['function']} | {record['message']}\n"
+    )
+    if record["exception"] is not None:
+        line += "".join(traceback.format_exception(*record["exception"]))
+    return line
+
+
+def format_json(record: dict) -> str:
+    """One JSON object per line"""
+    entry = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "process": record["process"].id,
+        "name": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "message": record["message"],
+    }
+    extra = {key: value for key, value in record["extra"].items() if value is not None}
+    if extra:
+        entry["extra"] = extra
+    if record["exception"] is not None:
+        entry["exception"] = "".join(traceback.format_exception(*record["exception"]))
+    return json.dumps(entry, default=str, separators=(",", ":")) + "\n"
+
+
+class FormattedSink:
+    """Synchronous sink writing records with a custom formatter"""
+
+    def __init__(self, stream: TextIO, formatter: Callable[[dict], str]):
+        self.stream = stream
+        self.formatter = formatter
+
+    def write(self, message):
+        self.stream.write(self.formatter(message.record))
+        self.stream.flush()
+
+
+class BufferedSink:
+    """
+    Non-blocking sink: records go into a bounded buffer that a background
+    thread formats and writes in batches. When the buffer is full, records
+    are dropped and counted instead of blocking the caller.
+    """
+
+    def __init__(
+        self,
+        stream: TextIO,
+        formatter: Callable[[dict], str],
+        max_size: int = 10000,
+        batch_size: int = 256,
+    ):
+        self.stream = stream
+        self.formatter = formatter
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._drop_lock = threading.Lock()
+        self._stopped = False
+        self._start()
+
+    def _start(self):
+        if self._stopped:
+            return
+        self._queue = queue.Queue(self.max_size)
+        self._thread = threading.Thread(
+            target=self._run, name="log-writer", daemon=True
+        )
+        self._thread.start()
+
+    def restart_after_fork(self):
+        """Start a writer thread in a forked child, with its own drop count"""
+        self._drop_lock = threading.Lock()
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._start()
+
+    def write(self, message):
+        try:
+            self._queue.put_nowait(message.record)
+        except queue.Full:
+            with self._drop_lock:
+                self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = batch[-1] is None
+            lines = [self.formatter(record) for record in batch if record is not None]
+            dropped = self.dropped
+            if dropped > self._reported_dropped:
+                lines.append(
+                    f"WARNING | {dropped - self._reported_dropped} log records dropped, "
+                    f"buffer of {self.max_size} full\n"
+                )
+                self._reported_dropped = dropped
+            try:
+                self.stream.write("".join(lines))
+                self.stream.flush()
+            except (OSError, ValueError):
+                # Stream closed at interpreter shutdown
+                return
+            if stopping:
+                return
+
+    def stop(self):
+        """Flush the buffered records and stop the writer thread"""
+        self._stopped = True
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+
+def sample_filter(sample_rate: float) -> Callable[[dict], bool]:
+    """Keep records bound with `per_request=True` with probability `sample_rate`"""
+
+    def keep(record: dict) -> bool:
+        if record["extra"].get("per_request"):
+            return random.random() < sample_rate
+        return True
+
+    return keep
+
+
+_configured: Optional[tuple] = None
+_buffered_sink: Optional[BufferedSink] = None
+
+
+def dropped_log_records() -> int:
+    """Records dropped by this process's buffered sink since it was configured or forked"""
+    return _buffered_sink.dropped if _buffered_sink is not None else 0
+
+
+def _restart_buffered_sink() -> None:
+    if _buffered_sink is not None:
+        _buffered_sink.restart_after_fork()
+
+
+# Threads do not survive fork (LitServe forks its API servers); one hook
+# restarts whichever sink is configured at the time of the fork
+os.register_at_fork(after_in_child=_restart_buffered_sink)
+
 
+def setup_logging(stream: Optional[TextIO] = None) -> logging.Logger:
+    global _configured, _buffered_sink
+    from settings import settings
 
-def setup_logging() -> logging.Logger:
     # intercept everything at the root logger
+    InterceptHandler.sample_rate = settings.LOG_SAMPLE_RATE
     logging.root.handlers = [InterceptHandler()]
     logging.root.setLevel("INFO")
 
@@ -45,16 +228,32 @@ def setup_logging() -> logging.Logger:
         logging.getLogger(name).handlers = []
         logging.getLogger(name).propagate = True
 
-    # configure loguru
-    logger.configure(
-        handlers=[
-            {
-                "sink": sys.stdout,
-                "serialize": False,
-                "level": "INFO",
-                "format": "<level>{level: <6}</level> | <green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <blue>{process}</blue> | <cyan>{name}</cyan>:<cyan>{function}</cyan> | <level>{message}</level>",
-            }
-        ]
+    # configure loguru once per process and configuration, so the many
+    # module-level calls do not restart the sink
+    stream = stream or sys.stdout
+    config = (
+        settings.LOG_FORMAT,
+        settings.LOG_ASYNC,
+        settings.LOG_BUFFER_SIZE,
+        settings.LOG_SAMPLE_RATE,
+        id(stream),
     )
+    if config != _configured:
+        formatter = format_json if settings.LOG_FORMAT == "json" else format_text
+        _buffered_sink = None
+        if settings.LOG_ASYNC:
+            _buffered_sink = BufferedSink(
+                stream, formatter, max_size=settings.LOG_BUFFER_SIZE
+            )
+            handler = {"sink": _buffered_sink, "format": "{message}"}
+        elif settings.LOG_FORMAT == "json":
+            handler = {"sink": FormattedSink(stream, formatter), "format": "{message}"}
+        else:
+            handler = {"sink": stream, "serialize": False, "format": TEXT_FORMAT}
+        handler["level"] = "INFO"
+        if settings.LOG_SAMPLE_RATE < 1:
+            handler["filter"] = sample_filter(settings.LOG_SAMPLE_RATE)
+        logger.configure(handlers=[handler])
+        _configured = config
 
     return logger.bind(request_id=None, method=None)
@@ -0,0 +1,156 @@
+"""
+Memory-mappable model artifact format
+An artifact is a directory with one .npy file per array plus a metadata.json
+file describing the arrays and the model (feature order, training data hash,
+warmup batch, ...). Arrays are opened read-only with ``mmap_mode="r"``, so every
+serving worker on a node shares the same page-cache pages instead of holding
+its own unpickled copy, and loading takes milliseconds.
+
+Each save writes a new directory next to the artifact path, which is a
+symlink to the current one; the link is replaced with a single rename, so a
+reader resolving it sees either the previous or the new artifact, never a
+mix of both or no artifact at all.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Tuple, Union
+import numpy as np
+
+ARTIFACT_FORMAT_VERSION = 1
+METADATA_FILE = "metadata.json"
+# Versions kept next to the link: the current one and the previous one, which
+# readers that resolved the link before a swap may still be loading
+KEPT_VERSIONS = 2
+
+
+def hash_files(paths: Iterable[Union[str, Path]]) -> str:
+    """SHA-256 of the concatenated contents of the given files"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def new_version_path(path: Union[str, Path]) -> Path:
+    """Create an empty, unpublished version directory for the artifact at `path`"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    version_path = path.with_name(
+        f"{path.name}.{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}"
+    )
+    version_path.mkdir()
+    return version_path
+
+
+def publish_version(path: Union[str, Path], version_path: Path) -> None:
+    """
+    Atomically point the artifact at `path` to a complete version directory.
+
+    The version directory must not be written to afterwards. The previous
+    version is kept for readers still loading it; older ones are deleted.
+    """
+    path = Path(path)
+    if path.is_dir() and not path.is_symlink():
+        # Artifact written before the versioned layout: move it aside so the link can take its place
+        legacy_path = path.with_name(f"{path.name}.00000000T000000000000")
+        shutil.rmtree(legacy_path, ignore_errors=True)
+        path.rename(legacy_path)
+    # Swap the new artifact into place by renaming a new link over the old one
+    link_path = path.with_name(f".{path.name}.link")
+    if link_path.is_symlink():
+        link_path.unlink()
+    link_path.symlink_to(version_path.name)
+    os.replace(link_path, path)
+
+    previous_versions = sorted(
+        version
+        for version in path.parent.glob(f"{path.name}.*T*")
+        if version != version_path and version.is_dir() and not version.is_symlink()
+    )
+    for old_path in previous_versions[: len(previous_versions) - (KEPT_VERSIONS - 1)]:
+        shutil.rmtree(old_path, ignore_errors=True)
+
+
+def save_artifact(
+    path: Union[str, Path], arrays: Dict[str, np.ndarray], metadata: dict
+) -> dict:
+    """
+    Write arrays and metadata as an artifact directory.
+
+    The artifact is written to a new directory next to `path` and `path` is
+    then atomically pointed at it, so readers never see a partially written
+    artifact. The artifact version is the hash of its array contents.
+
+    Args:
+        path (Union[str, Path]): Artifact path, a symlink to the current version
+        arrays (Dict[str, np.ndarray]): Arrays to store, by name
+        metadata (dict): JSON-serializable metadata
+
+    Returns:
+        dict: The metadata as written, including format and array details
+    """
+    version_path = new_version_path(path)
+
+    digest = hashlib.sha256()
+    array_specs = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        np.save(version_path / f"{name}.npy", array, allow_pickle=False)
+        digest.update(name.encode())
+        digest.update(array.tobytes())
+        array_specs[name] = {"dtype": array.dtype.str, "shape": list(array.shape)}
+
+    metadata = {
+        **metadata,
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "version": digest.hexdigest()[:12],
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "arrays": array_specs,
+    }
+    with open(version_path / METADATA_FILE, "w") as f:
+        json.dump(metadata, f, indent=4)
+
+    publish_version(path, version_path)
+    return metadata
+
+
+def read_metadata(path: Union[str, Path]) -> dict:
+    """Read and check the metadata of an artifact"""
+    with open(Path(path) / METADATA_FILE) as f:
+        metadata = json.load(f)
+    if metadata.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported artifact format {metadata.get('format_version')} at {path}, "
+            f"expected {ARTIFACT_FORMAT_VERSION}"
+        )
+    return metadata
+
+
+def load_artifact(
+    path: Union[str, Path], mmap: bool = True
+) -> Tuple[Dict[str, np.ndarray], dict]:
+    """
+    Load the arrays and metadata of an artifact.
+
+    Args:
+        path (Union[str, Path]): Artifact directory
+        mmap (bool): Memory-map the arrays read-only instead of reading them
+
+    Returns:
+        Tuple[Dict[str, np.ndarray], dict]: Arrays by name and metadata
+    """
+    # Resolve the link once, so the metadata and arrays come from the same version
+    path = Path(path).resolve()
+    metadata = read_metadata(path)
+    arrays = {
+        name: np.load(path / f"{name}.npy", mmap_mode="r" if mmap else None)
+        for name in metadata["arrays"]
+    }
+    return arrays, metadata
@@ -0,0 +1,254 @@
+"""
+Compress the trained forest for serving
+Evaluates cheaper stand-ins for the trained Random Forest on the test split:
+sub-forests made of its first trees, shallower forests re-fitted on the
+training data and single decision trees distilled from its predictions. The
+candidate with the lowest inference cost whose accuracy and F1 stay within
+COMPRESSION_TOLERANCE of the full forest is saved as the compressed model;
+the full model is left in place for comparison. The compressed model records
+the version of the full model it was derived from, and is only served while
+that full model is the saved one.
+
+Run with: python -m src.modelling.compress
+"""
+
+import copy
+import json
+import pickle
+from pathlib import Path
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+from src.data.scaling import load_scaler_params, preprocess_transform_array
+from src.data.storage import read_dataset
+from src.logging.console_log import setup_logging
+from src.modelling.artifact import read_metadata
+from src.modelling.flat_forest import FlatForest
+from src.modelling.evaluation import evaluate_model
+from src.modelling.train import warmup_batch
+from src.modelling.tuning import forest_size, predict_latency
+from settings import settings
+
+# setup logging
+logger = setup_logging()
+
+# Candidate grids
+SUB_FOREST_SIZES = (1, 2, 5, 10, 20, 50)
+REFIT_ESTIMATORS = (5, 10, 25, 50)
+REFIT_DEPTHS = (3, 4, 6, 8)
+DISTILLED_DEPTHS = (4, 6, 8, 10, 12)
+
+
+def estimators_of(model) -> list:
+    """Trees of a forest, or the model itself for a single tree"""
+    return getattr(model, "estimators_", [model])
+
+
+def inference_cost(model) -> int:
+    """Node visits per row of the flat engine: trees times maximum depth"""
+    estimators = estimators_of(model)
+    return len(estimators) * max(estimator.tree_.max_depth for estimator in estimators)
+
+
+def sub_forest(
+    model: RandomForestClassifier, n_estimators: int
+) -> RandomForestClassifier:
+    """The forest restricted to its first `n_estimators` trees"""
+    subset = copy.copy(model)
+    subset.estimators_ = model.estimators_[:n_estimators]
+    subset.n_estimators = n_estimators
+    return subset
+
+
+def candidates(
+    model: RandomForestClassifier, X_train: pd.DataFrame, y_train: pd.Series
+) -> List[Tuple[str, dict, object]]:
+    """
+    Compressed candidates of the trained forest.
+
+    Returns:
+        List[Tuple[str, dict, object]]: Kind, parameters and fitted model of each candidate
+    """
+    found = [("full", {"n_estimators": model.n_estimators}, model)]
+    for n_estimators in SUB_FOREST_SIZES:
+        if n_estimators < model.n_estimators:
+            found.append(
+                (
+                    "sub_forest",
+                    {"n_estimators": n_estimators},
+                    sub_forest(model, n_estimators),
+                )
+            )
+
+    params = model.get_params()
+    for n_estimators in REFIT_ESTIMATORS:
+        for max_depth in REFIT_DEPTHS:
+            refit = RandomForestClassifier(
+                **{
+                    **params,
+                    "n_estimators": n_estimators,
+                    "max_depth": max_depth,
+                    "n_jobs": settings.TRAIN_N_JOBS,
+                }
+            ).fit(X_train, y_train)
+            refit.set_params(n_jobs=None)
+            found.append(
+                ("refit", {"n_estimators": n_estimators, "max_depth": max_depth}, refit)
+            )
+
+    # Distillation: a single tree learns the forest's predictions
+    forest_labels = model.predict(X_train)
+    for max_depth in DISTILLED_DEPTHS:
+        tree = DecisionTreeClassifier(
+            max_depth=max_depth, random_state=settings.RANDOM_STATE
+        )
+        found.append(
+            ("distilled", {"max_depth": max_depth}, tree.fit(X_train, forest_labels))
+        )
+    return found
+
+
+def artifact_bytes(path: Path) -> int:
+    """Size of a file, or of all files in a directory"""
+    if path.is_dir():
+        return sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+    return path.stat().st_size
+
+
+def save_compressed_model(model, metadata: dict) -> Dict[str, int]:
+    """
+    Save the compressed model as a pickle and a flat forest artifact.
+
+    Returns:
+        Dict[str, int]: Size in bytes of each saved form
+    """
+    settings.COMPRESSED_MODEL_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(settings.COMPRESSED_MODEL_PATH, "wb") as file:
+        pickle.dump(model, file)
+    FlatForest.from_sklearn(model).save(
+        settings.COMPRESSED_MODEL_ARTIFACT_PATH, metadata=metadata
+    )
+    return {
+        "pickle": artifact_bytes(settings.COMPRESSED_MODEL_PATH),
+        "flat_forest": artifact_bytes(settings.COMPRESSED_MODEL_ARTIFACT_PATH),
+    }
+
+
+def main():
+    """Search for the compressed model and save it next to the full one"""
+    logger.info("Loading model and data")
+    with open(settings.MODEL_PATH, "rb") as file:
+        model = pickle.load(file)
+    X_train = read_dataset(settings.PROCESSED_DATA_FOLDER, "X_train_processed")
+    y_train = read_dataset(
+        settings.PROCESSED_DATA_FOLDER,
+        "y_train_processed",
+        columns=[settings.TARGET_COLUMN_NAME],
+    )[settings.TARGET_COLUMN_NAME]
+    feature_columns = settings.NUMERICAL_FEATURE_COLUMNS + settings.CATEGORICAL_COLUMNS
+    X_test = read_dataset(settings.TRAIN_TEST_FOLDER, "X_test", columns=feature_columns)
+    y_test = read_dataset(
+        settings.TRAIN_TEST_FOLDER, "y_test", columns=[settings.TARGET_COLUMN_NAME]
+    )[settings.TARGET_COLUMN_NAME]
+    scaler_mean, scaler_scale = load_scaler_params(
+        settings.SCALER_ARTIFACT_PATH, settings.SCALER_PATH
+    )
+    X_test_scaled = pd.DataFrame(
+        preprocess_transform_array(
+            X_test.to_numpy(dtype=np.float64), scaler_mean, scaler_scale
+        ),
+        columns=feature_columns,
+    )
+
+    results = []
+    for kind, params, candidate in candidates(model, X_train, y_train):
+        metrics = evaluate_model(y_test, candidate.predict(X_test_scaled))
+        results.append(
+            {
+                "kind": kind,
+                "params": params,
+                "metrics": metrics,
+                "trees": len(estimators_of(candidate)),
+                "nodes": forest_size(candidate),
+                "inference_cost": inference_cost(candidate),
+                "model": candidate,
+            }
+        )
+    full = results[0]
+    tolerance = settings.COMPRESSION_TOLERANCE
+    passing = [
+        result
+        for result in results
+        if result["metrics"]["accuracy"] >= full["metrics"]["accuracy"] - tolerance
+        and result["metrics"]["f1_score"] >= full["metrics"]["f1_score"] - tolerance
+    ]
+    selected = min(
+        passing, key=lambda result: (result["inference_cost"], result["nodes"])
+    )
+
+    # Measured cost of the full and the selected model
+    row = X_test_scaled.iloc[:1]
+    for result in (full, selected):
+        flat = FlatForest.from_sklearn(result["model"])
+        result["latency_ms"] = {
+            "sklearn": predict_latency(result["model"], row) * 1000,
+            "flat": predict_latency(flat, row.to_numpy(dtype=np.float64)) * 1000,
+        }
+
+    selected["bytes"] = save_compressed_model(
+        selected["model"],
+        metadata={
+            "feature_columns": feature_columns,
+            "warmup": warmup_batch(selected["model"]),
+            "compression": {"kind": selected["kind"], "params": selected["params"]},
+            # Served only while the full model is this version
+            "source_model_version": read_metadata(settings.MODEL_ARTIFACT_PATH)[
+                "version"
+            ],
+            "metrics": selected["metrics"],
+            "full_model_metrics": full["metrics"],
+        },
+    )
+    full["bytes"] = {
+        "pickle": artifact_bytes(settings.MODEL_PATH),
+        "flat_forest": artifact_bytes(settings.MODEL_ARTIFACT_PATH),
+    }
+    logger.info(
+        f"Compressed model: {selected['kind']} {selected['params']}, "
+        f"accuracy {selected['metrics']['accuracy']:.4f} (full {full['metrics']['accuracy']:.4f}), "
+        f"F1 {selected['metrics']['f1_score']:.4f} (full {full['metrics']['f1_score']:.4f}), "
+        f"{selected['latency_ms']['flat']:.3f} ms per row on the flat engine "
+        f"(full {full['latency_ms']['flat']:.3f} ms), "
+        f"{selected['bytes']['flat_forest'] / 1024:.0f} KiB artifact "
+        f"(full {full['bytes']['flat_forest'] / 1024:.0f} KiB)"
+    )
+
+    settings.METRICS_PATH.mkdir(parents=True, exist_ok=True)
+    results_file = settings.METRICS_PATH / "compression_results.json"
+    with open(results_file, "w") as f:
+        json.dump(
+            {
+                "tolerance": tolerance,
+                "full": {key: value for key, value in full.items() if key != "model"},
+                "selected": {
+                    key: value for key, value in selected.items() if key != "model"
+                },
+                "candidates": [
+                    {
+                        key: value
+                        for key, value in result.items()
+                        if key not in ("model", "latency_ms", "bytes")
+                    }
+                    for result in results
+                ],
+            },
+            f,
+            indent=4,
+        )
+    logger.info(f"Compression results saved to {results_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Confusion-matrix evaluation engine
+Predictions are accumulated chunk by chunk into a confusion matrix, from
+which accuracy and the support-weighted precision, recall and F1 score are
+derived, so the test set never has to be held in memory. Confidence
+intervals come from bootstrapping the matrix itself: resampling n rows with
+replacement is the same as drawing the n cell counts from a multinomial with
+the observed cell frequencies, so resamples are drawn and scored in blocks
+of arrays, split evenly over a process pool.
+"""
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+# Metrics derived from the confusion matrix, in report order
+METRIC_NAMES = ("accuracy", "precision", "recall", "f1_score")
+
+# Bootstrap resamples drawn from one seed; the blocks are split over the
+# worker processes, so the resamples, and so the intervals, do not depend on
+# the number of workers
+BOOTSTRAP_BLOCK_SIZE = 100
+
+
+class ConfusionMatrix:
+    """
+    Confusion matrix accumulated over chunks of labels.
+
+    Rows are the true labels and columns the predicted ones, both in sorted
+    label order. As with sklearn's `confusion_matrix`, the labels are those
+    seen in either array unless they are given.
+
+    Args:
+        labels (Optional[Iterable]): Labels known in advance
+    """
+
+    def __init__(self, labels: Optional[Iterable] = None):
+        self.labels = np.unique(np.asarray([] if labels is None else list(labels)))
+        self.matrix = np.zeros((len(self.labels), len(self.labels)), dtype=np.int64)
+
+    def _add_labels(self, values: np.ndarray) -> None:
+        """Grow the matrix with the labels of `values` that are not known yet"""
+        # An empty label array is float64, so the labels take their dtype from the values
+        labels = (
+            np.union1d(self.labels, values) if len(self.labels) else np.unique(values)
+        )
+        matrix = np.zeros((len(labels), len(labels)), dtype=np.int64)
+        index = np.searchsorted(labels, self.labels)
+        matrix[np.ix_(index, index)] = self.matrix
+        self.labels, self.matrix = labels, matrix
+
+    def _indices(self, values: np.ndarray) -> np.ndarray:
+        """Position of each value in the labels"""
+        index = np.searchsorted(self.labels, values)
+        np.minimum(index, len(self.labels) - 1, out=index)
+        return index
+
+    def update(self, y_true: np.ndarray, y_pred: np.ndarray) -> None:
+        """Add a chunk of true and predicted labels"""
+        y_true, y_pred = np.asarray(y_true).ravel(), np.asarray(y_pred).ravel()
+        if len(y_true) != len(y_pred):
+            raise ValueError(
+                f"Got {len(y_true)} true labels and {len(y_pred)} predictions"
+            )
+        if len(y_true) == 0:
+            return
+        for values in (y_true, y_pred):
+            if len(self.labels) == 0 or not np.array_equal(
+                self.labels[self._indices(values)], values
+            ):
+                self._add_labels(values)
+        n_labels = len(self.labels)
+        cells = self._indices(y_true) * n_labels + self._indices(y_pred)
+        self.matrix += np.bincount(cells, minlength=n_labels * n_labels).reshape(
+            n_labels, n_labels
+        )
+
+    @property
+    def n_samples(self) -> int:
+        return int(self.matrix.sum())
+
+
+def class_metrics(
+    matrix: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Per-class precision, recall, F1 score and support.
+
+    Works on one (n_labels, n_labels) matrix or a stack of them; undefined
+    ratios are 0, as with sklearn's default `zero_division`.
+
+    Returns:
+        Tuple: Arrays of shape (..., n_labels)
+    """
+    true_positives = np.diagonal(matrix, axis1=-2, axis2=-1).astype(np.float64)
+    support = matrix.sum(axis=-1)
+    predicted = matrix.sum(axis=-2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(predicted > 0, true_positives / predicted, 0.0)
+        recall = np.where(support > 0, true_positives / support, 0.0)
+        f1 = np.where(
+            support + predicted > 0, 2 * true_positives / (support + predicted), 0.0
+        )
+    return precision, recall, f1, support
+
+
+def matrix_metrics(matrix: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Accuracy and support-weighted precision, recall and F1 score.
+
+    Args:
+        matrix (np.ndarray): (n_labels, n_labels) matrix or a stack of them
+
+    Returns:
+        Dict[str, np.ndarray]: One value, or one per matrix, for each of METRIC_NAMES
+    """
+    precision, recall, f1, support = class_metrics(matrix)
+    total = support.sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        accuracy = np.diagonal(matrix, axis1=-2, axis2=-1).sum(axis=-1) / total
+        weighted = [
+            (values * support).sum(axis=-1) / total
+            for values in (precision, recall, f1)
+        ]
+    return dict(zip(METRIC_NAMES, [accuracy, *weighted]))
+
+
+def metrics_from_matrix(matrix: np.ndarray) -> Dict[str, float]:
+    """Metrics of one confusion matrix as floats"""
+    return {name: float(value) for name, value in matrix_metrics(matrix).items()}
+
+
+def evaluate_model(y_true: np.ndarray, y_pred: np.ndarray) -> Dict[str, float]:
+    """Calculate classification metrics"""
+    confusion = ConfusionMatrix()
+    confusion.update(y_true, y_pred)
+    return metrics_from_matrix(confusion.matrix)
+
+
+def _bootstrap_blocks(
+    matrix: np.ndarray, sizes: List[int], seeds: List[np.random.SeedSequence]
+) -> Dict[str, np.ndarray]:
+    """Metrics of multinomial resamples of a confusion matrix, one seed per block"""
+    n_samples = int(matrix.sum())
+    blocks = [
+        np.random.default_rng(seed).multinomial(
+            n_samples, matrix.ravel() / n_samples, size=size
+        )
+        for size, seed in zip(sizes, seeds)
+    ]
+    cells = np.concatenate(blocks)
+    return matrix_metrics(cells.reshape(len(cells), *matrix.shape))
+
+
+def bootstrap_intervals(
+    matrix: np.ndarray,
+    n_resamples: int = 1000,
+    confidence: float = 0.95,
+    n_workers: int = 1,
+    seed: Optional[int] = None,
+) -> Dict[str, List[float]]:
+    """
+    Percentile bootstrap confidence intervals of the metrics.
+
+    Args:
+        matrix (np.ndarray): Confusion matrix of the test set
+        n_resamples (int): Bootstrap resamples
+        confidence (float): Coverage of the intervals, e.g. 0.95
+        n_workers (int): Processes drawing the resamples, each an equal
+            share of the blocks; one draws them in the calling process
+        seed (Optional[int]): Seed of the resamples
+
+    Returns:
+        Dict[str, List[float]]: [lower, upper] bound of each metric
+    """
+    if matrix.sum() == 0:
+        raise ValueError("Cannot bootstrap an empty confusion matrix")
+    n_blocks = math.ceil(n_resamples / BOOTSTRAP_BLOCK_SIZE)
+    sizes = [
+        min(BOOTSTRAP_BLOCK_SIZE, n_resamples - i * BOOTSTRAP_BLOCK_SIZE)
+        for i in range(n_blocks)
+    ]
+    seeds = np.random.SeedSequence(seed).spawn(n_blocks)
+    # One task of consecutive blocks per worker
+    n_workers = max(1, min(n_workers, n_blocks))
+    bounds = np.linspace(0, n_blocks, n_workers + 1).astype(int)
+    tasks = [
+        (sizes[start:end], seeds[start:end])
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ]
+    if n_workers == 1:
+        results = [_bootstrap_blocks(matrix, *task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(
+                executor.map(
+                    _bootstrap_blocks,
+                    [matrix] * n_workers,
+                    *zip(*tasks),
+                )
+            )
+    alpha = (1 - confidence) / 2
+    intervals = {}
+    for name in METRIC_NAMES:
+        values = np.concatenate([result[name] for result in results])
+        lower, upper = np.nanquantile(values, [alpha, 1 - alpha])
+        intervals[name] = [float(lower), float(upper)]
+    return intervals
+
+
+def classification_report(confusion: ConfusionMatrix, digits: int = 2) -> str:
+    """Text report of the per-class metrics, laid out like sklearn's `classification_report`"""
+    precision, recall, f1, support = class_metrics(confusion.matrix)
+    target_names = [str(label) for label in confusion.labels.tolist()]
+    headers = ["precision", "recall", "f1-score", "support"]
+    width = max(len(name) for name in target_names + ["weighted avg"])
+    row_format = "{:>{width}s} " + " {:>9.{digits}f}" * 3 + " {:>9}\n"
+
+    report = ("{:>{width}s} " + " {:>9}" * len(headers)).format(
+        "", *headers, width=width
+    ) + "\n\n"
+    for row in zip(target_names, precision, recall, f1, support):
+        report += row_format.format(*row, width=width, digits=digits)
+    report += "\n"
+
+    total = int(support.sum())
+    metrics = metrics_from_matrix(confusion.matrix)
+    report += (
+        "{:>{width}s} " + " {:>9.{digits}}" * 2 + " {:>9.{digits}f}" + " {:>9}\n"
+    ).format("accuracy", "", "", metrics["accuracy"], total, width=width, digits=digits)
+    report += row_format.format(
+        "macro avg",
+        precision.mean(),
+        recall.mean(),
+        f1.mean(),
+        total,
+        width=width,
+        digits=digits,
+    )
+    report += row_format.format(
+        "weighted avg",
+        metrics["precision"],
+        metrics["recall"],
+        metrics["f1_score"],
+        total,
+        width=width,
+        digits=digits,
+    )
+    return report
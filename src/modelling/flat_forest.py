@@ -0,0 +1,264 @@
+"""
+Flat-array inference engine for the trained Random Forest
+Flattens every tree of a fitted RandomForestClassifier into contiguous NumPy
+arrays and evaluates all trees for a whole batch at once, avoiding sklearn's
+per-estimator dispatch and joblib overhead on the serving path.
+"""
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Tuple, Union
+import pickle
+import numpy as np
+from src.logging.console_log import setup_logging
+from src.modelling.artifact import load_artifact, read_metadata, save_artifact
+from settings import settings
+
+# setup logging
+logger = setup_logging()
+
+# Compressed models already reported as stale, so each is logged once
+_stale_compressed_models = set()
+
+if TYPE_CHECKING:
+    # The flat backend serves without importing sklearn
+    from sklearn.ensemble import RandomForestClassifier
+
+
+def _round_down_to_float32(threshold: np.ndarray) -> np.ndarray:
+    """Largest float32 values not above the float64 thresholds
+
+    sklearn compares float32 inputs against float64 thresholds. For a float32
+    x, ``x <= t`` holds exactly when ``x <= t32`` with t32 the largest float32
+    not above t, so splits can be evaluated in float32 without changing any
+    decision.
+    """
+    threshold32 = threshold.astype(np.float32)
+    rounded_up = threshold32.astype(np.float64) > threshold
+    threshold32[rounded_up] = np.nextafter(threshold32[rounded_up], np.float32(-np.inf))
+    return threshold32
+
+
+class FlatForest:
+    """Random Forest flattened into per-node arrays shared by all trees
+
+    Nodes of all trees are concatenated; ``roots`` holds the index of each
+    tree's root node and ``children[node]`` its (left, right) children.
+    Leaves point to themselves as both children, so every row can take exactly
+    ``max_depth`` steps without branching on leaf status. ``value`` holds the
+    normalized class distribution of every node.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        children: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        classes: np.ndarray,
+        feature_names: np.ndarray,
+        max_depth: int,
+        metadata: Optional[dict] = None,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        # Like sklearn, only forests fitted on named columns carry feature names
+        if len(feature_names):
+            self.feature_names_in_ = feature_names
+        self.max_depth = int(max_depth)
+        self.n_estimators = len(roots)
+        self.metadata = metadata or {}
+
+    @classmethod
+    def from_sklearn(cls, model: "RandomForestClassifier") -> "FlatForest":
+        """Flatten a fitted RandomForestClassifier, or a single decision tree"""
+        estimators = getattr(model, "estimators_", [model])
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            children.append(
+                np.stack(
+                    [
+                        np.where(is_leaf, node_ids, tree.children_left) + offset,
+                        np.where(is_leaf, node_ids, tree.children_right) + offset,
+                    ],
+                    axis=1,
+                )
+            )
+
+            # Same normalization as DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+
+            roots.append(offset)
+            offset += tree.node_count
+
+        feature_names = getattr(model, "feature_names_in_", None)
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=_round_down_to_float32(np.concatenate(thresholds)),
+            children=np.concatenate(children).astype(np.int32),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.int32),
+            classes=np.asarray(model.classes_),
+            feature_names=np.asarray(
+                feature_names if feature_names is not None else [], dtype=str
+            ),
+            max_depth=max(estimator.tree_.max_depth for estimator in estimators),
+        )
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Average class probabilities of all trees, one row per input row"""
+        # sklearn evaluates splits on float32 inputs
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        values = X.ravel()
+        children = self.children.ravel()
+
+        # One cursor per (row, tree) pair, walked down all trees in lockstep
+        row_offsets = np.repeat(
+            np.arange(n_rows, dtype=np.int32) * n_features, self.n_estimators
+        )
+        nodes = np.tile(self.roots, n_rows)
+        for _ in range(self.max_depth):
+            go_right = values.take(row_offsets + self.feature.take(nodes)) > (
+                self.threshold.take(nodes)
+            )
+            nodes = children.take(2 * nodes + go_right)
+
+        proba = self.value.take(nodes, axis=0).reshape(n_rows, self.n_estimators, -1)
+        return proba.sum(axis=1) / self.n_estimators
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Predict the class label of each input row"""
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def save(self, path: Union[str, Path], metadata: Optional[dict] = None) -> dict:
+        """Save the flattened arrays as a memory-mappable artifact"""
+        self.metadata = save_artifact(
+            path,
+            arrays={
+                "feature": self.feature,
+                "threshold": self.threshold,
+                "children": self.children,
+                "value": self.value,
+                "roots": self.roots,
+                "classes": self.classes_,
+                "feature_names": getattr(
+                    self, "feature_names_in_", np.array([], dtype=str)
+                ),
+            },
+            metadata={
+                **(metadata or {}),
+                "kind": "flat_forest",
+                "n_estimators": self.n_estimators,
+                "max_depth": self.max_depth,
+            },
+        )
+        return self.metadata
+
+    @classmethod
+    def load(cls, path: Union[str, Path], mmap: bool = True) -> "FlatForest":
+        """Load a forest saved with `save`, memory-mapped read-only by default"""
+        arrays, metadata = load_artifact(path, mmap=mmap)
+        return cls(
+            feature=arrays["feature"],
+            threshold=arrays["threshold"],
+            children=arrays["children"],
+            value=arrays["value"],
+            roots=arrays["roots"],
+            classes=arrays["classes"],
+            feature_names=arrays["feature_names"],
+            max_depth=metadata["max_depth"],
+            metadata=metadata,
+        )
+
+
+def saved_model_path(path: Path, model_folder: Optional[Path] = None) -> Path:
+    """A path of the saved_model folder, moved to `model_folder` when given"""
+    if model_folder is None:
+        return path
+    return Path(model_folder) / path.relative_to(settings.SAVED_MODEL_FOLDER)
+
+
+def compressed_model_is_current(model_folder: Optional[Path] = None) -> bool:
+    """Whether the saved compressed model was derived from the saved full model"""
+    try:
+        compressed = read_metadata(
+            saved_model_path(settings.COMPRESSED_MODEL_ARTIFACT_PATH, model_folder)
+        )
+        full = read_metadata(
+            saved_model_path(settings.MODEL_ARTIFACT_PATH, model_folder)
+        )
+    except (OSError, ValueError):
+        return False
+    return compressed.get("source_model_version") == full["version"]
+
+
+def served_model_paths(model_folder: Optional[Path] = None) -> Tuple[Path, Path]:
+    """
+    Artifact and pickle paths of the model to serve: the compressed model
+    when SERVE_COMPRESSED_MODEL is set and one was saved from the current
+    full model, else the full one. `model_folder` replaces the saved_model
+    folder, e.g. for a candidate model.
+    """
+    compressed_path = saved_model_path(settings.COMPRESSED_MODEL_PATH, model_folder)
+    if settings.SERVE_COMPRESSED_MODEL and compressed_path.exists():
+        if compressed_model_is_current(model_folder):
+            return saved_model_path(
+                settings.COMPRESSED_MODEL_ARTIFACT_PATH, model_folder
+            ), compressed_path
+        if compressed_path not in _stale_compressed_models:
+            _stale_compressed_models.add(compressed_path)
+            logger.warning(
+                f"{compressed_path.parent} was not compressed from the current model; "
+                "serving the full model until compression runs again"
+            )
+    return (
+        saved_model_path(settings.MODEL_ARTIFACT_PATH, model_folder),
+        saved_model_path(settings.MODEL_PATH, model_folder),
+    )
+
+
+def load_forest(
+    backend: str, artifact_path: Union[str, Path], pickle_path: Union[str, Path]
+):
+    """
+    Load the trained forest for the given backend.
+
+    The "flat" backend memory-maps the flat forest artifact and falls back to
+    flattening the pickled model when no artifact exists; the "sklearn"
+    backend unpickles the RandomForestClassifier.
+
+    Args:
+        backend (str): "flat" or "sklearn"
+        artifact_path (Union[str, Path]): Flat forest artifact directory
+        pickle_path (Union[str, Path]): Pickled RandomForestClassifier
+
+    Returns:
+        Union[FlatForest, RandomForestClassifier]: The loaded model
+    """
+    if backend not in ("flat", "sklearn"):
+        raise ValueError(f"Unknown model backend: {backend}")
+    if backend == "flat" and Path(artifact_path).exists():
+        return FlatForest.load(artifact_path)
+
+    if not Path(pickle_path).exists():
+        raise FileNotFoundError(f"Model not found at {pickle_path}")
+    with open(pickle_path, "rb") as file:
+        model = pickle.load(file)
+    if backend == "flat":
+        return FlatForest.from_sklearn(model)
+    return model
@@ -0,0 +1,105 @@
+"""
+Incremental updates of the trained Random Forest
+New trees are fitted on the new training rows only and added to the forest
+with warm start, and the oldest trees are retired so that the forest keeps a
+fixed size. The split thresholds of the retained trees are moved to the
+updated scaler, so they make the same decisions on raw inputs as before.
+"""
+
+from typing import Optional
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from src.logging.console_log import setup_logging
+from settings import settings
+
+# setup logging
+logger = setup_logging()
+
+
+def rescale_thresholds(
+    model: RandomForestClassifier,
+    old_mean: np.ndarray,
+    old_scale: np.ndarray,
+    new_mean: np.ndarray,
+    new_scale: np.ndarray,
+) -> None:
+    """
+    Move the split thresholds on the numerical features, which are the first
+    ``len(new_mean)`` columns, from the old to the new scaling in place.
+    """
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        split = (tree.feature >= 0) & (tree.feature < len(new_mean))
+        feature = tree.feature[split]
+        raw_threshold = tree.threshold[split] * old_scale[feature] + old_mean[feature]
+        tree.threshold[split] = (raw_threshold - new_mean[feature]) / new_scale[feature]
+
+
+def grow_forest(
+    model: RandomForestClassifier,
+    X_new: pd.DataFrame,
+    y_new: pd.Series,
+    n_new_trees: int,
+    max_trees: Optional[int] = None,
+) -> RandomForestClassifier:
+    """
+    Add trees fitted on new rows to the forest and retire the oldest ones.
+
+    Args:
+        model (RandomForestClassifier): Trained forest, updated in place
+        X_new (pd.DataFrame): New preprocessed training rows
+        y_new (pd.Series): Their targets
+        n_new_trees (int): Trees to fit on the new rows
+        max_trees (Optional[int]): Trees kept, the most recent ones
+
+    Returns:
+        RandomForestClassifier: The updated forest
+
+    Raises:
+        ValueError: If the new rows do not cover exactly the classes of the forest
+    """
+    missing = set(model.classes_) - set(np.unique(y_new))
+    if missing:
+        raise ValueError(f"New rows have no samples of classes {sorted(missing)}")
+    # The retained trees cannot score a class they were not fitted on
+    unseen = set(np.unique(y_new)) - set(model.classes_)
+    if unseen:
+        raise ValueError(
+            f"New rows have classes {sorted(unseen)} unknown to the forest"
+        )
+
+    # Warm start skips one seed per existing tree, and the forest keeps a
+    # fixed size, so every update would reuse the tree seeds of the previous
+    # one; an integer random state is varied by the update count instead
+    random_state = model.random_state
+    model.n_updates_ = getattr(model, "n_updates_", 0) + 1
+    update_random_state = random_state
+    if isinstance(random_state, (int, np.integer)):
+        update_random_state = int(
+            np.random.SeedSequence(
+                [int(random_state), model.n_updates_]
+            ).generate_state(1)[0]
+        )
+
+    n_trees = len(model.estimators_)
+    model.set_params(
+        warm_start=True,
+        n_estimators=n_trees + n_new_trees,
+        n_jobs=settings.TRAIN_N_JOBS,
+        random_state=update_random_state,
+    )
+    model.fit(X_new, y_new)
+    retired = max(0, len(model.estimators_) - max_trees) if max_trees else 0
+    model.estimators_ = model.estimators_[retired:]
+    model.set_params(
+        warm_start=False,
+        n_estimators=len(model.estimators_),
+        n_jobs=None,
+        random_state=random_state,
+    )
+    logger.info(
+        f"Added {n_new_trees} trees fitted on {len(X_new)} rows, retired {retired}; "
+        f"the forest has {len(model.estimators_)} trees"
+    )
+    return model
@@ -0,0 +1,180 @@
+"""
+Batch-score a file of customer records with the trained model
+Streams a CSV or Parquet file with the same schema as X_test.csv in chunks,
+scores the chunks on a process pool sized to the available CPUs and writes
+the predictions incrementally, so files larger than memory can be scored.
+
+Usage:
+    python -m src.modelling.score INPUT OUTPUT [--chunk-size N] [--workers N]
+"""
+
+import argparse
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+from src.logging.console_log import setup_logging
+from src.api.workers import available_cpus
+from src.data.scaling import load_scaler_params, preprocess_transform_array
+from src.data.storage import iter_file
+from src.modelling.flat_forest import load_forest, served_model_paths
+from settings import settings
+
+# setup logging
+logger = setup_logging()
+
+# Model and scaler loaded once per scoring process
+_model = None
+_scaler_params: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+
+def _load_scoring_model() -> None:
+    """Load the model and scaler into the current process"""
+    global _model, _scaler_params
+    _model = load_forest(settings.MODEL_BACKEND, *served_model_paths())
+    _scaler_params = load_scaler_params(
+        settings.SCALER_ARTIFACT_PATH, settings.SCALER_PATH
+    )
+
+
+def score_chunk(features: np.ndarray) -> pd.DataFrame:
+    """
+    Score one chunk of raw feature rows.
+
+    Args:
+        features (np.ndarray): Raw float64 features, numerical then categorical
+
+    Returns:
+        pd.DataFrame: Predicted class and its probability for each row
+    """
+    if _model is None:
+        _load_scoring_model()
+    scaler_mean, scaler_scale = _scaler_params
+    probabilities = _model.predict_proba(
+        preprocess_transform_array(features, scaler_mean, scaler_scale)
+    )
+    return pd.DataFrame(
+        {
+            "prediction": _model.classes_[np.argmax(probabilities, axis=1)],
+            "probability": np.max(probabilities, axis=1),
+        }
+    )
+
+
+class PredictionWriter:
+    """Append prediction chunks to a CSV or Parquet file"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._parquet_writer = None
+        self._wrote_header = False
+
+    def write(self, predictions: pd.DataFrame) -> None:
+        if self.path.suffix == ".parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(predictions, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            predictions.to_csv(
+                self.path,
+                mode="a" if self._wrote_header else "w",
+                header=not self._wrote_header,
+                index=False,
+            )
+            self._wrote_header = True
+
+    def close(self) -> None:
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def score_file(
+    input_path: Path,
+    output_path: Path,
+    chunk_size: int = 50_000,
+    n_workers: Optional[int] = None,
+) -> int:
+    """
+    Score a file chunk by chunk, preserving row order in the output.
+
+    At most two chunks per worker are in flight, so memory stays bounded
+    regardless of the input size.
+
+    Args:
+        input_path (Path): CSV or Parquet file with the X_test.csv schema
+        output_path (Path): CSV or Parquet file to write predictions to
+        chunk_size (int): Rows per chunk
+        n_workers (Optional[int]): Scoring processes, defaults to the available CPUs
+
+    Returns:
+        int: Number of rows scored
+    """
+    feature_columns = settings.NUMERICAL_FEATURE_COLUMNS + settings.CATEGORICAL_COLUMNS
+    n_workers = n_workers or available_cpus()
+    logger.info(
+        f"Scoring {input_path} in chunks of {chunk_size} rows with {n_workers} worker(s)"
+    )
+
+    writer = PredictionWriter(output_path)
+    n_rows = 0
+    executor: Optional[Executor] = None
+    try:
+        chunks = (
+            chunk[feature_columns].to_numpy(dtype=np.float64)
+            for chunk in iter_file(input_path, feature_columns, chunk_size)
+        )
+        if n_workers == 1:
+            for features in chunks:
+                writer.write(score_chunk(features))
+                n_rows += len(features)
+        else:
+            executor = ProcessPoolExecutor(
+                max_workers=n_workers, initializer=_load_scoring_model
+            )
+            in_flight: "deque[Future]" = deque()
+            for features in chunks:
+                in_flight.append(executor.submit(score_chunk, features))
+                if len(in_flight) >= 2 * n_workers:
+                    predictions = in_flight.popleft().result()
+                    writer.write(predictions)
+                    n_rows += len(predictions)
+            while in_flight:
+                predictions = in_flight.popleft().result()
+                writer.write(predictions)
+                n_rows += len(predictions)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        writer.close()
+
+    logger.info(f"Scored {n_rows} rows, predictions saved to {output_path}")
+    return n_rows
+
+
+def main():
+    """Run batch scoring from the command line"""
+    parser = argparse.ArgumentParser(description="Batch-score a CSV or Parquet file")
+    parser.add_argument("input", type=Path, help="CSV or Parquet file to score")
+    parser.add_argument("output", type=Path, help="CSV or Parquet file for predictions")
+    parser.add_argument(
+        "--chunk-size", type=int, default=50_000, help="Rows scored per chunk"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Scoring processes (default: all available CPUs)",
+    )
+    args = parser.parse_args()
+    score_file(args.input, args.output, args.chunk_size, args.workers)
+
+
+if __name__ == "__main__":
+    main()
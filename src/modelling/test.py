@@ -1,23 +1,27 @@
 """
 Test the trained model and save classification metrics
 This script evaluates the model performance using test data and saves metrics
-for use in CML (Continuous Machine Learning) reporting
+for use in CML (Continuous Machine Learning) reporting. The test set is
+scored in chunks into a confusion matrix, so its size is not bounded by
+memory, and the metrics get bootstrap confidence intervals.
 """
 
+import numpy as np
 import pandas as pd
-import pickle
 import json
 from src.logging.console_log import setup_logging
+from src.data.storage import iter_dataset
+from src.data.scaling import load_scaler_params, preprocess_transform_array
+from src.modelling.evaluation import (
+    ConfusionMatrix,
+    bootstrap_intervals,
+    classification_report,
+    metrics_from_matrix,
+)
+from src.modelling.flat_forest import load_forest
+from src.api.workers import available_cpus
 from settings import settings
 from sklearn.base import BaseEstimator
-from sklearn.metrics import (
-    confusion_matrix, 
-    precision_recall_fscore_support,
-    accuracy_score, 
-    classification_report, 
-    ConfusionMatrixDisplay
-)
-import matplotlib.pyplot as plt
 
 # setup logging
 logger = setup_logging()
@@ -25,25 +29,53 @@ logger = setup_logging()
 
 def load_model() -> BaseEstimator:
     """Load the trained model"""
-    with open(settings.MODEL_PATH, "rb") as file:
-        model = pickle.load(file)
-    return model
+    return load_forest(
+        settings.MODEL_BACKEND, settings.MODEL_ARTIFACT_PATH, settings.MODEL_PATH
+    )
 
 
-def evaluate_model(y_true: pd.Series, y_pred: pd.Series) -> dict:
-    """Calculate classification metrics"""
-    accuracy = accuracy_score(y_true, y_pred)
-    precision, recall, f1, _ = precision_recall_fscore_support(
-        y_true, y_pred, average="weighted"
-    )
+def evaluate_chunks(model: BaseEstimator, chunk_size: int) -> ConfusionMatrix:
+    """
+    Score the test set chunk by chunk into a confusion matrix.
 
-    metrics = {
-        "accuracy": float(accuracy),
-        "precision": float(precision),
-        "recall": float(recall),
-        "f1_score": float(f1),
-    }
-    return metrics
+    Args:
+        model (BaseEstimator): Model to evaluate
+        chunk_size (int): Test rows scored per predict call
+
+    Returns:
+        ConfusionMatrix: True against predicted labels of the whole test set
+    """
+    feature_columns = settings.NUMERICAL_FEATURE_COLUMNS + settings.CATEGORICAL_COLUMNS
+    scaler_mean, scaler_scale = load_scaler_params(
+        settings.SCALER_ARTIFACT_PATH, settings.SCALER_PATH
+    )
+    confusion = ConfusionMatrix()
+    X_chunks = iter_dataset(
+        settings.TRAIN_TEST_FOLDER,
+        "X_test",
+        columns=feature_columns,
+        chunk_size=chunk_size,
+    )
+    y_chunks = iter_dataset(
+        settings.TRAIN_TEST_FOLDER,
+        "y_test",
+        columns=[settings.TARGET_COLUMN_NAME],
+        chunk_size=chunk_size,
+    )
+    for X_chunk, y_chunk in zip(X_chunks, y_chunks, strict=True):
+        # Apply the same preprocessing as in training
+        X_scaled = pd.DataFrame(
+            preprocess_transform_array(
+                X_chunk[feature_columns].to_numpy(dtype=np.float64),
+                scaler_mean,
+                scaler_scale,
+            ),
+            columns=feature_columns,
+        )
+        confusion.update(
+            y_chunk[settings.TARGET_COLUMN_NAME].to_numpy(), model.predict(X_scaled)
+        )
+    return confusion
 
 
 def save_metrics(metrics: dict) -> None:
@@ -56,62 +88,71 @@ def save_metrics(metrics: dict) -> None:
     logger.info(f"Metrics saved to {metrics_file}")
 
 
-def save_classification_report(y_true: pd.Series, y_pred: pd.Series) -> None:
+def save_classification_report(confusion: ConfusionMatrix) -> None:
     """Save classification report to text file"""
     settings.METRICS_PATH.mkdir(parents=True, exist_ok=True)
 
     report_file = settings.METRICS_PATH / "classification_report.txt"
     with open(report_file, "w") as f:
-        f.write(classification_report(y_true, y_pred))
-    logger.info(f"Classification report saved to {report_file}")    
-    
-    
-def plot_confusion_matrix(y_true: pd.Series, y_pred: pd.Series, classes: list) -> None:
+        f.write(classification_report(confusion))
+    logger.info(f"Classification report saved to {report_file}")
+
+
+def plot_confusion_matrix(confusion: ConfusionMatrix) -> None:
     """Plot confusion matrix"""
-    cm = confusion_matrix(y_true, y_pred)
-    cm_display = ConfusionMatrixDisplay(cm, display_labels=classes)
+    # Imported here: matplotlib is only needed, and only loaded, for the plot
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from sklearn.metrics import ConfusionMatrixDisplay
+
+    cm_display = ConfusionMatrixDisplay(
+        confusion.matrix, display_labels=confusion.labels
+    )
     # Save confusion matrix plot
     cm_display.plot()
     plt.savefig(settings.METRICS_PATH / "confusion_matrix.png")
     plt.close()
-    logger.info(f"Confusion matrix saved to {settings.METRICS_PATH / 'confusion_matrix.png'}")
-    
-
-def main():
-    """Run model testing and evaluation"""
-    # Load test data
-    logger.info("Loading test data")
-    X_test = pd.read_csv(settings.TRAIN_TEST_FOLDER / "X_test.csv")
-    y_test = pd.read_csv(settings.TRAIN_TEST_FOLDER / "y_test.csv")
-
-    # Load and preprocess test data using the same preprocessing steps
-    logger.info("Loading scaler")
-    with open(settings.SCALER_PATH, "rb") as f:
-        scaler = pickle.load(f)
-
-    # Apply preprocessing
-    X_test_scaled = pd.DataFrame(
-        scaler.transform(X_test[settings.NUMERICAL_FEATURE_COLUMNS]),
-        columns=settings.NUMERICAL_FEATURE_COLUMNS,
+    logger.info(
+        f"Confusion matrix saved to {settings.METRICS_PATH / 'confusion_matrix.png'}"
     )
 
-    for col in settings.CATEGORICAL_COLUMNS:
-        X_test_scaled[col] = X_test[col]
 
-    # Load model and make predictions
+def main():
+    """Run model testing and evaluation"""
+    # Load model and score the test data
     logger.info("Loading model and making predictions")
     model = load_model()
-    y_pred = model.predict(X_test_scaled)
+    confusion = evaluate_chunks(model, settings.EVAL_CHUNK_SIZE)
+    logger.info(f"Scored {confusion.n_samples} test rows")
 
     # Calculate and save metrics
     logger.info("Calculating metrics")
-    metrics = evaluate_model(y_test[settings.TARGET_COLUMN_NAME], y_pred)
+    metrics = metrics_from_matrix(confusion.matrix)
     logger.info(f"Model performance metrics: {metrics}")
+    if settings.EVAL_BOOTSTRAP_RESAMPLES > 0:
+        n_jobs = settings.EVAL_N_JOBS if settings.EVAL_N_JOBS > 0 else available_cpus()
+        intervals = bootstrap_intervals(
+            confusion.matrix,
+            n_resamples=settings.EVAL_BOOTSTRAP_RESAMPLES,
+            confidence=settings.EVAL_CONFIDENCE,
+            n_workers=n_jobs,
+            seed=settings.RANDOM_STATE,
+        )
+        logger.info(
+            f"{settings.EVAL_CONFIDENCE:.0%} bootstrap intervals over "
+            f"{settings.EVAL_BOOTSTRAP_RESAMPLES} resamples: {intervals}"
+        )
+        metrics["confidence_intervals"] = intervals
+        metrics["confidence"] = settings.EVAL_CONFIDENCE
+    metrics["n_samples"] = confusion.n_samples
 
     # Save metrics for CML
     save_metrics(metrics)
-    save_classification_report(y_test[settings.TARGET_COLUMN_NAME], y_pred)
-    plot_confusion_matrix(y_test[settings.TARGET_COLUMN_NAME], y_pred, model.classes_)
+    save_classification_report(confusion)
+    if settings.EVAL_PLOT:
+        plot_confusion_matrix(confusion)
 
 
 if __name__ == "__main__":
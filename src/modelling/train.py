@@ -4,44 +4,161 @@ Train the model using Random Forest Classifier
 
 from sklearn.ensemble import RandomForestClassifier
 from src.logging.console_log import setup_logging
+from src.data.storage import dataset_path, read_dataset
+from src.data.scaling import load_scaler_params, preprocess_transform_array
+from src.modelling.artifact import hash_files, read_metadata
+from src.modelling.flat_forest import FlatForest
+from src.modelling.incremental import grow_forest, rescale_thresholds
+from src.modelling.tuning import save_tuning_results, tune_model
+import numpy as np
 import pandas as pd
 import pickle
+from typing import Optional
 from settings import settings
 
 # setup logging
 logger = setup_logging()
 
+# Number of training rows stored with the model artifact to validate it on load
+WARMUP_ROWS = 32
 
-def train_model(X_train: pd.DataFrame, y_train: pd.DataFrame) -> RandomForestClassifier:
+
+def train_model(
+    X_train: pd.DataFrame, y_train: pd.DataFrame, params: Optional[dict] = None
+) -> RandomForestClassifier:
     """Train the model using Random Forest
 
     Args:
         X_train (pd.DataFrame): Training features
         y_train (pd.DataFrame): Training target
+        params (Optional[dict]): Forest parameters, defaults to MODEL_PARAMS
 
     Returns:
         RandomForestClassifier: Trained model
-    """    
+    """
     model = RandomForestClassifier(
-        n_estimators=100,
-        max_depth=10,
-        random_state=settings.RANDOM_STATE
+        **(settings.MODEL_PARAMS if params is None else params),
+        random_state=settings.RANDOM_STATE,
+        n_jobs=settings.TRAIN_N_JOBS,
     )
     logger.info(f"Training the model using {model}")
     model.fit(X_train, y_train[settings.TARGET_COLUMN_NAME])
+    # Predict single rows in the calling thread when serving
+    model.set_params(n_jobs=None)
     return model
 
 
+def warmup_batch(model: RandomForestClassifier) -> dict:
+    """Raw training rows and the probabilities the model gives them
+
+    Stored in the model artifact so that a serving process can check that a
+    model and scaler pair reproduces its training-time predictions before
+    serving it.
+    """
+    feature_columns = settings.NUMERICAL_FEATURE_COLUMNS + settings.CATEGORICAL_COLUMNS
+    X_raw = read_dataset(
+        settings.TRAIN_TEST_FOLDER,
+        "X_train",
+        columns=feature_columns,
+        nrows=WARMUP_ROWS,
+    )
+    inputs = X_raw[feature_columns].to_numpy(dtype=np.float64)
+    scaler_mean, scaler_scale = load_scaler_params(
+        settings.SCALER_ARTIFACT_PATH, settings.SCALER_PATH
+    )
+    probabilities = model.predict_proba(
+        pd.DataFrame(
+            preprocess_transform_array(inputs.copy(), scaler_mean, scaler_scale),
+            columns=feature_columns,
+        )
+    )
+    return {"inputs": inputs.tolist(), "probabilities": probabilities.tolist()}
+
+
+def update_model() -> Optional[RandomForestClassifier]:
+    """Grow the saved forest with trees fitted on the rows new to preprocessing
+
+    Returns:
+        Optional[RandomForestClassifier]: The updated forest, or None when
+            there is no saved forest to update and it has to be trained anew
+    """
+    if not (
+        dataset_path(settings.PROCESSED_DATA_FOLDER, "X_new_processed").exists()
+        and settings.MODEL_PATH.exists()
+        and settings.MODEL_ARTIFACT_PATH.exists()
+    ):
+        logger.info("No saved forest or new rows to update, training all rows")
+        return None
+    previous_scaler = read_metadata(settings.MODEL_ARTIFACT_PATH).get("scaler")
+    if previous_scaler is None:
+        logger.info("Saved forest does not record its scaler, training all rows")
+        return None
+
+    with open(settings.MODEL_PATH, "rb") as file:
+        model = pickle.load(file)
+    X_new = read_dataset(settings.PROCESSED_DATA_FOLDER, "X_new_processed")
+    y_new = read_dataset(settings.PROCESSED_DATA_FOLDER, "y_new_processed")
+    if not len(X_new):
+        logger.info("No new training rows, keeping the saved forest")
+        return model
+
+    # The scaler was updated with the new rows; move the kept trees to it
+    scaler_mean, scaler_scale = load_scaler_params(
+        settings.SCALER_ARTIFACT_PATH, settings.SCALER_PATH
+    )
+    rescale_thresholds(
+        model,
+        np.asarray(previous_scaler["mean"]),
+        np.asarray(previous_scaler["scale"]),
+        scaler_mean,
+        scaler_scale,
+    )
+    try:
+        return grow_forest(
+            model,
+            X_new,
+            y_new[settings.TARGET_COLUMN_NAME],
+            settings.INCREMENTAL_NEW_TREES,
+            settings.INCREMENTAL_MAX_TREES,
+        )
+    except ValueError as e:
+        logger.warning(f"Cannot update the saved forest, training all rows: {e}")
+        return None
+
+
+def scaler_record() -> dict:
+    """Current scaler parameters as JSON-serializable lists"""
+    scaler_mean, scaler_scale = load_scaler_params(
+        settings.SCALER_ARTIFACT_PATH, settings.SCALER_PATH
+    )
+    return {"mean": scaler_mean.tolist(), "scale": scaler_scale.tolist()}
+
+
 def main():
     """Run Model Training"""
 
     # Load preprocessed data
     logger.info("Loading data")
-    X_train = pd.read_csv(settings.PROCESSED_DATA_FOLDER / "X_train_processed.csv")
-    y_train = pd.read_csv(settings.PROCESSED_DATA_FOLDER / "y_train_processed.csv")
+    X_train_path = dataset_path(settings.PROCESSED_DATA_FOLDER, "X_train_processed")
+    y_train_path = dataset_path(settings.PROCESSED_DATA_FOLDER, "y_train_processed")
+
+    model = update_model() if settings.TRAIN_INCREMENTAL else None
+    if model is None:
+        X_train = read_dataset(settings.PROCESSED_DATA_FOLDER, "X_train_processed")
+        y_train = read_dataset(settings.PROCESSED_DATA_FOLDER, "y_train_processed")
+
+        # Tune the forest parameters if enabled
+        params = None
+        if settings.TRAIN_TUNING:
+            tuning_results = tune_model(X_train, y_train[settings.TARGET_COLUMN_NAME])
+            save_tuning_results(tuning_results)
+            params = tuning_results["selected"]
+        else:
+            # Results of an earlier search do not describe this model
+            (settings.METRICS_PATH / "tuning_results.json").unlink(missing_ok=True)
 
-    # Train the model
-    model = train_model(X_train, y_train)
+        # Train the model
+        model = train_model(X_train, y_train, params)
 
     # Create model directory if it doesn't exist
     settings.MODEL_PATH.parent.mkdir(parents=True, exist_ok=True)
@@ -52,6 +169,28 @@ def main():
 
     logger.info(f"Model saved successfully at {settings.MODEL_PATH}")
 
+    # Export the flat-array version of the forest for serving
+    FlatForest.from_sklearn(model).save(
+        settings.MODEL_ARTIFACT_PATH,
+        metadata={
+            "feature_columns": list(model.feature_names_in_),
+            "training_data_hash": hash_files([X_train_path, y_train_path]),
+            "warmup": warmup_batch(model),
+            # Scaling the split thresholds refer to, for incremental updates
+            "scaler": scaler_record(),
+            "model_params": {
+                "n_estimators": model.n_estimators,
+                "max_depth": model.max_depth,
+                "min_samples_leaf": model.min_samples_leaf,
+                "max_features": model.max_features,
+                "random_state": model.random_state,
+                "tuned": settings.TRAIN_TUNING,
+                "incremental": settings.TRAIN_INCREMENTAL,
+            },
+        },
+    )
+    logger.info(f"Flat forest exported successfully at {settings.MODEL_ARTIFACT_PATH}")
+
 
 if __name__ == "__main__":
     main()
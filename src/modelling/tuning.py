@@ -0,0 +1,181 @@
+"""
+Hyperparameter search for the Random Forest
+Candidates drawn from the search space are cross-validated with successive
+halving: every round the weakest configurations are dropped and the survivors
+get more training rows, with the folds of a round fitted on a process pool.
+Among the final configurations scoring within a tolerance of the best, the
+smallest forest is chosen, since serving latency grows with the forest size.
+"""
+
+import json
+import math
+import timeit
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import HalvingRandomSearchCV, StratifiedKFold
+from src.logging.console_log import setup_logging
+from settings import settings
+
+# setup logging
+logger = setup_logging()
+
+
+def forest_size(model: RandomForestClassifier) -> int:
+    """Total number of nodes of a fitted forest, or of a single tree"""
+    return int(
+        sum(
+            estimator.tree_.node_count
+            for estimator in getattr(model, "estimators_", [model])
+        )
+    )
+
+
+def predict_latency(model, X: pd.DataFrame, repeat: int = 5, number: int = 50) -> float:
+    """Best per-call time in seconds of predicting the first row of `X`"""
+    row = X[:1]
+    return (
+        min(
+            timeit.repeat(
+                lambda: model.predict_proba(row), repeat=repeat, number=number
+            )
+        )
+        / number
+    )
+
+
+def min_resources(n_rows: int, n_classes: int) -> int:
+    """
+    Rows of the first halving round, chosen so that the last round the data
+    allows is trained on (nearly) all rows.
+    """
+    factor = settings.TUNING_HALVING_FACTOR
+    # Fewest rows that give every class a sample in each fold
+    smallest = 2 * settings.TUNING_CV_FOLDS * n_classes
+    rounds = (
+        int(math.floor(math.log(n_rows / smallest, factor))) + 1
+        if n_rows > smallest
+        else 1
+    )
+    return max(smallest, n_rows // factor ** (rounds - 1))
+
+
+def search(X_train: pd.DataFrame, y_train: pd.Series) -> HalvingRandomSearchCV:
+    """
+    Run successive halving over the configured search space.
+
+    Args:
+        X_train (pd.DataFrame): Training features
+        y_train (pd.Series): Training target
+
+    Returns:
+        HalvingRandomSearchCV: The fitted search, without a refitted model
+    """
+    searcher = HalvingRandomSearchCV(
+        RandomForestClassifier(random_state=settings.RANDOM_STATE),
+        param_distributions=settings.TUNING_SEARCH_SPACE,
+        n_candidates=settings.TUNING_CANDIDATES,
+        factor=settings.TUNING_HALVING_FACTOR,
+        min_resources=min_resources(len(X_train), y_train.nunique()),
+        cv=StratifiedKFold(
+            n_splits=settings.TUNING_CV_FOLDS,
+            shuffle=True,
+            random_state=settings.RANDOM_STATE,
+        ),
+        scoring=settings.TUNING_SCORING,
+        refit=False,
+        n_jobs=settings.TUNING_N_JOBS,
+        random_state=settings.RANDOM_STATE,
+    )
+    searcher.fit(X_train, y_train)
+    return searcher
+
+
+def final_round(searcher: HalvingRandomSearchCV) -> List[dict]:
+    """Configurations evaluated with the most training rows, best first"""
+    results = searcher.cv_results_
+    last_iteration = int(np.max(results["iter"]))
+    candidates = [
+        {
+            "params": results["params"][i],
+            "mean_score": float(results["mean_test_score"][i]),
+            "std_score": float(results["std_test_score"][i]),
+        }
+        for i in np.flatnonzero(results["iter"] == last_iteration)
+    ]
+    return sorted(candidates, key=lambda candidate: -candidate["mean_score"])
+
+
+def tune_model(X_train: pd.DataFrame, y_train: pd.Series) -> Dict:
+    """
+    Pick the model parameters: the smallest forest within TUNING_TOLERANCE
+    of the best cross-validation score.
+
+    Args:
+        X_train (pd.DataFrame): Training features
+        y_train (pd.Series): Training target
+
+    Returns:
+        Dict: Search results, with the chosen parameters under "selected"
+    """
+    logger.info(
+        f"Tuning over {settings.TUNING_CANDIDATES} candidates with "
+        f"{settings.TUNING_CV_FOLDS}-fold successive halving (factor {settings.TUNING_HALVING_FACTOR})"
+    )
+    searcher = search(X_train, y_train)
+    candidates = final_round(searcher)
+    best_score = candidates[0]["mean_score"]
+
+    # Fit the near-best configurations on all rows to compare their size and latency
+    shortlist = [
+        candidate
+        for candidate in candidates
+        if candidate["mean_score"] >= best_score - settings.TUNING_TOLERANCE
+    ]
+    for candidate in shortlist:
+        model = RandomForestClassifier(
+            random_state=settings.RANDOM_STATE,
+            n_jobs=settings.TUNING_N_JOBS,
+            **candidate["params"],
+        ).fit(X_train, y_train)
+        model.set_params(n_jobs=None)
+        candidate["nodes"] = forest_size(model)
+        candidate["latency_ms"] = predict_latency(model, X_train) * 1000
+    selected = min(
+        shortlist, key=lambda candidate: (candidate["nodes"], -candidate["mean_score"])
+    )
+    logger.info(
+        f"Selected {selected['params']}: {settings.TUNING_SCORING} {selected['mean_score']:.4f} "
+        f"(best {best_score:.4f}), {selected['nodes']} nodes, {selected['latency_ms']:.2f} ms per row"
+    )
+
+    rounds = [
+        {
+            "iteration": iteration,
+            "candidates": int(n_candidates),
+            "rows": int(n_resources),
+        }
+        for iteration, (n_candidates, n_resources) in enumerate(
+            zip(searcher.n_candidates_, searcher.n_resources_)
+        )
+    ]
+    return {
+        "scoring": settings.TUNING_SCORING,
+        "search_space": settings.TUNING_SEARCH_SPACE,
+        "tolerance": settings.TUNING_TOLERANCE,
+        "rounds": rounds,
+        "best_score": best_score,
+        "selected": selected["params"],
+        "final_round": candidates,
+    }
+
+
+def save_tuning_results(results: Dict) -> None:
+    """Save the search results next to the model metrics"""
+    settings.METRICS_PATH.mkdir(parents=True, exist_ok=True)
+    results_file = settings.METRICS_PATH / "tuning_results.json"
+    with open(results_file, "w") as f:
+        json.dump(results, f, indent=4, default=str)
+    logger.info(f"Tuning results saved to {results_file}")
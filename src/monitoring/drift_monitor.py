@@ -0,0 +1,223 @@
+"""
+Live drift monitoring over serving traffic
+Served feature rows are buffered and summarised per column in quantile
+sketches, so memory stays constant however much traffic is seen. Every
+window the sketches are scored against the reference sketches built from the
+training data, drifting columns are logged, and the window's sketches are
+written out so the windows of all serving processes can be merged.
+
+Run with: python -m src.monitoring.drift_monitor
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from settings import settings
+from src.logging.console_log import setup_logging
+from src.monitoring.sketch import KLLSketch, drift_scores, load_sketches
+
+# setup logging
+logger = setup_logging()
+
+
+def is_drift(scores: dict) -> bool:
+    """Whether a column's scores exceed any of the drift thresholds"""
+    return bool(
+        (scores.get("ks") or 0.0) > settings.DRIFT_KS_THRESHOLD
+        or scores["psi"] > settings.DRIFT_PSI_THRESHOLD
+        or (scores.get("js") or 0.0) > settings.DRIFT_JS_THRESHOLD
+    )
+
+
+class DriftMonitor:
+    """
+    Windowed drift detection for the numerical features of served requests.
+
+    Args:
+        feature_columns (List[str]): Column order of the observed rows
+        reference (Dict[str, KLLSketch]): Reference sketch per monitored column
+        window_seconds (float): Minimum length of a window
+        min_samples (int): Minimum rows in a window before it is scored
+        sketch_size (int): `k` of the window sketches
+        snapshot_path (Optional[Path]): Where each scored window is written
+        buffer_rows (int): Rows buffered between sketch updates
+        clock (Callable[[], float]): Time source
+    """
+
+    def __init__(
+        self,
+        feature_columns: List[str],
+        reference: Dict[str, KLLSketch],
+        window_seconds: float,
+        min_samples: int,
+        sketch_size: int = 200,
+        snapshot_path: Optional[Path] = None,
+        buffer_rows: int = 256,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.columns = list(reference)
+        self.column_index = np.array(
+            [feature_columns.index(column) for column in self.columns]
+        )
+        self.reference = reference
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.sketch_size = sketch_size
+        self.snapshot_path = snapshot_path
+        self.clock = clock
+        self.last_scores: Dict[str, dict] = {}
+        self._buffer = np.empty((buffer_rows, len(self.columns)))
+        self._buffered = 0
+        self._lock = threading.Lock()
+        self._start_window()
+
+    def _start_window(self) -> None:
+        self.window_start = self.clock()
+        self.window_started_at = time.time()
+        self.sketches = {
+            column: KLLSketch(k=self.sketch_size) for column in self.columns
+        }
+
+    def observe(self, row: np.ndarray) -> Optional[Dict[str, dict]]:
+        """
+        Record one feature row; scores the window once it is complete.
+
+        Returns:
+            Optional[Dict[str, dict]]: Scores of a window that just closed
+        """
+        with self._lock:
+            self._buffer[self._buffered] = row[self.column_index]
+            self._buffered += 1
+            if self._buffered == len(self._buffer):
+                self._flush()
+            if self.clock() - self.window_start < self.window_seconds:
+                return None
+            self._flush()
+            if self.sketches[self.columns[0]].n < self.min_samples:
+                return None
+            return self._close_window()
+
+    def _flush(self) -> None:
+        if not self._buffered:
+            return
+        for i, column in enumerate(self.columns):
+            self.sketches[column].update(self._buffer[: self._buffered, i])
+        self._buffered = 0
+
+    def scores(self) -> Dict[str, dict]:
+        """Drift scores of the current window so far"""
+        with self._lock:
+            self._flush()
+            return self._score()
+
+    def _score(self) -> Dict[str, dict]:
+        scores = {}
+        for column in self.columns:
+            column_scores = drift_scores(self.reference[column], self.sketches[column])
+            column_scores["drift"] = is_drift(column_scores)
+            scores[column] = column_scores
+        return scores
+
+    def _close_window(self) -> Dict[str, dict]:
+        scores = self._score()
+        for column, column_scores in scores.items():
+            if column_scores["drift"]:
+                logger.warning(
+                    f"Drift detected in feature {column}: KS {column_scores['ks']:.3f}, "
+                    f"PSI {column_scores['psi']:.3f} over {column_scores['n']} requests"
+                )
+        if self.snapshot_path is not None:
+            self._write_snapshot(scores)
+        self.last_scores = scores
+        self._start_window()
+        return scores
+
+    def _write_snapshot(self, scores: Dict[str, dict]) -> None:
+        snapshot = {
+            "window_start": self.window_started_at,
+            "window_end": time.time(),
+            "scores": scores,
+            "sketches": {
+                column: sketch.to_dict() for column, sketch in self.sketches.items()
+            },
+        }
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = self.snapshot_path.with_suffix(".tmp")
+        with open(temporary_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(temporary_path, self.snapshot_path)
+
+
+def load_drift_monitor(feature_columns: List[str]) -> Optional[DriftMonitor]:
+    """
+    Create the serving process's drift monitor from the settings.
+
+    Args:
+        feature_columns (List[str]): Column order of the decoded rows
+
+    Returns:
+        Optional[DriftMonitor]: None when disabled or without reference sketches
+    """
+    if not settings.DRIFT_MONITOR_ENABLED:
+        return None
+    if not settings.DRIFT_REFERENCE_PATH.exists():
+        logger.warning(
+            f"No reference sketches at {settings.DRIFT_REFERENCE_PATH}, drift monitoring disabled"
+        )
+        return None
+    reference = load_sketches(settings.DRIFT_REFERENCE_PATH)
+    reference = {
+        column: reference[column] for column in settings.NUMERICAL_FEATURE_COLUMNS
+    }
+    return DriftMonitor(
+        feature_columns,
+        reference,
+        window_seconds=settings.DRIFT_WINDOW_SECONDS,
+        min_samples=settings.DRIFT_MIN_SAMPLES,
+        sketch_size=settings.DRIFT_SKETCH_SIZE,
+        snapshot_path=settings.SERVING_DRIFT_FOLDER / f"drift_{os.getpid()}.json",
+    )
+
+
+def reset_drift_snapshots() -> None:
+    """Remove the drift windows written by a previous server run"""
+    for path in Path(settings.SERVING_DRIFT_FOLDER).glob("drift_*.json"):
+        path.unlink(missing_ok=True)
+
+
+def main():
+    """Merge the last window of every serving process and score it"""
+    reference = load_sketches(settings.DRIFT_REFERENCE_PATH)
+    merged: Dict[str, KLLSketch] = {}
+    snapshot_paths = sorted(Path(settings.SERVING_DRIFT_FOLDER).glob("drift_*.json"))
+    if not snapshot_paths:
+        logger.info(f"No drift windows found in {settings.SERVING_DRIFT_FOLDER}")
+        return
+    for path in snapshot_paths:
+        with open(path) as f:
+            snapshot = json.load(f)
+        for column, data in snapshot["sketches"].items():
+            sketch = KLLSketch.from_dict(data)
+            merged[column] = (
+                merged[column].merge(sketch) if column in merged else sketch
+            )
+    logger.info(
+        f"Merged the last drift window of {len(snapshot_paths)} serving processes"
+    )
+
+    for column, sketch in merged.items():
+        scores = drift_scores(reference[column], sketch)
+        drift = is_drift(scores)
+        log = logger.warning if drift else logger.info
+        log(
+            f"{column}: KS {scores['ks']:.3f}, PSI {scores['psi']:.3f} over {scores['n']} requests"
+            + (" - drift detected" if drift else "")
+        )
+
+
+if __name__ == "__main__":
+    main()
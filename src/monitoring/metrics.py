@@ -0,0 +1,248 @@
+"""
+Multi-process metrics in Prometheus text format
+Counters and fixed-bucket histograms whose values live in a per-process
+memory-mapped file. Recording a value is a few in-place array updates under a
+per-process lock, so background threads can record too, and any process
+(e.g. the API server) can aggregate the files of all processes, such as the
+LitServe inference workers, into one Prometheus exposition. Counters of
+processes that exited keep counting towards the totals; their gauges do not.
+"""
+
+import os
+import threading
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+import numpy as np
+
+LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+class Counter:
+    """Monotonic counter stored in one slot of the registry values"""
+
+    kind = "counter"
+
+    def __init__(
+        self, registry: "MetricsRegistry", name: str, help: str, labels: Dict[str, str]
+    ):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.slot = registry._allocate(1)
+
+    def inc(self, amount: float = 1.0) -> None:
+        values = self.registry.values
+        if values is not None:
+            with self.registry.lock:
+                values[self.slot] += amount
+
+    def render(self, values: np.ndarray) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels)} {values[self.slot]:g}"]
+
+
+class Gauge(Counter):
+    """Value that can go up and down; summed across processes"""
+
+    kind = "gauge"
+
+    def set(self, value: float) -> None:
+        values = self.registry.values
+        if values is not None:
+            with self.registry.lock:
+                values[self.slot] = value
+
+
+class Histogram:
+    """Histogram over fixed bucket upper bounds, plus sum and count"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        registry: "MetricsRegistry",
+        name: str,
+        help: str,
+        labels: Dict[str, str],
+        buckets: Sequence[float],
+    ):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # One slot per bucket, one for +Inf, then sum and count
+        self.slot = registry._allocate(len(self.buckets) + 3)
+        self._sum_slot = self.slot + len(self.buckets) + 1
+        self._count_slot = self._sum_slot + 1
+
+    def observe(self, value: float) -> None:
+        values = self.registry.values
+        if values is not None:
+            bucket = self.slot + bisect_left(self.buckets, value)
+            with self.registry.lock:
+                values[bucket] += 1
+                values[self._sum_slot] += value
+                values[self._count_slot] += 1
+
+    def render(self, values: np.ndarray) -> List[str]:
+        cumulative = np.cumsum(values[self.slot : self._sum_slot])
+        lines = []
+        for bound, count in zip(self.buckets + (float("inf"),), cumulative):
+            labels = _format_labels(
+                {**self.labels, "le": "+Inf" if bound == float("inf") else f"{bound:g}"}
+            )
+            lines.append(f"{self.name}_bucket{labels} {count:g}")
+        labels = _format_labels(self.labels)
+        lines.append(f"{self.name}_sum{labels} {values[self._sum_slot]:.9g}")
+        lines.append(f"{self.name}_count{labels} {values[self._count_slot]:g}")
+        return lines
+
+
+class MetricsRegistry:
+    """A fixed set of metrics sharing one array of values per process
+
+    Metrics must be declared identically (same order) in every process, e.g.
+    at module import, so that all per-process files share one layout.
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.metrics: List[Union[Counter, Histogram]] = []
+        self.size = 0
+        self.values: Optional[memoryview] = None
+        # The read-modify-write of a slot is not atomic across threads
+        self.lock = threading.Lock()
+        self._pid: Optional[int] = None
+
+    def _allocate(self, n_slots: int) -> int:
+        if self._pid is not None:
+            raise RuntimeError("Cannot declare metrics after the registry is bound")
+        slot = self.size
+        self.size += n_slots
+        return slot
+
+    def counter(self, name: str, help: str, **labels: str) -> Counter:
+        metric = Counter(self, f"{self.prefix}_{name}", help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help: str, **labels: str) -> Gauge:
+        metric = Gauge(self, f"{self.prefix}_{name}", help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        **labels: str,
+    ) -> Histogram:
+        metric = Histogram(self, f"{self.prefix}_{name}", help, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def bind(self, folder: Union[str, Path]) -> None:
+        """Start recording into this process's file in `folder`"""
+        folder = Path(folder)
+        folder.mkdir(parents=True, exist_ok=True)
+        path = folder / f"{self.prefix}_{os.getpid()}.npy"
+        values = np.lib.format.open_memmap(
+            path, mode="w+", dtype=np.float64, shape=(self.size,)
+        )
+        # A forked process may inherit the lock held by another thread
+        self.lock = threading.Lock()
+        # Element updates through a memoryview are cheaper than numpy indexing
+        self.values = memoryview(values)
+        self._memmap = values
+        self._pid = os.getpid()
+
+    def ensure_bound(self, folder: Union[str, Path]) -> None:
+        """Bind unless already bound in this process (not a forked parent)"""
+        if self._pid != os.getpid():
+            self.values = None
+            self.bind(folder)
+
+    def _gauge_slots(self) -> np.ndarray:
+        return np.array(
+            [metric.slot for metric in self.metrics if metric.kind == "gauge"],
+            dtype=np.int64,
+        )
+
+    def collect(self, folder: Union[str, Path]) -> np.ndarray:
+        """
+        Sum the values recorded by every process in `folder`.
+
+        The gauges of processes that are no longer running, e.g. restarted
+        inference workers, are left out, as their last values are stale.
+        """
+        total = np.zeros(self.size, dtype=np.float64)
+        gauge_slots = self._gauge_slots()
+        for path in Path(folder).glob(f"{self.prefix}_*.npy"):
+            try:
+                values = np.load(path, mmap_mode="r")
+            except (OSError, ValueError):
+                # File of a process that is still being created
+                continue
+            if values.shape != total.shape:
+                continue
+            pid = path.stem.rsplit("_", 1)[-1]
+            if len(gauge_slots) and pid.isdigit() and not _is_running(int(pid)):
+                values = np.array(values)
+                values[gauge_slots] = 0.0
+            total += values
+        return total
+
+    def render(self, folder: Union[str, Path]) -> str:
+        """Aggregate all processes and format as Prometheus text"""
+        values = self.collect(folder)
+        lines = []
+        described = set()
+        for metric in self.metrics:
+            if metric.name not in described:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                described.add(metric.name)
+            lines.extend(metric.render(values))
+        return "\n".join(lines) + "\n"
+
+
+def _is_running(pid: int) -> bool:
+    """Whether a process with this pid exists"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def reset_metrics_folder(folder: Union[str, Path], prefix: str) -> None:
+    """Remove metric files left by processes of a previous run"""
+    for path in Path(folder).glob(f"{prefix}_*.npy"):
+        path.unlink(missing_ok=True)
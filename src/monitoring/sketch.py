@@ -0,0 +1,224 @@
+"""
+Mergeable quantile sketches for drift detection
+A KLL-style sketch summarises a stream of values in O(k log(n / k)) memory
+with a rank error of roughly 1.7 / k. Sketches built on different processes
+or time windows can be merged, and KS/PSI drift scores are computed from two
+sketches without the raw values.
+"""
+
+import json
+import math
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+import numpy as np
+
+# Capacity shrinks by this factor for every level below the top one
+CAPACITY_DECAY = 2 / 3
+MIN_CAPACITY = 2
+
+
+class KLLSketch:
+    """Streaming quantile sketch (Karnin, Lang and Liberty, 2016)"""
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None):
+        self.k = k
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        # levels[h] holds items that each stand for 2**h values
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(MIN_CAPACITY, math.ceil(self.k * CAPACITY_DECAY**depth))
+
+    def update(self, values: Union[float, np.ndarray]) -> None:
+        """Add one value or an array of values; NaNs are ignored"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.n += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def _compress(self) -> None:
+        """Compact levels over capacity, halving them into the level above"""
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays behind so the compacted part is even
+                keep = items[-1:] if len(items) % 2 else items[:0]
+                compacted = items[: len(items) - len(keep)]
+                promoted = compacted[self._rng.integers(2) :: 2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate(
+                    [self.levels[level + 1], promoted]
+                )
+            level += 1
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """Fold `other` into this sketch and return it"""
+        if other.n == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _weighted_items(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate(
+            [
+                np.full(len(level_items), 2.0**level)
+                for level, level_items in enumerate(self.levels)
+            ]
+        )
+        order = np.argsort(items, kind="stable")
+        return items[order], np.cumsum(weights[order])
+
+    def cdf(self, values: np.ndarray) -> np.ndarray:
+        """Estimated fraction of the stream <= each of `values`"""
+        values = np.asarray(values, dtype=np.float64)
+        if self.n == 0:
+            return np.full(values.shape, np.nan)
+        items, cumulative_weights = self._weighted_items()
+        ranks = np.searchsorted(items, values, side="right")
+        cumulative = np.concatenate([[0.0], cumulative_weights])
+        return cumulative[ranks] / cumulative_weights[-1]
+
+    def quantile(self, quantiles: Union[float, np.ndarray]) -> np.ndarray:
+        """Estimated values at the given quantiles"""
+        quantiles = np.asarray(quantiles, dtype=np.float64)
+        if self.n == 0:
+            return np.full(quantiles.shape, np.nan)
+        items, cumulative_weights = self._weighted_items()
+        targets = quantiles * cumulative_weights[-1]
+        index = np.searchsorted(cumulative_weights, targets, side="left")
+        return items[np.clip(index, 0, len(items) - 1)]
+
+    def to_dict(self) -> dict:
+        """JSON-serializable representation"""
+        return {
+            "k": self.k,
+            "n": self.n,
+            "min": self.min if self.n else None,
+            "max": self.max if self.n else None,
+            "levels": [level_items.tolist() for level_items in self.levels],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, seed: Optional[int] = None) -> "KLLSketch":
+        sketch = cls(k=data["k"], seed=seed)
+        sketch.n = data["n"]
+        if sketch.n:
+            sketch.min = data["min"]
+            sketch.max = data["max"]
+        sketch.levels = [
+            np.asarray(level_items, dtype=np.float64) for level_items in data["levels"]
+        ]
+        return sketch
+
+
+def ks_statistic(reference: KLLSketch, current: KLLSketch) -> float:
+    """Largest distance between the two estimated CDFs"""
+    points = np.concatenate(reference.levels + current.levels)
+    return float(np.max(np.abs(reference.cdf(points) - current.cdf(points))))
+
+
+def kolmogorov_sf(x: float, terms: int = 100) -> float:
+    """
+    Survival function of the Kolmogorov distribution (scipy's `kstwobign.sf`),
+    from whichever of its two series converges fast at `x`, so the serving
+    workers need not import scipy.
+    """
+    if x <= 0:
+        return 1.0
+    if x < 1.0:
+        # 1 - CDF with CDF = sqrt(2 pi) / x * sum exp(-(2k - 1)^2 pi^2 / (8 x^2))
+        total = 0.0
+        for k in range(1, terms + 1):
+            term = math.exp(-((2 * k - 1) ** 2) * math.pi**2 / (8 * x**2))
+            total += term
+            if term < 1e-17 * total:
+                break
+        return 1.0 - math.sqrt(2 * math.pi) / x * total
+    # 2 * sum (-1)^(k - 1) exp(-2 k^2 x^2)
+    total = 0.0
+    for k in range(1, terms + 1):
+        term = math.exp(-2 * k**2 * x**2)
+        total += term if k % 2 else -term
+        if term < 1e-17:
+            break
+    return min(1.0, 2 * total)
+
+
+def ks_p_value(statistic: float, n_reference: int, n_current: int) -> float:
+    """Asymptotic two-sample KS p-value for a statistic from `ks_statistic`"""
+    effective_n = n_reference * n_current / (n_reference + n_current)
+    return kolmogorov_sf(statistic * math.sqrt(effective_n))
+
+
+def population_stability_index(
+    reference: KLLSketch, current: KLLSketch, n_bins: int = 10, epsilon: float = 1e-4
+) -> float:
+    """PSI over bins at the reference quantiles"""
+    edges = np.unique(reference.quantile(np.linspace(0, 1, n_bins + 1)[1:-1]))
+    reference_share = np.diff(np.concatenate([[0.0], reference.cdf(edges), [1.0]]))
+    current_share = np.diff(np.concatenate([[0.0], current.cdf(edges), [1.0]]))
+    reference_share = np.maximum(reference_share, epsilon)
+    current_share = np.maximum(current_share, epsilon)
+    return float(
+        np.sum(
+            (current_share - reference_share) * np.log(current_share / reference_share)
+        )
+    )
+
+
+def drift_scores(reference: KLLSketch, current: KLLSketch) -> Dict[str, float]:
+    """KS statistic, KS p-value and PSI of `current` against `reference`"""
+    statistic = ks_statistic(reference, current)
+    return {
+        "n": current.n,
+        "ks": statistic,
+        "ks_p_value": ks_p_value(statistic, reference.n, current.n),
+        "psi": population_stability_index(reference, current),
+    }
+
+
+def build_sketches(
+    data, columns: List[str], k: int = 200, seed: Optional[int] = 0
+) -> Dict[str, KLLSketch]:
+    """One sketch per column of a DataFrame"""
+    sketches = {}
+    for column in columns:
+        sketches[column] = KLLSketch(k=k, seed=seed)
+        sketches[column].update(data[column].to_numpy(dtype=np.float64))
+    return sketches
+
+
+def save_sketches(sketches: Dict[str, KLLSketch], path: Path) -> None:
+    """Write per-column sketches to a JSON file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({column: sketch.to_dict() for column, sketch in sketches.items()}, f)
+
+
+def load_sketches(path: Path) -> Dict[str, KLLSketch]:
+    """Read per-column sketches written by `save_sketches`"""
+    with open(path) as f:
+        return {
+            column: KLLSketch.from_dict(data) for column, data in json.load(f).items()
+        }
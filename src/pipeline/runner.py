@@ -0,0 +1,364 @@
+"""
+Local pipeline runner
+Runs the collect -> preprocess -> train -> test -> compress stages. Each
+stage run is keyed by a hash of its input files, the settings it reads and its
+code; a stage whose key was seen before is not run again, its outputs are
+restored from the local stage store instead.
+
+Run with: python -m src.pipeline.runner [--stages preprocess train test] [--force train]
+"""
+
+import argparse
+import hashlib
+import importlib
+import json
+import time
+from dataclasses import dataclass, field
+from importlib import metadata as package_metadata
+from pathlib import Path
+from typing import List, Optional
+from src.data.storage import dataset_path
+from src.logging.console_log import setup_logging
+from src.pipeline.store import StageStore, expand_paths, file_hash
+from settings import settings
+
+# setup logging
+logger = setup_logging()
+
+# Installed packages whose version can change a stage's outputs
+KEY_PACKAGES = ("numpy", "pandas", "scikit-learn", "imbalanced-learn", "scipy")
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    A pipeline step and what its outputs depend on.
+
+    Args:
+        name (str): Stage name
+        module (str): Module whose `main()` runs the stage
+        inputs (List[Path]): Files and directories the stage reads
+        optional_inputs (List[Path]): Inputs that may not exist yet, such as
+            a local store the stage creates on its first run
+        outputs (List[Path]): Files and directories the stage writes
+        settings_fields (List[str]): Settings that change the outputs
+        code (List[str]): Source files of the stage, relative to the project
+        cacheable (bool): False for stages reading external sources
+        incremental (bool): True for stages that update their previous outputs
+            when TRAIN_INCREMENTAL is set; they are not cached then
+    """
+
+    name: str
+    module: str
+    inputs: List[Path]
+    outputs: List[Path]
+    settings_fields: List[str]
+    code: List[str]
+    cacheable: bool = True
+    incremental: bool = False
+    optional_inputs: List[Path] = field(default_factory=list)
+
+
+FEATURE_SETTINGS = [
+    "TARGET_COLUMN_NAME",
+    "NUMERICAL_FEATURE_COLUMNS",
+    "CATEGORICAL_COLUMNS",
+]
+
+STAGES = [
+    Stage(
+        name="collect",
+        module="src.data.collect_data",
+        inputs=[],
+        # The snapshot in use and the record files waiting to be ingested
+        optional_inputs=[
+            settings.DATA_SNAPSHOT_FOLDER / "CURRENT",
+            settings.DATA_INGEST_FOLDER,
+        ],
+        outputs=[
+            dataset_path(settings.RAW_DATA_FOLDER, "wholesale_customers_data"),
+            dataset_path(settings.RAW_DATA_FOLDER, "wholesale_customers_targets"),
+            dataset_path(settings.TRAIN_TEST_FOLDER, "X_train"),
+            dataset_path(settings.TRAIN_TEST_FOLDER, "X_test"),
+            dataset_path(settings.TRAIN_TEST_FOLDER, "y_train"),
+            dataset_path(settings.TRAIN_TEST_FOLDER, "y_test"),
+            settings.REFERENCE_FOLDER / "wholesale_customers_metadata.csv",
+            settings.REFERENCE_FOLDER / "wholesale_customers_statistical_summary.csv",
+            settings.DRIFT_REFERENCE_PATH,
+        ],
+        settings_fields=FEATURE_SETTINGS
+        + [
+            "RANDOM_STATE",
+            "TEST_SIZE",
+            "DRIFT_SKETCH_SIZE",
+            "DATA_SOURCE_VERSION",
+        ],
+        code=[
+            "src/data/collect_data.py",
+            "src/data/snapshot.py",
+            "src/data/storage.py",
+            "src/monitoring/sketch.py",
+        ],
+    ),
+    Stage(
+        name="preprocess",
+        module="src.data.preprocess_data",
+        inputs=[
+            dataset_path(settings.TRAIN_TEST_FOLDER, "X_train"),
+            dataset_path(settings.TRAIN_TEST_FOLDER, "y_train"),
+        ],
+        outputs=[
+            settings.SCALER_PATH,
+            settings.SCALER_ARTIFACT_PATH,
+            dataset_path(settings.PROCESSED_DATA_FOLDER, "X_train_processed"),
+            dataset_path(settings.PROCESSED_DATA_FOLDER, "y_train_processed"),
+            dataset_path(settings.PROCESSED_DATA_FOLDER, "X_new_processed"),
+            dataset_path(settings.PROCESSED_DATA_FOLDER, "y_new_processed"),
+            settings.SEEN_ROWS_PATH,
+        ],
+        settings_fields=FEATURE_SETTINGS
+        + ["RANDOM_STATE", "DATA_COMPRESSION", "TRAIN_INCREMENTAL"],
+        code=[
+            "src/data/preprocess_data.py",
+            "src/data/oversampling.py",
+            "src/data/scaling.py",
+            "src/data/storage.py",
+            "src/modelling/artifact.py",
+        ],
+        incremental=True,
+    ),
+    Stage(
+        name="train",
+        module="src.modelling.train",
+        inputs=[
+            dataset_path(settings.PROCESSED_DATA_FOLDER, "X_train_processed"),
+            dataset_path(settings.PROCESSED_DATA_FOLDER, "y_train_processed"),
+            dataset_path(settings.TRAIN_TEST_FOLDER, "X_train"),
+            settings.SCALER_PATH,
+            settings.SCALER_ARTIFACT_PATH,
+        ],
+        outputs=[
+            settings.MODEL_PATH,
+            settings.MODEL_ARTIFACT_PATH,
+            settings.METRICS_PATH / "tuning_results.json",
+        ],
+        settings_fields=FEATURE_SETTINGS
+        + [
+            "RANDOM_STATE",
+            "MODEL_PARAMS",
+            "TRAIN_TUNING",
+            "TUNING_SEARCH_SPACE",
+            "TUNING_CANDIDATES",
+            "TUNING_HALVING_FACTOR",
+            "TUNING_CV_FOLDS",
+            "TUNING_SCORING",
+            "TUNING_TOLERANCE",
+            "TRAIN_INCREMENTAL",
+            "INCREMENTAL_NEW_TREES",
+            "INCREMENTAL_MAX_TREES",
+        ],
+        code=[
+            "src/modelling/train.py",
+            "src/modelling/tuning.py",
+            "src/modelling/incremental.py",
+            "src/modelling/flat_forest.py",
+            "src/modelling/artifact.py",
+            "src/data/preprocess_data.py",
+            "src/data/oversampling.py",
+            "src/data/scaling.py",
+            "src/data/storage.py",
+        ],
+        incremental=True,
+    ),
+    Stage(
+        name="test",
+        module="src.modelling.test",
+        inputs=[
+            dataset_path(settings.TRAIN_TEST_FOLDER, "X_test"),
+            dataset_path(settings.TRAIN_TEST_FOLDER, "y_test"),
+            settings.SCALER_PATH,
+            settings.SCALER_ARTIFACT_PATH,
+            settings.MODEL_PATH,
+            settings.MODEL_ARTIFACT_PATH,
+        ],
+        outputs=[
+            settings.METRICS_PATH / "overall_metrics.json",
+            settings.METRICS_PATH / "classification_report.txt",
+            settings.METRICS_PATH / "confusion_matrix.png",
+        ],
+        settings_fields=FEATURE_SETTINGS
+        + [
+            "MODEL_BACKEND",
+            "RANDOM_STATE",
+            "EVAL_CHUNK_SIZE",
+            "EVAL_BOOTSTRAP_RESAMPLES",
+            "EVAL_CONFIDENCE",
+            "EVAL_PLOT",
+        ],
+        code=[
+            "src/modelling/test.py",
+            "src/modelling/evaluation.py",
+            "src/modelling/score.py",
+            "src/modelling/flat_forest.py",
+            "src/modelling/artifact.py",
+            "src/data/preprocess_data.py",
+            "src/data/oversampling.py",
+            "src/data/scaling.py",
+            "src/data/storage.py",
+        ],
+    ),
+    Stage(
+        name="compress",
+        module="src.modelling.compress",
+        inputs=[
+            dataset_path(settings.PROCESSED_DATA_FOLDER, "X_train_processed"),
+            dataset_path(settings.PROCESSED_DATA_FOLDER, "y_train_processed"),
+            dataset_path(settings.TRAIN_TEST_FOLDER, "X_train"),
+            dataset_path(settings.TRAIN_TEST_FOLDER, "X_test"),
+            dataset_path(settings.TRAIN_TEST_FOLDER, "y_test"),
+            settings.SCALER_PATH,
+            settings.SCALER_ARTIFACT_PATH,
+            settings.MODEL_PATH,
+        ],
+        outputs=[
+            settings.COMPRESSED_MODEL_PATH,
+            settings.COMPRESSED_MODEL_ARTIFACT_PATH,
+            settings.METRICS_PATH / "compression_results.json",
+        ],
+        settings_fields=FEATURE_SETTINGS
+        + ["RANDOM_STATE", "TRAIN_N_JOBS", "COMPRESSION_TOLERANCE"],
+        code=[
+            "src/modelling/compress.py",
+            "src/modelling/flat_forest.py",
+            "src/modelling/artifact.py",
+            "src/modelling/train.py",
+            "src/modelling/evaluation.py",
+            "src/modelling/tuning.py",
+            "src/data/preprocess_data.py",
+            "src/data/oversampling.py",
+            "src/data/scaling.py",
+            "src/data/storage.py",
+        ],
+    ),
+]
+
+
+def package_versions() -> dict:
+    """Versions of the packages in KEY_PACKAGES that are installed"""
+    versions = {}
+    for package in KEY_PACKAGES:
+        try:
+            versions[package] = package_metadata.version(package)
+        except package_metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def stage_key(stage: Stage) -> str:
+    """
+    Hash of everything the stage's outputs depend on.
+
+    Raises:
+        FileNotFoundError: If an input of the stage does not exist
+    """
+    missing = [str(path) for path in stage.inputs if not path.exists()]
+    if missing:
+        raise FileNotFoundError(
+            f"Missing inputs of stage {stage.name}: {', '.join(missing)}"
+        )
+    key_data = {
+        "stage": stage.name,
+        "inputs": {
+            path.relative_to(settings.PROJECT_ROOT).as_posix(): file_hash(path)
+            for path in expand_paths(stage.inputs + stage.optional_inputs)
+        },
+        "settings": {name: getattr(settings, name) for name in stage.settings_fields},
+        "code": {
+            path: file_hash(settings.PROJECT_ROOT / path)
+            for path in stage.code + ["src/pipeline/runner.py"]
+        },
+        "packages": package_versions(),
+    }
+    encoded = json.dumps(key_data, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def run_stage(stage: Stage, store: StageStore, force: bool = False) -> bool:
+    """
+    Run one stage, or restore its outputs when its key is in the store.
+
+    Returns:
+        bool: True if the stage was run, False if it was restored
+    """
+    cacheable = stage.cacheable and not (
+        stage.incremental and settings.TRAIN_INCREMENTAL
+    )
+    key = stage_key(stage) if cacheable else None
+    if key is not None and not force:
+        manifest = store.manifest(stage.name, key)
+        if manifest is not None:
+            written = store.restore(manifest, stage.outputs)
+            logger.info(
+                f"Stage {stage.name}: up to date (key {key[:12]}), "
+                f"{written} of {len(manifest['files'])} output files restored"
+            )
+            return False
+
+    logger.info(f"Stage {stage.name}: running {stage.module}")
+    start = time.perf_counter()
+    importlib.import_module(stage.module).main()
+    elapsed = time.perf_counter() - start
+    if key is not None:
+        files = store.save(stage.name, key, stage.outputs)
+        logger.info(
+            f"Stage {stage.name}: finished in {elapsed:.1f} s, "
+            f"{len(files)} output files stored (key {key[:12]})"
+        )
+    else:
+        logger.info(f"Stage {stage.name}: finished in {elapsed:.1f} s")
+    return True
+
+
+def run_pipeline(
+    stage_names: Optional[List[str]] = None, force: Optional[List[str]] = None
+) -> None:
+    """
+    Run the pipeline stages in order.
+
+    Args:
+        stage_names (Optional[List[str]]): Stages to run, defaults to all
+        force (Optional[List[str]]): Stages to run even when up to date
+    """
+    store = StageStore()
+    force = set(force or [])
+    ran = []
+    for stage in STAGES:
+        if stage_names is not None and stage.name not in stage_names:
+            continue
+        if run_stage(stage, store, force=stage.name in force):
+            ran.append(stage.name)
+    logger.info(f"Pipeline finished; stages run: {', '.join(ran) or 'none'}")
+
+
+def main():
+    """Run the pipeline from the command line"""
+    stage_names = [stage.name for stage in STAGES]
+    parser = argparse.ArgumentParser(
+        description="Run the training pipeline with stage caching"
+    )
+    parser.add_argument(
+        "--stages", nargs="+", choices=stage_names, help="Stages to run (default: all)"
+    )
+    parser.add_argument(
+        "--force",
+        nargs="+",
+        choices=stage_names,
+        default=[],
+        help="Stages to run even when up to date",
+    )
+    args = parser.parse_args()
+    run_pipeline(args.stages, args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Content-addressed store for pipeline stage outputs
+Output files are stored once per content hash under `objects/`, and each
+stage run records a manifest under `stages/<stage>/<key>.json` mapping the
+output paths to their objects. A stage whose key has a manifest can be
+restored instead of re-run.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional
+from src.logging.console_log import setup_logging
+from src.modelling.artifact import new_version_path, publish_version
+from settings import settings
+
+# setup logging
+logger = setup_logging()
+
+
+def file_hash(path: Path) -> str:
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def expand_paths(paths: List[Path]) -> List[Path]:
+    """The files of `paths`, with directories expanded recursively"""
+    files = []
+    for path in paths:
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob("*") if p.is_file()))
+        elif path.exists():
+            files.append(path)
+    return files
+
+
+class StageStore:
+    """Local store of stage outputs keyed by stage key"""
+
+    def __init__(
+        self,
+        root: Path = settings.PIPELINE_CACHE_FOLDER,
+        project_root: Path = settings.PROJECT_ROOT,
+    ):
+        self.root = Path(root)
+        self.project_root = Path(project_root)
+        self.objects = self.root / "objects"
+        self.stages = self.root / "stages"
+
+    def _manifest_path(self, stage: str, key: str) -> Path:
+        return self.stages / stage / f"{key}.json"
+
+    def _relative(self, path: Path) -> str:
+        # Not resolved: an artifact path is a symlink to its current version,
+        # and its files are stored under the artifact path, not the version
+        return (
+            Path(os.path.abspath(path))
+            .relative_to(os.path.abspath(self.project_root))
+            .as_posix()
+        )
+
+    def manifest(self, stage: str, key: str) -> Optional[Dict[str, str]]:
+        """Output path to object hash of a stored run, if complete"""
+        path = self._manifest_path(stage, key)
+        if not path.exists():
+            return None
+        with open(path) as f:
+            manifest = json.load(f)
+        if not all(
+            (self.objects / digest).exists() for digest in manifest["files"].values()
+        ):
+            return None
+        return manifest
+
+    def save(self, stage: str, key: str, outputs: List[Path]) -> Dict[str, str]:
+        """Store the current output files of a stage run under its key"""
+        files = {}
+        for path in expand_paths(outputs):
+            digest = file_hash(path)
+            target = self.objects / digest
+            if not target.exists():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                staging = target.with_suffix(".tmp")
+                shutil.copyfile(path, staging)
+                staging.replace(target)
+            files[self._relative(path)] = digest
+        manifest_path = self._manifest_path(stage, key)
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(manifest_path, "w") as f:
+            json.dump({"stage": stage, "key": key, "files": files}, f, indent=4)
+        return files
+
+    def restore(self, manifest: dict, outputs: List[Path]) -> int:
+        """
+        Bring the output files back to a stored run.
+
+        Output directories are artifacts: a directory that differs from the
+        stored run is written as a new artifact version and published with
+        one rename, never changed in place under a reader.
+
+        Args:
+            manifest (dict): Manifest returned by `manifest`
+            outputs (List[Path]): The stage's output files and directories
+
+        Returns:
+            int: Number of files written; files already up to date are kept
+        """
+        files = dict(manifest["files"])
+        written = 0
+        for output in outputs:
+            prefix = self._relative(output) + "/"
+            stored = {
+                relative_path[len(prefix) :]: files.pop(relative_path)
+                for relative_path in list(files)
+                if relative_path.startswith(prefix)
+            }
+            if not stored and not output.is_dir():
+                continue
+            current = {
+                self._relative(path)[len(prefix) :]: file_hash(path)
+                for path in expand_paths([output])
+            }
+            if current == stored:
+                continue
+            # Files the stored run did not produce are left out of the new version
+            version_path = new_version_path(output)
+            for name, digest in stored.items():
+                (version_path / name).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(self.objects / digest, version_path / name)
+            publish_version(output, version_path)
+            written += len(stored)
+
+        for relative_path, digest in files.items():
+            path = self.project_root / relative_path
+            if path.exists() and file_hash(path) == digest:
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            staging = path.with_name(path.name + ".restore")
+            shutil.copyfile(self.objects / digest, staging)
+            staging.replace(path)
+            written += 1
+        return written
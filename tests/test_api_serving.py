@@ -0,0 +1,111 @@
+"""
+Invalid requests batched with valid ones
+"""
+
+import json
+import queue
+import time
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from settings import settings
+from src.api import serving_metrics
+from src.api.api_serving import ModelAPIServing
+from src.api.codec import RequestDecoder
+from src.api.model_store import ModelBundle
+from src.api.prediction_cache import PredictionCache
+from src.modelling.flat_forest import FlatForest
+
+FEATURE_COLUMNS = settings.NUMERICAL_FEATURE_COLUMNS + settings.CATEGORICAL_COLUMNS
+
+
+@pytest.fixture
+def api():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(
+        rng.normal(size=(200, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS
+    )
+    y = rng.choice([1, 2, 3], size=200)
+    model = FlatForest.from_sklearn(
+        RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+    )
+    n_numerical = len(settings.NUMERICAL_FEATURE_COLUMNS)
+    bundle = ModelBundle(
+        model=model,
+        scaler_mean=np.zeros(n_numerical),
+        scaler_scale=np.ones(n_numerical),
+        class_labels=model.classes_,
+        version="test",
+    )
+    api = ModelAPIServing(max_batch_size=8)
+    api.feature_columns = FEATURE_COLUMNS
+    api.n_features = len(FEATURE_COLUMNS)
+    api.decoder = RequestDecoder(FEATURE_COLUMNS)
+    api.model_store = SimpleNamespace(bundle=bundle)
+    api.candidates = None
+    api.prediction_cache = PredictionCache(max_size=16, ttl=60)
+    api.drift_monitor = None
+    return api
+
+
+def test_invalid_requests_are_not_scored(api):
+    requests = [{column: float(i) for column in FEATURE_COLUMNS} for i in range(4)]
+    for request in requests:
+        request["Channel"] = 1
+    requests[1]["Milk"] = "a lot"
+    contexts = [{} for _ in requests]
+
+    decoded = [
+        api.decode_request(request, context)
+        for request, context in zip(requests, contexts)
+    ]
+    features, valid = api.batch(decoded, contexts)
+    assert valid.tolist() == [True, False, True, True]
+    assert features.shape == (3, len(FEATURE_COLUMNS))
+
+    outputs = api.unbatch(api.predict((features, valid), contexts), contexts)
+    responses = [
+        api.encode_response(output, context)
+        for output, context in zip(outputs, contexts)
+    ]
+
+    assert [response.status_code for response in responses] == [200, 422, 200, 200]
+    assert json.loads(responses[1].body)["detail"][0]["loc"] == ["body", "Milk"]
+    # Only the valid rows reach the cache
+    assert api.prediction_cache.stats()["size"] == 3
+
+
+def test_single_invalid_request(api):
+    context = {}
+    decoded = api.decode_request({"Fresh": 1.0}, context)
+    response = api.encode_response(api.predict(decoded, context), context)
+
+    assert decoded is None
+    assert response.status_code == 422
+    assert api.prediction_cache.stats()["size"] == 0
+
+
+def test_queue_wait_is_recorded_for_the_served_requests(api, tmp_path, monkeypatch):
+    monkeypatch.setattr(serving_metrics.registry, "values", None)
+    serving_metrics.registry.bind(tmp_path)
+    request_queue = queue.Queue()
+    for uid in range(3):
+        request = {column: 1.0 for column in FEATURE_COLUMNS}
+        request_queue.put((0, uid, time.monotonic() - 2.0, request))
+    timed_queue = serving_metrics._TimedRequestQueue(request_queue)
+    items = [timed_queue.get_nowait() for _ in range(3)]
+
+    # The first request timed out in the queue and is never decoded
+    contexts = [{} for _ in items[1:]]
+    decoded = [
+        api.decode_request(item[3], context)
+        for item, context in zip(items[1:], contexts)
+    ]
+    api.predict(api.batch(decoded, contexts), contexts)
+
+    values = serving_metrics.registry.collect(tmp_path)
+    histogram = serving_metrics.queue_wait_seconds
+    assert values[histogram._count_slot] == 2
+    assert values[histogram._sum_slot] >= 4.0
@@ -0,0 +1,73 @@
+"""
+Versioned artifact directories and their atomic swap
+"""
+
+import numpy as np
+from src.modelling.artifact import KEPT_VERSIONS, load_artifact, save_artifact
+from src.pipeline.store import StageStore
+
+
+def test_save_swaps_the_link_and_keeps_the_previous_version(tmp_path):
+    path = tmp_path / "flat_forest"
+    versions = [
+        save_artifact(path, {"values": np.full(3, i)}, {"run": i})["version"]
+        for i in range(4)
+    ]
+
+    assert path.is_symlink()
+    arrays, metadata = load_artifact(path)
+    assert metadata["version"] == versions[-1]
+    np.testing.assert_array_equal(arrays["values"], np.full(3, 3))
+    kept = [p for p in tmp_path.iterdir() if p.is_dir() and not p.is_symlink()]
+    assert len(kept) == KEPT_VERSIONS
+    assert path.resolve() in kept
+
+
+def test_loaded_arrays_survive_a_swap(tmp_path):
+    path = tmp_path / "scaler"
+    save_artifact(path, {"mean": np.zeros(4)}, {})
+    arrays, _ = load_artifact(path)
+    save_artifact(path, {"mean": np.ones(4)}, {})
+
+    np.testing.assert_array_equal(arrays["mean"], np.zeros(4))
+    np.testing.assert_array_equal(load_artifact(path)[0]["mean"], np.ones(4))
+
+
+def test_directory_from_before_the_link_is_migrated(tmp_path):
+    path = tmp_path / "flat_forest"
+    path.mkdir()
+    (path / "metadata.json").write_text("{}")
+
+    save_artifact(path, {"values": np.arange(2)}, {})
+
+    assert path.is_symlink()
+    np.testing.assert_array_equal(load_artifact(path)[0]["values"], np.arange(2))
+
+
+def test_stage_store_restores_an_artifact_as_a_new_version(tmp_path):
+    path = tmp_path / "flat_forest"
+    store = StageStore(tmp_path / "cache", project_root=tmp_path)
+    stored = save_artifact(path, {"values": np.arange(3)}, {"run": 1})
+    manifest = {"files": store.save("train", "key", [path])}
+    assert all(relative.startswith("flat_forest/") for relative in manifest["files"])
+
+    save_artifact(path, {"values": np.arange(5)}, {"run": 2})
+    published = path.resolve()
+    contents = {file.name: file.read_bytes() for file in published.iterdir()}
+    (path / "stray.npy").write_bytes(b"")
+    assert store.restore(manifest, [path]) == 2
+
+    # The version readers may hold is untouched; the link names a new one
+    assert path.resolve() != published
+    assert {file.name: file.read_bytes() for file in published.iterdir()} == {
+        **contents,
+        "stray.npy": b"",
+    }
+    arrays, metadata = load_artifact(path)
+    np.testing.assert_array_equal(arrays["values"], np.arange(3))
+    assert metadata == stored
+    assert sorted(file.name for file in path.iterdir()) == [
+        "metadata.json",
+        "values.npy",
+    ]
+    assert store.restore(manifest, [path]) == 0
@@ -0,0 +1,89 @@
+"""
+Streaming parser of the /predict_batch body
+"""
+
+import asyncio
+import json
+from typing import List
+import pytest
+from src.api.bulk_serving import iter_json_rows
+
+ROWS = [{"a": i, "b": f"row {i}", "c": [1.5e-3, True, None]} for i in range(50)]
+
+
+def parse(chunks: List[bytes], **kwargs) -> List[dict]:
+    async def body():
+        for chunk in chunks:
+            yield chunk
+
+    async def collect():
+        return [row async for row in iter_json_rows(body(), **kwargs)]
+
+    return asyncio.run(collect())
+
+
+def split(data: bytes, size: int) -> List[bytes]:
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+def test_json_array():
+    assert parse([json.dumps(ROWS).encode()]) == ROWS
+
+
+def test_ndjson():
+    body = "\n".join(json.dumps(row) for row in ROWS) + "\n"
+    assert parse([body.encode()]) == ROWS
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+def test_rows_split_across_chunks(size):
+    # Cuts fall inside strings, numbers, literals and escapes
+    rows = ROWS + [{"text": 'café "quoted" \U0001f600', "x": -12.5e10, "y": False}]
+    array = json.dumps(rows).encode()
+    ndjson = "\n".join(json.dumps(row, ensure_ascii=False) for row in rows).encode()
+    assert parse(split(array, size)) == rows
+    assert parse(split(ndjson, size)) == rows
+
+
+def test_malformed_row_fails_before_the_end_of_the_body():
+    received = []
+
+    async def body():
+        yield b'[{"a": 1 x}, '
+        for row in ROWS:
+            received.append(row)
+            yield json.dumps(row).encode() + b", "
+        yield b"]"
+
+    async def collect():
+        return [row async for row in iter_json_rows(body())]
+
+    with pytest.raises(ValueError, match="Invalid JSON object"):
+        asyncio.run(collect())
+    assert len(received) <= 1
+
+
+@pytest.mark.parametrize(
+    "body, message",
+    [
+        (b'[{"a": 1}, 2]', "Expected a JSON object"),
+        (b'{"a": 1}\n{"a": tru}\n', "Invalid JSON object"),
+        (b'[{"a": 1}', "not closed"),
+        (b'{"a": "open', "incomplete JSON object"),
+    ],
+)
+def test_malformed_bodies(body, message):
+    with pytest.raises(ValueError, match=message):
+        parse(split(body, 4))
+
+
+def test_trailing_data_after_the_array():
+    with pytest.raises(ValueError, match="after the closing bracket"):
+        parse([b'[{"a": 1}] {"a": 2}'])
+    assert parse([b'[{"a": 1}]  \n']) == [{"a": 1}]
+
+
+def test_unfinished_row_is_bounded():
+    chunks = [b'{"a": "'] + [b"x" * 100] * 20
+    with pytest.raises(ValueError, match="exceeds 1000 characters"):
+        parse(chunks, max_row_size=1000)
@@ -0,0 +1,56 @@
+"""
+Buffered log sink across forks and its dropped record count
+"""
+
+import io
+import os
+from types import SimpleNamespace
+from src.api import serving_metrics
+from src.logging import console_log
+from src.logging.console_log import BufferedSink
+
+
+def record(message: str) -> SimpleNamespace:
+    return SimpleNamespace(record={"message": message})
+
+
+def test_forked_child_restarts_the_configured_sink(monkeypatch):
+    read_fd, write_fd = os.pipe()
+    with os.fdopen(write_fd, "w") as stream:
+        sink = BufferedSink(stream, lambda entry: entry["message"] + "\n", max_size=4)
+        monkeypatch.setattr(console_log, "_buffered_sink", sink)
+        sink.dropped = 7
+        pid = os.fork()
+        if pid == 0:
+            # The child's drops are its own, and its records are written by a new thread
+            status = 0 if sink.dropped == 0 and sink._thread.is_alive() else 1
+            sink.write(record("from child"))
+            sink.stop()
+            os._exit(status)
+        _, status = os.waitpid(pid, 0)
+        sink.stop()
+    with os.fdopen(read_fd) as output:
+        # Only the parent reports the drops counted before the fork
+        assert (
+            output.read()
+            == "from child\nWARNING | 7 log records dropped, buffer of 4 full\n"
+        )
+    assert os.waitstatus_to_exitcode(status) == 0
+
+
+def test_dropped_records_are_counted_once(tmp_path, monkeypatch):
+    sink = BufferedSink(io.StringIO(), lambda entry: entry["message"], max_size=1)
+    sink.stop()
+    monkeypatch.setattr(console_log, "_buffered_sink", sink)
+    monkeypatch.setattr(serving_metrics, "_recorded_log_drops", (os.getpid(), 0))
+    monkeypatch.setattr(serving_metrics.registry, "values", None)
+    serving_metrics.registry.bind(tmp_path)
+
+    sink.dropped = 3
+    serving_metrics.record_dropped_log_records()
+    serving_metrics.record_dropped_log_records()
+    sink.dropped = 5
+    serving_metrics.record_dropped_log_records()
+
+    values = serving_metrics.registry.collect(tmp_path)
+    assert values[serving_metrics.dropped_log_records_total.slot] == 5
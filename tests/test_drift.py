@@ -0,0 +1,63 @@
+"""
+Parity of the drift statistics with scipy
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import ks_2samp, kstwobign
+from src.monitoring.drift_engine import DriftReference
+from src.monitoring.sketch import KLLSketch, kolmogorov_sf, ks_statistic
+
+
+@pytest.fixture
+def frames():
+    rng = np.random.default_rng(0)
+    reference = pd.DataFrame(
+        {
+            "Fresh": rng.lognormal(8, 1, 2000).round(),
+            "Milk": rng.normal(size=2000),
+            "Channel": rng.integers(1, 3, 2000),
+        }
+    )
+    current = pd.DataFrame(
+        {
+            "Fresh": rng.lognormal(8.2, 1, 700).round(),
+            "Milk": rng.normal(size=700),
+            "Channel": rng.integers(1, 4, 700),
+        }
+    )
+    return reference, current
+
+
+def test_engine_ks_matches_scipy(frames):
+    reference, current = frames
+    drift_reference = DriftReference(reference, ["Fresh", "Milk"], ["Channel"])
+    data = current[drift_reference.columns].to_numpy(dtype=np.float64)
+    # Counts of chunks add up to the counts of the whole data
+    counts = drift_reference.count(data[:300]) + drift_reference.count(data[300:])
+    scores = drift_reference.scores(counts, len(data))
+
+    for column in ("Fresh", "Milk"):
+        expected = ks_2samp(reference[column], current[column]).statistic
+        assert scores[column]["ks"] == pytest.approx(expected, abs=1e-12)
+    assert scores["Channel"]["ks"] is None
+
+
+def test_sketch_ks_is_exact_below_capacity(frames):
+    reference, current = frames
+    sketches = []
+    for data in (reference["Milk"].iloc[:150], current["Milk"].iloc[:120]):
+        sketch = KLLSketch(k=200, seed=0)
+        sketch.update(data.to_numpy())
+        sketches.append(sketch)
+
+    expected = ks_2samp(
+        reference["Milk"].iloc[:150], current["Milk"].iloc[:120]
+    ).statistic
+    assert ks_statistic(*sketches) == pytest.approx(expected, abs=1e-12)
+
+
+@pytest.mark.parametrize("x", [0.0, 0.2, 0.5, 0.9, 1.0, 1.36, 2.0, 3.5, 6.0])
+def test_kolmogorov_sf_matches_scipy(x):
+    assert kolmogorov_sf(x) == pytest.approx(kstwobign.sf(x), rel=1e-9, abs=1e-15)
@@ -0,0 +1,71 @@
+"""
+Parity of the confusion-matrix evaluation engine with sklearn's metrics
+"""
+
+import numpy as np
+import pytest
+from sklearn.metrics import (
+    accuracy_score,
+    classification_report as sklearn_classification_report,
+    confusion_matrix,
+    precision_recall_fscore_support,
+)
+from src.modelling.evaluation import (
+    ConfusionMatrix,
+    bootstrap_intervals,
+    classification_report,
+    evaluate_model,
+)
+
+
+@pytest.fixture
+def labels():
+    rng = np.random.default_rng(0)
+    y_true = rng.choice([1, 2, 3], size=1000, p=[0.2, 0.1, 0.7])
+    y_pred = np.where(
+        rng.random(1000) < 0.6, y_true, rng.choice([1, 2, 3, 4], size=1000)
+    )
+    return y_true, y_pred
+
+
+def test_chunked_matrix_matches_sklearn(labels):
+    y_true, y_pred = labels
+    confusion = ConfusionMatrix()
+    for start in range(0, len(y_true), 64):
+        confusion.update(y_true[start : start + 64], y_pred[start : start + 64])
+
+    assert np.array_equal(confusion.labels, [1, 2, 3, 4])
+    assert confusion.labels.dtype == y_true.dtype
+    assert np.array_equal(confusion.matrix, confusion_matrix(y_true, y_pred))
+    assert classification_report(confusion) == sklearn_classification_report(
+        y_true, y_pred, zero_division=0
+    )
+
+
+def test_metrics_match_sklearn(labels):
+    y_true, y_pred = labels
+    precision, recall, f1, _ = precision_recall_fscore_support(
+        y_true, y_pred, average="weighted", zero_division=0
+    )
+    expected = {
+        "accuracy": accuracy_score(y_true, y_pred),
+        "precision": precision,
+        "recall": recall,
+        "f1_score": f1,
+    }
+
+    assert evaluate_model(y_true, y_pred) == pytest.approx(expected, rel=1e-12)
+
+
+def test_bootstrap_intervals_do_not_depend_on_workers(labels):
+    confusion = ConfusionMatrix()
+    confusion.update(*labels)
+    intervals = bootstrap_intervals(confusion.matrix, n_resamples=1000, seed=0)
+
+    for n_workers in (2, 3):
+        assert intervals == bootstrap_intervals(
+            confusion.matrix, n_resamples=1000, n_workers=n_workers, seed=0
+        )
+    point = evaluate_model(*labels)
+    for name, (lower, upper) in intervals.items():
+        assert lower <= point[name] <= upper
@@ -0,0 +1,92 @@
+"""
+Parity of FlatForest with the sklearn forest it is flattened from
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+from settings import settings
+from src.modelling.flat_forest import FlatForest, saved_model_path, served_model_paths
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(400, 7)), columns=[f"x{i}" for i in range(7)])
+    y = np.where(X["x0"] + X["x1"] ** 2 + rng.normal(scale=0.5, size=400) > 1, 3, 1)
+    y[::5] = 2
+    return X, y
+
+
+def test_predict_proba_matches_sklearn(data, tmp_path):
+    X, y = data
+    model = RandomForestClassifier(n_estimators=25, random_state=0).fit(X, y)
+    forest = FlatForest.from_sklearn(model)
+    # Inputs on and next to the split thresholds, where float32 rounding matters
+    thresholds = np.concatenate(
+        [estimator.tree_.threshold for estimator in model.estimators_]
+    )
+    edge = np.tile(X.to_numpy()[:1], (50, 1))
+    edge[:, 0] = thresholds[thresholds != -2][:50]
+    X_test = np.vstack([X.to_numpy(), edge, np.nextafter(edge, np.inf)])
+
+    expected = model.predict_proba(pd.DataFrame(X_test, columns=X.columns))
+    assert np.allclose(forest.predict_proba(X_test), expected, rtol=0, atol=1e-12)
+    assert np.array_equal(
+        forest.predict(X_test), model.predict(pd.DataFrame(X_test, columns=X.columns))
+    )
+
+    forest.save(tmp_path / "forest")
+    loaded = FlatForest.load(tmp_path / "forest")
+    assert np.array_equal(loaded.predict_proba(X_test), forest.predict_proba(X_test))
+    assert list(loaded.feature_names_in_) == list(X.columns)
+
+
+def test_single_tree_matches_sklearn(data):
+    X, y = data
+    model = DecisionTreeClassifier(max_depth=4, random_state=0).fit(X.to_numpy(), y)
+    forest = FlatForest.from_sklearn(model)
+
+    assert np.allclose(
+        forest.predict_proba(X.to_numpy()),
+        model.predict_proba(X.to_numpy()),
+        rtol=0,
+        atol=1e-12,
+    )
+    assert not hasattr(forest, "feature_names_in_")
+
+
+def test_compressed_model_of_another_version_is_not_served(data, tmp_path, monkeypatch):
+    X, y = data
+    monkeypatch.setattr(settings, "SERVE_COMPRESSED_MODEL", True)
+    full = FlatForest.from_sklearn(
+        RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+    )
+    compressed = FlatForest.from_sklearn(
+        DecisionTreeClassifier(max_depth=3, random_state=0).fit(X, y)
+    )
+    full_metadata = full.save(saved_model_path(settings.MODEL_ARTIFACT_PATH, tmp_path))
+    compressed_path = saved_model_path(settings.COMPRESSED_MODEL_PATH, tmp_path)
+    compressed_path.parent.mkdir(parents=True)
+    compressed_path.touch()
+    compressed_artifact_path = saved_model_path(
+        settings.COMPRESSED_MODEL_ARTIFACT_PATH, tmp_path
+    )
+
+    compressed.save(
+        compressed_artifact_path,
+        metadata={"source_model_version": full_metadata["version"]},
+    )
+    assert served_model_paths(tmp_path) == (compressed_artifact_path, compressed_path)
+
+    # Retrained without compressing again
+    full = FlatForest.from_sklearn(
+        RandomForestClassifier(n_estimators=5, random_state=1).fit(X, y)
+    )
+    full.save(saved_model_path(settings.MODEL_ARTIFACT_PATH, tmp_path))
+    assert served_model_paths(tmp_path) == (
+        saved_model_path(settings.MODEL_ARTIFACT_PATH, tmp_path),
+        saved_model_path(settings.MODEL_PATH, tmp_path),
+    )
@@ -0,0 +1,91 @@
+"""
+Incremental forest updates keep the decisions of the retained trees
+"""
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from src.modelling.incremental import grow_forest, rescale_thresholds
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    numerical = rng.lognormal(8, 1, size=(600, 6))
+    channel = rng.integers(1, 3, size=(600, 1)).astype(np.float64)
+    y = np.where(numerical[:, 0] * channel[:, 0] > 4000, 3, 1)
+    y[::4] = 2
+    return numerical, channel, y
+
+
+def test_rescaled_thresholds_keep_raw_decisions(data):
+    numerical, channel, y = data
+    old = StandardScaler().fit(numerical[:400])
+    new = StandardScaler().fit(numerical)
+    model = RandomForestClassifier(n_estimators=20, random_state=0).fit(
+        np.hstack([old.transform(numerical[:400]), channel[:400]]), y[:400]
+    )
+    expected = model.predict_proba(np.hstack([old.transform(numerical), channel]))
+    categorical_thresholds = [
+        estimator.tree_.threshold[estimator.tree_.feature == 6].copy()
+        for estimator in model.estimators_
+    ]
+
+    rescale_thresholds(model, old.mean_, old.scale_, new.mean_, new.scale_)
+
+    assert np.array_equal(
+        model.predict_proba(np.hstack([new.transform(numerical), channel])), expected
+    )
+    for estimator, thresholds in zip(model.estimators_, categorical_thresholds):
+        assert np.array_equal(
+            estimator.tree_.threshold[estimator.tree_.feature == 6], thresholds
+        )
+
+
+def test_grow_forest_keeps_a_fixed_size(data):
+    numerical, channel, y = data
+    X = np.hstack([numerical, channel])
+    model = RandomForestClassifier(n_estimators=10, random_state=0).fit(
+        X[:400], y[:400]
+    )
+    retained = model.estimators_[4:]
+
+    grow_forest(model, X[400:], y[400:], n_new_trees=4, max_trees=10)
+
+    assert len(model.estimators_) == model.n_estimators == 10
+    assert model.estimators_[:6] == retained
+
+
+def test_grow_forest_needs_every_class(data):
+    numerical, channel, y = data
+    X = np.hstack([numerical, channel])
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+
+    with pytest.raises(ValueError, match="no samples of classes"):
+        grow_forest(model, X[y != 2], y[y != 2], n_new_trees=2)
+
+
+def test_grow_forest_rejects_unseen_classes(data):
+    numerical, channel, y = data
+    X = np.hstack([numerical, channel])
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(
+        X[y != 3], y[y != 3]
+    )
+
+    with pytest.raises(ValueError, match="unknown to the forest"):
+        grow_forest(model, X, y, n_new_trees=2)
+
+
+def test_grow_forest_draws_new_tree_seeds_per_update(data):
+    numerical, channel, y = data
+    X = np.hstack([numerical, channel])
+    model = RandomForestClassifier(n_estimators=6, random_state=0).fit(X[:400], y[:400])
+
+    grow_forest(model, X[400:500], y[400:500], n_new_trees=3, max_trees=6)
+    first = [estimator.random_state for estimator in model.estimators_[3:]]
+    grow_forest(model, X[500:], y[500:], n_new_trees=3, max_trees=6)
+    second = [estimator.random_state for estimator in model.estimators_[3:]]
+
+    assert not set(first) & set(second)
+    assert model.random_state == 0
@@ -0,0 +1,46 @@
+"""
+Recording and aggregation of the multi-process metrics
+"""
+
+import threading
+import numpy as np
+from src.monitoring.metrics import MetricsRegistry
+
+
+def test_concurrent_updates_are_not_lost(tmp_path):
+    registry = MetricsRegistry("test")
+    counter = registry.counter("rows_total", "Rows")
+    histogram = registry.histogram("seconds", "Latency")
+    registry.bind(tmp_path)
+
+    def record():
+        for _ in range(20_000):
+            counter.inc()
+            histogram.observe(0.001)
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    values = registry.collect(tmp_path)
+    assert values[counter.slot] == 80_000
+    assert values[histogram._count_slot] == 80_000
+
+
+def test_gauges_of_exited_processes_are_dropped(tmp_path):
+    registry = MetricsRegistry("test")
+    counter = registry.counter("rows_total", "Rows")
+    gauge = registry.gauge("entries", "Entries")
+    registry.bind(tmp_path)
+    counter.inc(3)
+    gauge.set(5)
+    # File left by a process that exited (pids never reach 2**22 + 1 on Linux)
+    stale = np.zeros(registry.size)
+    stale[counter.slot], stale[gauge.slot] = 2, 7
+    np.save(tmp_path / "test_4194305.npy", stale)
+
+    values = registry.collect(tmp_path)
+    assert values[counter.slot] == 5
+    assert values[gauge.slot] == 5
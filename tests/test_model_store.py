@@ -0,0 +1,43 @@
+"""
+Versioning of the served model and scaler pair
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from settings import settings
+from src.api.model_store import load_bundle
+from src.modelling.artifact import save_artifact
+from src.modelling.flat_forest import FlatForest, saved_model_path
+
+FEATURE_COLUMNS = settings.NUMERICAL_FEATURE_COLUMNS + settings.CATEGORICAL_COLUMNS
+
+
+def save_scaler(model_folder, mean: float) -> None:
+    n_numerical = len(settings.NUMERICAL_FEATURE_COLUMNS)
+    save_artifact(
+        saved_model_path(settings.SCALER_ARTIFACT_PATH, model_folder),
+        {"mean": np.full(n_numerical, mean), "scale": np.ones(n_numerical)},
+        {"kind": "standard_scaler"},
+    )
+
+
+def test_new_scaler_alone_is_a_new_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_BACKEND", "flat")
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(
+        rng.normal(size=(100, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS
+    )
+    y = rng.choice([1, 2, 3], size=100)
+    model = RandomForestClassifier(n_estimators=3, random_state=0).fit(X, y)
+    FlatForest.from_sklearn(model).save(
+        saved_model_path(settings.MODEL_ARTIFACT_PATH, tmp_path)
+    )
+    save_scaler(tmp_path, 0.0)
+    first = load_bundle(FEATURE_COLUMNS, tmp_path)
+
+    assert load_bundle(FEATURE_COLUMNS, tmp_path).version == first.version
+    save_scaler(tmp_path, 1.0)
+    second = load_bundle(FEATURE_COLUMNS, tmp_path)
+    assert second.version != first.version
+    assert second.metadata["version"] == first.metadata["version"]
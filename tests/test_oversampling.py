@@ -0,0 +1,44 @@
+"""
+Parity of the ADASYN oversampling with imbalanced-learn's
+`adasyn` must produce exactly the rows of imblearn's ADASYN for the same
+random state, with and without threads and cached neighbour tables.
+"""
+
+import numpy as np
+import pytest
+from imblearn.over_sampling import ADASYN
+from src.data.oversampling import adasyn
+
+
+@pytest.fixture
+def training_rows():
+    rng = np.random.default_rng(0)
+    X = np.abs(rng.normal(size=(600, 8)) * [1, 2, 3, 4, 5, 6, 7, 8])
+    X[:, 7] = rng.integers(1, 3, 600)
+    # Imbalanced, overlapping classes
+    y = np.where(X[:, 0] + rng.normal(scale=0.5, size=600) > 1.2, 3, 1)
+    y[rng.random(600) < 0.15] = 2
+    return X, y
+
+
+@pytest.mark.parametrize("random_state", [0, 42])
+def test_adasyn_matches_imblearn(training_rows, random_state):
+    X, y = training_rows
+    expected_X, expected_y = ADASYN(random_state=random_state).fit_resample(X, y)
+
+    X_resampled, y_resampled = adasyn(X, y, random_state)
+
+    assert len(X_resampled) > len(X)
+    assert np.array_equal(X_resampled, expected_X)
+    assert np.array_equal(y_resampled, expected_y)
+
+
+def test_threads_and_cached_neighbours_give_the_same_rows(training_rows, tmp_path):
+    X, y = training_rows
+    expected = adasyn(X, y, 42)
+
+    for _ in range(2):
+        X_resampled, y_resampled = adasyn(X, y, 42, n_jobs=2, cache_folder=tmp_path)
+        assert np.array_equal(X_resampled, expected[0])
+        assert np.array_equal(y_resampled, expected[1])
+    assert len(list(tmp_path.glob("*.npz"))) == 1
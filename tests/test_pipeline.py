@@ -0,0 +1,98 @@
+"""
+Stage keys and the restore of cached stage outputs
+"""
+
+import textwrap
+import pytest
+from settings import settings
+from src.pipeline.runner import Stage, run_stage, stage_key
+from src.pipeline.store import StageStore
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROJECT_ROOT", tmp_path)
+    (tmp_path / "src/pipeline").mkdir(parents=True)
+    (tmp_path / "src/pipeline/runner.py").write_text("# runner\n")
+    (tmp_path / "stage_code.py").write_text("# stage\n")
+    (tmp_path / "input.csv").write_text("a,b\n1,2\n")
+    return tmp_path
+
+
+def make_stage(project, **kwargs) -> Stage:
+    return Stage(
+        **{
+            "name": "example",
+            "module": "example_stage",
+            "inputs": [project / "input.csv"],
+            "outputs": [project / "output.txt", project / "artifact"],
+            "settings_fields": ["RANDOM_STATE"],
+            "code": ["stage_code.py"],
+            **kwargs,
+        }
+    )
+
+
+def test_key_changes_with_inputs_settings_and_code(project, monkeypatch):
+    stage = make_stage(project)
+    key = stage_key(stage)
+    assert stage_key(stage) == key
+
+    (project / "input.csv").write_text("a,b\n1,3\n")
+    changed_input = stage_key(stage)
+    assert changed_input != key
+
+    monkeypatch.setattr(settings, "RANDOM_STATE", settings.RANDOM_STATE + 1)
+    changed_setting = stage_key(stage)
+    assert changed_setting != changed_input
+
+    (project / "stage_code.py").write_text("# stage, edited\n")
+    assert stage_key(stage) != changed_setting
+
+
+def test_key_needs_every_input(project):
+    stage = make_stage(project, inputs=[project / "missing.csv"])
+    with pytest.raises(FileNotFoundError, match="missing.csv"):
+        stage_key(stage)
+
+
+def test_cached_stage_is_restored_without_stray_files(project, monkeypatch):
+    (project / "example_stage.py").write_text(
+        textwrap.dedent(
+            """
+            from pathlib import Path
+            import numpy as np
+            from settings import settings
+            from src.modelling.artifact import save_artifact
+
+            runs = 0
+
+
+            def main():
+                global runs
+                runs += 1
+                root = Path(settings.PROJECT_ROOT)
+                (root / "output.txt").write_text("output")
+                save_artifact(root / "artifact", {"values": np.arange(3)}, {})
+            """
+        )
+    )
+    monkeypatch.syspath_prepend(str(project))
+    import example_stage
+
+    stage = make_stage(project)
+    store = StageStore(project / "cache", project_root=project)
+    assert run_stage(stage, store)
+
+    (project / "output.txt").write_text("changed")
+    (project / "artifact" / "stray.npy").write_bytes(b"stray")
+    assert not run_stage(stage, store)
+
+    assert example_stage.runs == 1
+    assert (project / "output.txt").read_text() == "output"
+    assert sorted(path.name for path in (project / "artifact").iterdir()) == [
+        "metadata.json",
+        "values.npy",
+    ]
+    assert run_stage(stage, store, force=True)
+    assert example_stage.runs == 2
@@ -0,0 +1,77 @@
+"""
+Eviction, expiry and invalidation of the prediction cache
+"""
+
+import numpy as np
+import pytest
+from src.api.prediction_cache import PredictionCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = PredictionCache(max_size=2, ttl=60, clock=clock)
+    keys = [PredictionCache.key(np.array([float(i), 1.0])) for i in range(3)]
+    cache.put(keys[0], np.array([0.1, 0.9]))
+    cache.put(keys[1], np.array([0.2, 0.8]))
+    cache.get(keys[0])
+    cache.put(keys[2], np.array([0.3, 0.7]))
+
+    assert cache.get(keys[1]) is None
+    assert np.array_equal(cache.get(keys[0]), [0.1, 0.9])
+    assert cache.stats() == {
+        "size": 2,
+        "hits": 2,
+        "misses": 1,
+        "evictions": 1,
+        "expirations": 0,
+        "invalidations": 0,
+    }
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = PredictionCache(max_size=10, ttl=5, clock=clock)
+    key = PredictionCache.key(np.array([1.0, 2.0]))
+    cache.put(key, np.array([0.5, 0.5]))
+    clock.now = 4.9
+    assert cache.get(key) is not None
+    clock.now = 5.0
+
+    assert cache.get(key) is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["size"] == 0
+
+
+def test_new_model_version_drops_entries(clock):
+    cache = PredictionCache(max_size=10, ttl=60, clock=clock)
+    key = PredictionCache.key(np.array([1.0, 2.0]))
+    cache.use_version("a")
+    cache.put(key, np.array([0.5, 0.5]))
+    cache.use_version("a")
+    assert cache.get(key) is not None
+
+    cache.use_version("b")
+    assert cache.get(key) is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_signed_zeros_share_a_key():
+    assert PredictionCache.key(np.array([-0.0, 1.0])) == PredictionCache.key(
+        np.array([0.0, 1.0])
+    )
+
+
+def test_max_size_must_be_positive():
+    with pytest.raises(ValueError):
+        PredictionCache(max_size=0, ttl=1)
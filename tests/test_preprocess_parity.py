@@ -0,0 +1,81 @@
+"""
+Parity of the serving preprocessing with the training preprocessing
+Rows decoded by RequestDecoder and scaled by `preprocess_transform_array`
+must be bit-identical to the rows `preprocess_transform` gives the model
+during training.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import StandardScaler
+from settings import settings
+from src.api.codec import RequestDecoder, RequestError
+from src.data.preprocess_data import preprocess_transform
+from src.data.scaling import preprocess_transform_array
+
+FEATURE_COLUMNS = settings.NUMERICAL_FEATURE_COLUMNS + settings.CATEGORICAL_COLUMNS
+
+
+@pytest.fixture
+def customers() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(
+        {
+            column: rng.lognormal(8, 1.5, 500).round()
+            for column in settings.NUMERICAL_FEATURE_COLUMNS
+        }
+    )
+    data["Channel"] = rng.integers(1, 3, 500)
+    # Spending with fractional cents, as JSON clients may send it
+    data.loc[::7, "Fresh"] += 0.37
+    return data
+
+
+def test_decoded_rows_match_training_transform(customers):
+    scaler = StandardScaler().fit(customers[settings.NUMERICAL_FEATURE_COLUMNS])
+    expected = preprocess_transform(
+        customers,
+        scaler,
+        settings.NUMERICAL_FEATURE_COLUMNS,
+        settings.CATEGORICAL_COLUMNS,
+    )[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+
+    decoder = RequestDecoder(FEATURE_COLUMNS)
+    payloads = [
+        {
+            column: (int(value) if column == "Channel" else float(value))
+            for column, value in row.items()
+        }
+        for row in customers[FEATURE_COLUMNS].to_dict(orient="records")
+    ]
+    X = np.stack([decoder.decode(payload) for payload in payloads])
+    preprocess_transform_array(X, scaler.mean_, scaler.scale_)
+
+    assert np.array_equal(X, expected)
+
+
+def test_coerced_payload_matches_plain_payload(customers):
+    decoder = RequestDecoder(FEATURE_COLUMNS)
+    row = customers[FEATURE_COLUMNS].iloc[0].to_dict()
+    plain = {
+        column: (int(value) if column == "Channel" else float(value))
+        for column, value in row.items()
+    }
+    # Strings and integral floats go through the Pydantic model instead of the fast path
+    coerced = {
+        **{column: str(value) for column, value in plain.items()},
+        "Channel": float(plain["Channel"]),
+    }
+
+    assert np.array_equal(decoder.decode(coerced), decoder.decode(plain))
+
+
+def test_invalid_payload_is_rejected(customers):
+    decoder = RequestDecoder(FEATURE_COLUMNS)
+    payload = {column: 1.0 for column in settings.NUMERICAL_FEATURE_COLUMNS}
+    payload["Channel"] = 1.5
+
+    with pytest.raises(RequestError) as error:
+        decoder.decode(payload)
+    assert error.value.errors[0]["loc"] == ("body", "Channel")